@@ -1,80 +1,849 @@
 import struct
+from bisect import bisect_left, bisect_right
 from utils.logger import get_logger
 from utils.errors import BTreeError
 from backend.os_interface import DEFAULT_PAGE_SIZE
+from backend.key_encoding import encode_key, decode_key
+from backend.slotted_page import (SlottedPage, PAGE_HEADER, CELL_POINTER, LEAF_CELL, INTERNAL_CELL,
+                                  leaf_cell, internal_cell, max_cell_size, local_value_size, common_prefix)
+from backend.overflow import OverflowValue, OVERFLOW_POINTER, Payload, stored_length, write_chain, free_chain
 
 logger = get_logger(__name__)
 
+_DUPLICATE = object()                     # _insert result for a key that is already present
+
 class BTreeNode:
-    def __init__(self, keys=None, children=None, is_leaf=True):
+    """Decoded form of one B+tree page (stored as a SlottedPage).
+
+    `keys` are encoded keys (backend.key_encoding), so they order
+    bytewise. Leaves hold a value per key (bytes, or an OverflowValue for
+    one that spilled to overflow pages) and are doubly linked to their
+    siblings in key order (0 = no sibling; page 0 is the database header,
+    never a leaf). Internal nodes hold n separator keys and n + 1 child
+    page numbers; keys equal to a separator live in the right-hand
+    subtree. With `compress_prefix`, an internal node stores the prefix
+    its keys share once per page."""
+
+    def __init__(self, keys=None, children=None, is_leaf=True, prev_leaf=0, next_leaf=0, values=None):
         self.keys = keys or []
+        self.values = values or ([b""] * len(self.keys) if is_leaf else [])
         self.children = children or []
         self.is_leaf = is_leaf
+        self.prev_leaf = prev_leaf
+        self.next_leaf = next_leaf
+
+    def prefix(self, compress_prefix):
+        if self.is_leaf or not compress_prefix or not self.keys:
+            return b""
+        return common_prefix(self.keys[0], self.keys[-1])
+
+    def cells(self, prefix=b""):
+        if self.is_leaf:
+            return [leaf_cell(key, value) for key, value in zip(self.keys, self.values)]
+        return [internal_cell(child, key[len(prefix):]) for child, key in zip(self.children, self.keys)]
+
+    def encoded_size(self, compress_prefix=False):
+        cell_header = LEAF_CELL.size if self.is_leaf else INTERNAL_CELL.size
+        size = PAGE_HEADER.size + len(self.keys) * (cell_header + CELL_POINTER.size) + sum(map(len, self.keys))
+        if self.is_leaf:
+            size += sum(map(stored_length, self.values))
+        else:
+            size -= (len(self.keys) - 1) * len(self.prefix(compress_prefix))
+        return size
+
+    def serialize(self, page_size=DEFAULT_PAGE_SIZE, compress_prefix=False):
+        return bytes(self.serialize_into(bytearray(page_size), compress_prefix))
 
-    def serialize(self):
+    def serialize_into(self, buffer, compress_prefix=False):
+        """Encode the node in place into a page buffer (e.g. Page.writable())."""
         try:
-            header = struct.pack("<?I", self.is_leaf, len(self.keys))
-            keys_data = b"".join(struct.pack("<I", key) for key in self.keys)
-            data = header + keys_data
-            if len(data) > DEFAULT_PAGE_SIZE:
-                raise BTreeError("Serialized node exceeds page size")
-            data += b'\x00' * (DEFAULT_PAGE_SIZE - len(data))  # pad to full page
-            return data
+            if self.is_leaf and len(self.values) != len(self.keys):
+                raise BTreeError(f"Leaf with {len(self.keys)} keys has {len(self.values)} values")
+            if not self.is_leaf and len(self.children) != len(self.keys) + 1:
+                raise BTreeError(f"Internal node with {len(self.keys)} keys needs {len(self.keys) + 1} children, "
+                                 f"has {len(self.children)}")
+            right_child = 0 if self.is_leaf else self.children[-1]
+            prefix = self.prefix(compress_prefix)
+            SlottedPage(buffer).rewrite(self.is_leaf, self.cells(prefix), self.prev_leaf, self.next_leaf,
+                                        right_child, prefix)
+            return buffer
+        except BTreeError:
+            raise
         except Exception as e:
             raise BTreeError(f"Serialization failed: {e}")
 
+    def copy(self):
+        return BTreeNode(self.keys[:], self.children[:], self.is_leaf, self.prev_leaf, self.next_leaf,
+                         self.values[:])
+
     @staticmethod
     def deserialize(data):
         try:
-            if len(data) < 5:
+            if len(data) < PAGE_HEADER.size:
                 raise BTreeError("Page too small to deserialize")
-            is_leaf = bool(data[0])
-            key_count = struct.unpack("<I", data[1:5])[0]
-            if key_count > 1024:
-                raise BTreeError(f"Unrealistic key count: {key_count}")
-            keys = list(struct.unpack(f"<{key_count}I", data[5:5 + key_count * 4]))
-            return BTreeNode(keys=keys, is_leaf=is_leaf)
+            is_leaf, count, prefix_length, content_start, _, prev_leaf, next_leaf, right_child = \
+                SlottedPage(data).header()
+            pointers = PAGE_HEADER.size + prefix_length
+            if pointers + count * CELL_POINTER.size > content_start or content_start > len(data):
+                raise BTreeError(f"Corrupt page header: {count} cells, content at {content_start}")
+
+            raw = bytes(data)                       # one copy; slicing bytes then yields bytes directly
+            offsets = struct.unpack_from(f"<{count}H", raw, pointers)
+            keys, values, children = [], [], []
+            if is_leaf:
+                for offset in offsets:
+                    key_length, value_length = LEAF_CELL.unpack_from(raw, offset)
+                    start = offset + LEAF_CELL.size
+                    end = start + key_length
+                    keys.append(raw[start:end])
+                    local = local_value_size(len(raw), key_length, value_length)
+                    if local == value_length:
+                        values.append(raw[end:end + local])
+                    else:
+                        first_page = OVERFLOW_POINTER.unpack_from(raw, end + local)[0]
+                        values.append(OverflowValue(raw[end:end + local], value_length, first_page))
+            else:
+                prefix = raw[PAGE_HEADER.size:pointers]
+                for offset in offsets:
+                    child, key_length = INTERNAL_CELL.unpack_from(raw, offset)
+                    start = offset + INTERNAL_CELL.size
+                    keys.append(prefix + raw[start:start + key_length])
+                    children.append(child)
+                children.append(right_child)
+            return BTreeNode(keys=keys, children=children, is_leaf=is_leaf, prev_leaf=prev_leaf,
+                             next_leaf=next_leaf, values=values)
+        except BTreeError:
+            raise
         except Exception as e:
             raise BTreeError(f"Failed to deserialize B-tree node: {e}")
 
 class BTree:
-    def __init__(self, pager):
+    """B+tree in Pager pages mapping keys to byte-string values.
+
+    Keys may be None, int, str, bytes or tuples of those and must fit in
+    a quarter of a page. Values may be any size: large ones keep a short
+    prefix in the leaf and spill the rest to a chain of overflow pages,
+    read only when asked for. Nodes split by bytes, so a page holds as
+    many entries as fit. Decoded nodes are cached by the Pager until their
+    page is dirtied or evicted, so lookups through hot pages bisect plain
+    Python lists; inserts change leaves in the page buffer and decode a
+    node only to split it.
+
+    With `truncate_keys` (the default), a leaf split pushes up the
+    shortest key that separates the halves rather than a whole key, and
+    internal nodes store the prefix shared by their keys once, raising
+    fan-out for long, similar keys. The root page number never changes:
+    when the root splits, its contents move to a new page and the root
+    becomes an internal node above the two halves. `max_keys` optionally
+    caps the keys per node, mainly to exercise splits with small trees."""
+
+    def __init__(self, pager, root_page_num=None, max_keys=None, truncate_keys=True):
         self.pager = pager
         self.page_size = pager.page_size
-        self.root_page_num = 0
+        if max_keys is not None and max_keys < 2:
+            raise BTreeError("max_keys must be at least 2")
+        self.max_keys = max_keys
+        self.max_cell = max_cell_size(self.page_size)
+        self.truncate_keys = truncate_keys
+        self.version = 0                # bumped by every change, so open cursors know to re-seek
+
+        if root_page_num is None or root_page_num >= pager.num_pages:
+            self.root_page_num = pager.allocate_page()
+            self._write_node(self.root_page_num, BTreeNode(is_leaf=True))
+            return
+
+        self.root_page_num = root_page_num
         try:
-            self.root = self._load_node(self.root_page_num)
+            self._load_node(self.root_page_num)
         except BTreeError:
-            self.root = BTreeNode(is_leaf=True)
-            self._write_node(self.root_page_num, self.root)
+            self._write_node(self.root_page_num, BTreeNode(is_leaf=True))
+
+    @property
+    def root(self):
+        return self._load_node(self.root_page_num)
 
     def _load_node(self, page_num):
+        """The decoded node in `page_num`, from the Pager's decoded-page cache.
+
+        The node is shared with other readers: copy() it before changing it."""
         try:
-            page = self.pager.get_page(page_num)
-            node = BTreeNode.deserialize(page.data)
-            logger.debug(f"Loaded node from page {page_num}: {node.keys}")
-            return node
+            return self.pager.get_decoded(page_num, BTreeNode.deserialize)
         except Exception as e:
             raise BTreeError(f"Error loading node from page {page_num}: {e}")
 
     def _write_node(self, page_num, node):
         try:
-            page = self.pager.get_page(page_num)
-            serialized = node.serialize()
-            page.data = serialized
-            self.pager.mark_dirty(page)
-            logger.debug(f"Wrote node to page {page_num} with keys: {node.keys}")
+            with self.pager.pinned(page_num) as page:
+                node.serialize_into(page.writable(), self.truncate_keys)
+                self.pager.mark_dirty(page)
         except Exception as e:
             raise BTreeError(f"Error writing node to page {page_num}: {e}")
 
-    def insert(self, key):
-        if key in self.root.keys:
-            logger.warning(f"Key {key} already exists in root.")
+    def _has_room(self, slotted, cell):
+        return ((self.max_keys is None or slotted.cell_count < self.max_keys)
+                and slotted.free_space() >= len(cell) + CELL_POINTER.size)
+
+    def _insert_cell(self, page, index, cell, right_page=None):
+        """Add one cell to a (pinned) page in place; only the cell pointers after it move."""
+        slotted = SlottedPage(page.writable())
+        if not slotted.insert_cell(index, cell):
+            raise BTreeError(f"No room for a {len(cell)}-byte cell in page {page.number}")
+        if right_page is not None:
+            slotted.set_child(index + 1, right_page)
+        self.pager.mark_dirty(page)
+
+    def _fits(self, node):
+        return ((self.max_keys is None or len(node.keys) <= self.max_keys)
+                and node.encoded_size(self.truncate_keys) <= self.page_size)
+
+    def check_key(self, key):
+        """Raise BTreeError unless `key` can be stored in this tree (see _encode_key)."""
+        self._encode_key(key)
+
+    def _encode_key(self, key):
+        encoded = encode_key(key)
+        if LEAF_CELL.size + len(encoded) + OVERFLOW_POINTER.size > self.max_cell:
+            raise BTreeError(f"Key {key!r} takes {len(encoded)} bytes; at most "
+                             f"{self.max_cell - LEAF_CELL.size - OVERFLOW_POINTER.size} fit in a "
+                             f"{self.page_size}-byte page")
+        return encoded
+
+    def _store_value(self, encoded, value):
+        """The value as kept in the leaf: bytes, or an OverflowValue after spilling its tail."""
+        value = bytes(value)
+        local = local_value_size(self.page_size, len(encoded), len(value))
+        if local == len(value):
+            return value
+        return OverflowValue(value[:local], len(value), write_chain(self.pager, value[local:]))
+
+    def _load_value(self, value):
+        return bytes(Payload(self.pager, value))
+
+    def _separator(self, left, right):
+        """Key to push up between a node ending in `left` and one starting with `right`.
+
+        With truncation, the shortest prefix of `right` that still sorts
+        after `left`."""
+        if not self.truncate_keys:
+            return right
+        return right[:len(common_prefix(left, right)) + 1]
+
+    def insert(self, key, value=b""):
+        encoded = self._encode_key(key)
+        value = self._store_value(encoded, value)
+        split = self._insert(self.root_page_num, encoded, value)
+        if split is _DUPLICATE:
+            if isinstance(value, OverflowValue):
+                free_chain(self.pager, value.first_page)
+            logger.warning(f"Key {key!r} already exists.")
+            return
+        self.version += 1
+        if split:
+            self._promote_root(*split)
+
+    def delete(self, key):
+        """Remove `key` and free its overflow pages; returns False if it was not there.
+
+        The cell is removed from its leaf in place. A node left underfull
+        is merged with a sibling when the two fit in one page, freeing the
+        other page, or else takes entries from it; underflow can climb to
+        the root, which shrinks the tree by a level once it has one child.
+        A page an open cursor has pinned is never freed: that merge is
+        skipped and the node stays underfull until a later delete."""
+        return self._remove(encode_key(key))
+
+    def _remove(self, key):
+        if self._delete(self.root_page_num, key) is None:
+            return False
+        self.version += 1
+        self._collapse_root()
+        return True
+
+    def _underfull(self, count, used):
+        if count == 0:
+            return True
+        if self.max_keys is not None:
+            return count < self.max_keys // 2
+        return used < self.page_size // 4
+
+    def _delete(self, page_num, key):
+        """Delete below `page_num`: None if the key is missing, else whether the page is now underfull."""
+        with self.pager.pinned(page_num) as page:
+            slotted = SlottedPage(page.data)
+            if slotted.is_leaf:
+                i = slotted.bisect_left(key)
+                if i == slotted.cell_count or slotted.key(i) != key:
+                    return None
+                self._delete_cell(page, i)
+                slotted = SlottedPage(page.data)
+                return self._underfull(slotted.cell_count, self.page_size - slotted.free_space())
+
+        node = self._load_node(page_num)
+        i = bisect_right(node.keys, key)
+        underfull = self._delete(node.children[i], key)
+        if not underfull:
+            return underfull
+        return self._rebalance(page_num, i)
+
+    def _delete_cell(self, page, index):
+        """Remove one cell from a (pinned) leaf in place and free its overflow chain."""
+        slotted = SlottedPage(page.writable())
+        value = slotted.stored_value(index)
+        slotted.delete_cell(index)
+        self.pager.mark_dirty(page)
+        if isinstance(value, OverflowValue):
+            free_chain(self.pager, value.first_page)
+
+    def _rebalance(self, page_num, index):
+        """Fix underfull child `index` of internal node `page_num` using a neighbour.
+
+        Returns whether `page_num` itself is underfull afterwards."""
+        parent = self._load_node(page_num).copy()
+        if len(parent.children) == 1:
+            return True                 # a root whose collapse is still pending
+        i = index - 1 if index > 0 else index          # merge or share with the left neighbour if there is one
+        left_page, right_page = parent.children[i], parent.children[i + 1]
+        left, right = self._load_node(left_page), self._load_node(right_page)
+
+        if left.is_leaf:
+            merged = BTreeNode(keys=left.keys + right.keys, values=left.values + right.values, is_leaf=True,
+                               prev_leaf=left.prev_leaf, next_leaf=right.next_leaf)
+        else:
+            merged = BTreeNode(keys=left.keys + [parent.keys[i]] + right.keys,
+                               children=left.children + right.children, is_leaf=False)
+
+        if self._fits(merged):
+            if self.pager.is_pinned(right_page):
+                return False            # an open cursor is on it: leave the child underfull for now
+            self._write_node(left_page, merged)
+            if merged.is_leaf and merged.next_leaf:
+                self._relink(merged.next_leaf, prev_leaf=left_page)
+            self.pager.free_page(right_page)
+            del parent.keys[i]
+            del parent.children[i + 1]
+        else:
+            left, right, separator = self._redistribute(merged)
+            if left.is_leaf:
+                left.next_leaf, right.prev_leaf = right_page, left_page
+            old_separator, parent.keys[i] = parent.keys[i], separator
+            if not self._fits(parent):
+                # a longer separator would overflow the parent: leave the child underfull instead
+                parent.keys[i] = old_separator
+                return False
+            self._write_node(left_page, left)
+            self._write_node(right_page, right)
+
+        self._write_node(page_num, parent)
+        return self._underfull(len(parent.keys), parent.encoded_size(self.truncate_keys))
+
+    def _redistribute(self, merged):
+        """Split the entries of two siblings evenly by bytes: (left, right, separator)."""
+        if merged.is_leaf:
+            sizes = [len(key) + stored_length(value) for key, value in zip(merged.keys, merged.values)]
+            mid = self._split_point(sizes, 1, len(merged.keys) - 1)
+            left = BTreeNode(keys=merged.keys[:mid], values=merged.values[:mid], is_leaf=True,
+                             prev_leaf=merged.prev_leaf)
+            right = BTreeNode(keys=merged.keys[mid:], values=merged.values[mid:], is_leaf=True,
+                              next_leaf=merged.next_leaf)
+            return left, right, self._separator(left.keys[-1], right.keys[0])
+        mid = self._split_point([len(key) for key in merged.keys], 1, len(merged.keys) - 2)
+        left = BTreeNode(keys=merged.keys[:mid], children=merged.children[:mid + 1], is_leaf=False)
+        right = BTreeNode(keys=merged.keys[mid + 1:], children=merged.children[mid + 1:], is_leaf=False)
+        return left, right, merged.keys[mid]
+
+    def _collapse_root(self):
+        # an internal root left with a single child: pull the child up into the (stable) root page
+        root = self._load_node(self.root_page_num)
+        if root.is_leaf or root.keys:
             return
-        self.root.keys.append(key)
-        self.root.keys.sort()
-        self._write_node(self.root_page_num, self.root)
-        logger.info(f"Inserted key {key} into root node.")
+        child_page = root.children[0]
+        if self.pager.is_pinned(child_page):
+            return              # retried after the next delete
+        self._write_node(self.root_page_num, self._load_node(child_page))
+        self.pager.free_page(child_page)
+        logger.info(f"Root collapsed: tree shrank to height {self.height()}")
+
+    def drop(self):
+        """Free every page of the tree, root and overflow chains included."""
+        pending = [self.root_page_num]
+        while pending:
+            page_num = pending.pop()
+            node = self._load_node(page_num)
+            if node.is_leaf:
+                for value in node.values:
+                    if isinstance(value, OverflowValue):
+                        free_chain(self.pager, value.first_page)
+            else:
+                pending.extend(node.children)
+            self.pager.free_page(page_num)
+        self.version += 1
+
+    def _insert(self, page_num, key, value):
+        """Insert below `page_num`; returns (separator, right page) if the page split.
+
+        Internal nodes on the path down come from the decoded-node cache;
+        the leaf is searched and changed in its page buffer, since every
+        insert dirties it. Only a page that overflows is decoded to split."""
+        with self.pager.pinned(page_num) as page:
+            slotted = SlottedPage(page.data)
+            is_leaf = slotted.is_leaf
+            if is_leaf:
+                i = slotted.bisect_left(key)
+                if i < slotted.cell_count and slotted.key(i) == key:
+                    return _DUPLICATE
+                cell = leaf_cell(key, value)
+                if self._has_room(slotted, cell):
+                    self._insert_cell(page, i, cell)
+                    return None
+        if is_leaf:
+            return self._split_leaf(page_num, i, key, value)
+
+        node = self._load_node(page_num)
+        i = bisect_right(node.keys, key)
+        child_page = node.children[i]
+
+        split = self._insert(child_page, key, value)
+        if not split or split is _DUPLICATE:
+            return split
+
+        separator, right_page = split
+        with self.pager.pinned(page_num) as page:
+            slotted = SlottedPage(page.data)
+            prefix = slotted.prefix()
+            if separator.startswith(prefix):
+                # the separator's cell points left at the split child; the slot after it now leads right
+                cell = internal_cell(child_page, separator[len(prefix):])
+                if self._has_room(slotted, cell):
+                    self._insert_cell(page, i, cell, right_page)
+                    return None
+
+        node = self._load_node(page_num).copy()
+        node.keys.insert(i, separator)
+        node.children.insert(i + 1, right_page)
+        if self._fits(node):
+            self._write_node(page_num, node)            # the shared prefix got shorter
+            return None
+        return self._split_internal(page_num, node)
+
+    @staticmethod
+    def _split_point(sizes, low, high):
+        """First index whose entry lies mostly past the byte midpoint, clamped to [low, high]."""
+        half, running = sum(sizes) / 2, 0
+        for i, size in enumerate(sizes):
+            if running + size / 2 >= half:
+                return min(max(i, low), high)
+            running += size
+        return high
+
+    def _split_leaf(self, page_num, index, key, value):
+        node = self._load_node(page_num).copy()
+        node.keys.insert(index, key)
+        node.values.insert(index, value)
+        sizes = [len(key) + stored_length(value) for key, value in zip(node.keys, node.values)]
+        mid = self._split_point(sizes, 1, len(node.keys) - 1)
+        right_page = self.pager.allocate_page()
+        right = BTreeNode(keys=node.keys[mid:], values=node.values[mid:], is_leaf=True,
+                          prev_leaf=page_num, next_leaf=node.next_leaf)
+        node.keys, node.values = node.keys[:mid], node.values[:mid]
+        if node.next_leaf:
+            self._relink(node.next_leaf, prev_leaf=right_page)
+        node.next_leaf = right_page
+        self._write_node(right_page, right)
+        self._write_node(page_num, node)
+        return self._separator(node.keys[-1], right.keys[0]), right_page
+
+    def _split_internal(self, page_num, node):
+        mid = self._split_point([len(key) for key in node.keys], 1, len(node.keys) - 2)
+        separator = node.keys[mid]                  # moves up, kept in neither half
+        right = BTreeNode(keys=node.keys[mid + 1:], children=node.children[mid + 1:], is_leaf=False)
+        node.keys = node.keys[:mid]
+        node.children = node.children[:mid + 1]
+        right_page = self.pager.allocate_page()
+        self._write_node(right_page, right)
+        self._write_node(page_num, node)
+        return separator, right_page
+
+    def _promote_root(self, separator, right_page):
+        # keep the root page number stable: move the old root's left half to a new page
+        left_page = self.pager.allocate_page()
+        left = self._load_node(self.root_page_num)
+        self._write_node(left_page, left)
+        if left.is_leaf:
+            self._relink(right_page, prev_leaf=left_page)
+        self._write_node(self.root_page_num, BTreeNode(keys=[separator], children=[left_page, right_page],
+                                                       is_leaf=False))
+        logger.info(f"Root split: tree grew to height {self.height()}")
+
+    def _relink(self, page_num, **links):
+        node = self._load_node(page_num).copy()
+        for name, value in links.items():
+            setattr(node, name, value)
+        self._write_node(page_num, node)
+
+    def bulk_load(self, items, fill_factor=0.9, with_values=False):
+        """Build the tree bottom-up from entries in strictly increasing key order.
+
+        `items` are keys, or (key, value) pairs if `with_values`. Leaves are
+        filled to `fill_factor` of a page left to right, then each internal
+        level is built from the one below, all on freshly allocated pages.
+        Every page is written exactly once; the top node goes into the root
+        page. The tree must be empty. Returns the number of entries."""
+        if not 0 < fill_factor <= 1:
+            raise BTreeError(f"fill_factor must be in (0, 1], got {fill_factor}")
+        root = self.root
+        if not root.is_leaf or root.keys:
+            raise BTreeError("bulk_load requires an empty tree")
+        self.version += 1
+        budget = int((self.page_size - PAGE_HEADER.size) * fill_factor)
+
+        level = []                  # (separator before it, page) of every node on the level being built
+        pending = None              # last full leaf, written once the leaf after it has a page
+        pending_page = 0
+        current, used = BTreeNode(is_leaf=True), 0
+        previous = last_key = None
+        count = 0
+        for item in items:
+            key, value = item if with_values else (item, b"")
+            encoded = self._encode_key(key)
+            if previous is not None and encoded <= previous:
+                raise BTreeError(f"bulk_load input not strictly increasing at key {key!r}")
+            previous = encoded
+            count += 1
+
+            value = self._store_value(encoded, value)
+            size = LEAF_CELL.size + CELL_POINTER.size + len(encoded) + stored_length(value)
+            if current.keys and (used + size > budget or len(current.keys) == self.max_keys):
+                if pending is not None:
+                    pending_page = pending_page or self.pager.allocate_page()
+                    next_page = self.pager.allocate_page()
+                    self._append_leaf(level, pending_page, pending, next_page, last_key)
+                    last_key = pending.keys[-1]
+                    pending_page = next_page
+                pending, current, used = current, BTreeNode(is_leaf=True), 0
+            current.keys.append(encoded)
+            current.values.append(value)
+            used += size
+
+        if pending is None:
+            # everything fits in a single leaf: the root itself
+            self._write_node(self.root_page_num, current)
+            return count
+
+        tail = [pending, current]
+        if used < budget // 2:
+            # avoid an underfull last leaf: share the last two leaves' entries by bytes
+            keys, values = pending.keys + current.keys, pending.values + current.values
+            mid = self._split_point([len(k) + stored_length(v) for k, v in zip(keys, values)], 1, len(keys) - 1)
+            tail = [BTreeNode(keys=keys[:mid], values=values[:mid]), BTreeNode(keys=keys[mid:], values=values[mid:])]
+        pages = [pending_page or self.pager.allocate_page(), self.pager.allocate_page()]
+        self._append_leaf(level, pages[0], tail[0], pages[1], last_key)
+        self._append_leaf(level, pages[1], tail[1], 0, tail[0].keys[-1])
+
+        while not self._fits(self._internal_node(level)):
+            level = [(group[0][0], self._write_new_node(self._internal_node(group)))
+                     for group in self._pack_groups(level, budget)]
+
+        self._write_node(self.root_page_num, self._internal_node(level))
+        logger.info(f"Bulk loaded {count} keys, tree height {self.height()}")
+        return count
+
+    def _append_leaf(self, level, page_num, node, next_leaf, previous_last_key):
+        node.prev_leaf = level[-1][1] if level else 0
+        node.next_leaf = next_leaf
+        self._write_node(page_num, node)
+        separator = node.keys[0] if previous_last_key is None else self._separator(previous_last_key, node.keys[0])
+        level.append((separator, page_num))
+
+    def _write_new_node(self, node):
+        page_num = self.pager.allocate_page()
+        self._write_node(page_num, node)
+        return page_num
+
+    @staticmethod
+    def _internal_node(entries):
+        """Internal node over (separator, page) entries; the leftmost separator belongs to the parent."""
+        return BTreeNode(keys=[key for key, _ in entries[1:]], children=[page for _, page in entries], is_leaf=False)
+
+    def _pack_groups(self, entries, budget):
+        """Split one level's entries into parent-sized groups of at least two children each."""
+        groups, group, used = [], [], 0
+        for entry in entries:
+            size = INTERNAL_CELL.size + CELL_POINTER.size + len(entry[0])
+            full = used + size > budget or (self.max_keys is not None and len(group) > self.max_keys)
+            if len(group) >= 2 and full:
+                groups.append(group)
+                group, used = [], 0
+            if group:
+                used += size                        # a group's first key goes to the parent, not this node
+            group.append(entry)
+
+        if groups and (len(group) < 2 or used < budget // 2):
+            # avoid an underfull last node: share the last two groups' entries by bytes
+            merged = groups.pop() + group
+            if len(merged) < 4:
+                groups.append(merged)
+            else:
+                mid = self._split_point([len(key) for key, _ in merged], 2, len(merged) - 2)
+                groups += [merged[:mid], merged[mid:]]
+        else:
+            groups.append(group)
+        return groups
+
+    def get(self, key):
+        """Value stored under `key` (read whole, overflow included), or None."""
+        encoded = encode_key(key)
+        page_num = self.root_page_num
+        while True:
+            node = self.pager.peek_decoded(page_num)
+            if node is None:
+                with self.pager.pinned(page_num) as page:
+                    slotted = SlottedPage(page.data)
+                    if slotted.is_leaf:
+                        # leaves change with every insert: search the buffer instead of decoding it
+                        i = slotted.bisect_left(encoded)
+                        if i == slotted.cell_count or slotted.key(i) != encoded:
+                            return None
+                        value = slotted.stored_value(i)
+                        break
+                node = self._load_node(page_num)
+            if node.is_leaf:
+                i = bisect_left(node.keys, encoded)
+                if i == len(node.keys) or node.keys[i] != encoded:
+                    return None
+                value = node.values[i]
+                break
+            page_num = node.children[bisect_right(node.keys, encoded)]
+        return self._load_value(value)
 
     def search(self, key):
-        return key in self.root.keys
+        return self.get(key) is not None
+
+    def height(self):
+        height, node = 1, self._load_node(self.root_page_num)
+        while not node.is_leaf:
+            node = self._load_node(node.children[0])
+            height += 1
+        return height
+
+    def cursor(self):
+        return BTreeCursor(self)
+
+    def keys(self):
+        """All keys in order (walks the leaf chain)."""
+        with self.cursor() as cursor:
+            return list(cursor.range())
+
+class BTreeCursor:
+    """Ordered position over the entries of a BTree.
+
+    seek/first/last descend from the root once; after that the cursor
+    follows the leaf sibling links, decoding each leaf once and keeping
+    only the current leaf pinned until it moves on or is closed. If the
+    tree is written while a cursor is open, its next step seeks back to
+    the key it was on, so rows can be updated or deleted mid-scan."""
+
+    def __init__(self, tree):
+        self.tree = tree
+        self.pager = tree.pager
+        self.page = None            # current leaf page, pinned
+        self.node = None
+        self.index = 0
+        self.version = tree.version
+        self.owns_node = False      # self.node is a private copy, not the shared cached one
+        self.deleted = False        # the entry under the cursor was deleted; the index already points past it
+
+    @property
+    def valid(self):
+        return self.node is not None and 0 <= self.index < len(self.node.keys)
+
+    @property
+    def key(self):
+        if not self.valid:
+            raise BTreeError("Cursor is not positioned on a key")
+        return decode_key(self.node.keys[self.index])
+
+    @property
+    def encoded_key(self):
+        """The current key as stored (see backend.key_encoding), without decoding it."""
+        if not self.valid:
+            raise BTreeError("Cursor is not positioned on a key")
+        return self.node.keys[self.index]
+
+    @property
+    def value(self):
+        return bytes(self.payload)
+
+    @property
+    def payload(self):
+        """Lazy access to the current value: overflow pages are read only for the bytes requested."""
+        if not self.valid:
+            raise BTreeError("Cursor is not positioned on a key")
+        return Payload(self.pager, self.node.values[self.index])
+
+    def payloads(self, limit):
+        """Payloads of up to `limit` entries, from the current one to the end of its leaf at most.
+
+        Leaves the cursor on the last entry returned, so next() continues after it."""
+        if not self.valid:
+            raise BTreeError("Cursor is not positioned on a key")
+        end = min(len(self.node.keys), self.index + limit)
+        values = self.node.values[self.index:end]
+        self.index = end - 1
+        pager = self.pager
+        return [Payload(pager, value) for value in values]
+
+    def seek(self, key):
+        """Position at the first key >= `key`; returns False if there is none."""
+        encoded = encode_key(key)
+        self._descend(lambda node: bisect_right(node.keys, encoded))
+        self.index = bisect_left(self.node.keys, encoded)
+        return self._settle_forward()
+
+    def first(self):
+        self._descend(lambda node: 0)
+        self.index = 0
+        return self._settle_forward()
+
+    def last(self):
+        self._descend(lambda node: len(node.keys))
+        self.index = len(self.node.keys) - 1
+        return self._settle_backward()
+
+    def next(self):
+        if self.node is None:
+            return False
+        if self._reseek():
+            self.deleted = False
+            return self._settle_forward()
+        if self.deleted:
+            self.deleted = False
+        else:
+            self.index += 1
+        return self._settle_forward()
+
+    def prev(self):
+        if self.node is None:
+            return False
+        self._reseek()
+        self.deleted = False
+        self.index -= 1
+        return self._settle_backward()
+
+    def delete(self):
+        """Delete the entry under the cursor; next() then moves to the entry that followed it.
+
+        The cell is removed from the pinned leaf in place, with no
+        re-decoding. A leaf the cursor thins out is left underfull rather
+        than rebalanced on every delete, so a scan deleting a run of rows
+        costs one merge per leaf, not one per row: only when the last
+        entry goes is the leaf released and merged away through
+        BTree.delete, and the cursor seeks to the entry after the deleted
+        one. Either way it is left on that entry, so delete() can be
+        called again without next()."""
+        if not self.valid or self.page is None:
+            raise BTreeError("Cursor is not positioned on a key")
+        tree = self.tree
+        if (self.version != tree.version
+                or self.page.number != tree.root_page_num and len(self.node.keys) == 1):
+            encoded = self.node.keys[self.index]
+            self.close()                            # the leaf may be merged away
+            tree._remove(encoded)
+            self._seek_encoded(encoded)
+        else:
+            tree._delete_cell(self.page, self.index)
+            tree.version += 1
+            self.version = tree.version
+            if not self.owns_node:
+                self.node, self.owns_node = self.node.copy(), True
+            del self.node.keys[self.index]
+            del self.node.values[self.index]
+            self._settle_forward()
+        self.deleted = True
+
+    def _seek_encoded(self, encoded):
+        # position on the stored key `encoded`, or on the first key after it
+        self._descend(lambda node: bisect_right(node.keys, encoded))
+        self.index = bisect_left(self.node.keys, encoded)
+        self._settle_forward()
+
+    def _reseek(self):
+        """After the tree changed, find the current key again; True if it has been deleted.
+
+        Leaves the index on the key, or on the first key after it."""
+        if self.version == self.tree.version or not self.valid:
+            return False
+        encoded = self.node.keys[self.index]
+        self._seek_encoded(encoded)
+        return not self.valid or self.node.keys[self.index] != encoded
+
+    def range(self, lo=None, hi=None, include_hi=False):
+        """Yield keys from `lo` (inclusive) up to `hi`; None leaves that end open."""
+        for _ in self._scan(lo, hi, include_hi):
+            yield decode_key(self.node.keys[self.index])
+
+    def items(self, lo=None, hi=None, include_hi=False):
+        """Like range(), yielding (key, value) pairs."""
+        for _ in self._scan(lo, hi, include_hi):
+            yield decode_key(self.node.keys[self.index]), self.value
+
+    def _scan(self, lo, hi, include_hi):
+        upper = None if hi is None else encode_key(hi)
+        found = self.first() if lo is None else self.seek(lo)
+        while found:
+            encoded = self.node.keys[self.index]
+            if upper is not None and (encoded > upper or (encoded == upper and not include_hi)):
+                return
+            yield
+            found = self.next()
+
+    def __iter__(self):
+        return self.range()
+
+    def close(self):
+        if self.page is not None:
+            self.pager.unpin(self.page)
+            self.page = None
+        self.node = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _descend(self, choose):
+        """Walk down from the root to a leaf, taking child `choose(node)` at each level."""
+        self.deleted = False
+        page_num = self.tree.root_page_num
+        node = self.tree._load_node(page_num)
+        while not node.is_leaf:
+            page_num = node.children[choose(node)]
+            node = self.tree._load_node(page_num)
+        self._enter(page_num)
+
+    def _enter(self, page_num):
+        """Move to leaf `page_num`, keeping it pinned while positioned there."""
+        self.close()
+        page = self.pager.get_page(page_num, pin=True)
+        try:
+            self.node = self.tree._load_node(page_num)
+        except Exception:
+            self.pager.unpin(page)
+            raise
+        self.page = page
+        self.version = self.tree.version
+        self.owns_node = False
+
+    def _settle_forward(self):
+        while self.index >= len(self.node.keys) and self.node.next_leaf:
+            self._enter(self.node.next_leaf)
+            self.index = 0
+        self.index = min(self.index, len(self.node.keys))     # past the end: prev() steps back onto the last key
+        return self.valid
+
+    def _settle_backward(self):
+        while self.index < 0 and self.node.prev_leaf:
+            self._enter(self.node.prev_leaf)
+            self.index = len(self.node.keys) - 1
+        self.index = max(self.index, -1)
+        return self.valid
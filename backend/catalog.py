@@ -0,0 +1,147 @@
+from backend.b_tree import BTree
+from backend.record import encode_record, Record
+from backend.table import Table, Index
+from backend.columnar import ColumnarTable
+from utils.errors import ExecutionError, BTreeError
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+KIND_TABLE = "table"
+KIND_INDEX = "index"
+KIND_TREE = "tree"      # a bare B-tree with no columns (e.g. the engine's test tree)
+KIND_COLUMNAR = "columnar"
+STORAGES = ("row", "columnar")
+
+
+class Catalog:
+    """The database schema, kept in the B-tree rooted at the header's schema_root.
+
+    Each entry maps an object name to the record [kind, root page, ...]:
+    column names for a table, the delta tree's root and the column names
+    for a columnar table, the table and column for an index. The catalog is read once when opened; creating or dropping
+    a table updates the entry on disk immediately. Tables are looked up
+    like a dict: `name in catalog`, `catalog[name]`."""
+
+    def __init__(self, pager):
+        self.pager = pager
+        self.tree = BTree(pager, root_page_num=pager.header.schema_root or None)
+        if not pager.header.schema_root:
+            pager.set_schema_root(self.tree.root_page_num)
+        self.tables = {}             # name -> Table
+        self.indexes = {}            # name -> Index
+        self.trees = {}              # name -> BTree
+
+        index_entries = []
+        with self.tree.cursor() as cursor:
+            for name, value in cursor.items():
+                try:
+                    kind, root_page, *details = Record(value).values()
+                except (ExecutionError, BTreeError, ValueError) as e:
+                    raise ExecutionError(f"Corrupt catalog entry '{name}': {e}")
+                if kind == KIND_TABLE:
+                    self.tables[name] = Table(pager, name, details, root_page)
+                elif kind == KIND_COLUMNAR:
+                    self.tables[name] = ColumnarTable(pager, name, details[1:], root_page, details[0])
+                elif kind == KIND_INDEX:
+                    index_entries.append((name, root_page, *details))
+                elif kind == KIND_TREE:
+                    self.trees[name] = BTree(pager, root_page_num=root_page)
+                else:
+                    raise ExecutionError(f"Unknown catalog entry kind '{kind}' for '{name}'")
+
+        for name, root_page, table_name, column in index_entries:
+            table = self[table_name]
+            self.indexes[name] = table.indexes[name] = Index(pager, name, table, column, root_page)
+        logger.debug(f"Loaded catalog: {len(self.tables)} tables, {len(self.indexes)} indexes, "
+                     f"{len(self.trees)} trees")
+
+    def __contains__(self, name):
+        return name in self.tables
+
+    def __getitem__(self, name):
+        if name not in self.tables:
+            raise ExecutionError(f"Table '{name}' not found")
+        return self.tables[name]
+
+    def __iter__(self):
+        return iter(self.tables)
+
+    def schema(self):
+        """Column names of every table, by table name."""
+        return {name: list(table.columns) for name, table in self.tables.items()}
+
+    def index_on(self, table_name, column):
+        """Name of an index on `table_name`.`column`, or None."""
+        table = self.tables.get(table_name)
+        if table is not None:
+            for index in table.indexes.values():
+                if index.column == column:
+                    return index.name
+        return None
+
+    def _check_free(self, name):
+        if name in self.tables or name in self.indexes or name in self.trees:
+            raise ExecutionError(f"Table: '{name}' already exists")
+
+    def create_table(self, name, columns, storage="row"):
+        if storage not in STORAGES:
+            raise ExecutionError(f"Unknown table storage '{storage}', expected one of {', '.join(STORAGES)}")
+        self._check_free(name)
+        if storage == "columnar":
+            table = ColumnarTable(self.pager, name, columns)
+            entry = [KIND_COLUMNAR, table.root_page, table.delta_page, *table.columns]
+        else:
+            table = Table(self.pager, name, columns)
+            entry = [KIND_TABLE, table.root_page, *table.columns]
+        self.tree.insert(name, encode_record(entry))
+        self.tables[name] = table
+        logger.info(f"Created {storage} table '{name}' at page {table.root_page}")
+        return table
+
+    def drop_table(self, name):
+        table = self[name]
+        for index_name in table.indexes:
+            self.tree.delete(index_name)
+            del self.indexes[index_name]
+        self.tree.delete(name)
+        del self.tables[name]
+        table.drop()
+        logger.info(f"Dropped table '{name}'")
+
+    def create_index(self, name, table_name, column):
+        """Index an existing table's column, building it from the rows already there."""
+        if name in self.indexes:
+            raise ExecutionError(f"Index '{name}' already exists")
+        self._check_free(name)
+        table = self[table_name]
+        if table.storage != "row":
+            raise ExecutionError(f"Cannot index {table.storage} table '{table_name}'")
+        index = Index(self.pager, name, table, column)
+        try:
+            count = index.build()
+        except Exception:
+            index.tree.drop()
+            raise
+        self.tree.insert(name, encode_record([KIND_INDEX, index.root_page, table_name, column]))
+        self.indexes[name] = table.indexes[name] = index
+        logger.info(f"Created index '{name}' on {table_name}({column}) with {count} entries")
+        return index
+
+    def drop_index(self, name):
+        if name not in self.indexes:
+            raise ExecutionError(f"Index '{name}' not found")
+        index = self.indexes.pop(name)
+        del index.table.indexes[name]
+        self.tree.delete(name)
+        index.tree.drop()
+        logger.info(f"Dropped index '{name}'")
+
+    def tree_named(self, name):
+        """The bare B-tree registered under `name`, created on first use."""
+        if name not in self.trees:
+            self._check_free(name)
+            tree = BTree(self.pager)
+            self.tree.insert(name, encode_record([KIND_TREE, tree.root_page_num]))
+            self.trees[name] = tree
+        return self.trees[name]
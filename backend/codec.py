@@ -0,0 +1,45 @@
+import zlib
+
+
+class PageCodec:
+    """Turns a logical page into the bytes stored on disk and back."""
+
+    name = "identity"
+
+    def encode(self, data):
+        return bytes(data)
+
+    def decode(self, data, page_size):
+        return bytes(data)
+
+
+class ZlibCodec(PageCodec):
+    name = "zlib"
+
+    def __init__(self, level=6):
+        self.level = level
+
+    def encode(self, data):
+        return zlib.compress(data, self.level)
+
+    def decode(self, data, page_size):
+        page = zlib.decompress(data, bufsize=page_size)
+        if len(page) != page_size:
+            raise ValueError(f"Decoded page is {len(page)} bytes, expected {page_size}")
+        return page
+
+
+CODECS = {
+    "identity": PageCodec,
+    "zlib": ZlibCodec,
+}
+
+
+def make_codec(codec):
+    """Build a codec from a name in CODECS, or return a PageCodec instance as is."""
+    if isinstance(codec, PageCodec):
+        return codec
+    try:
+        return CODECS[codec.lower()]()
+    except (KeyError, AttributeError):
+        raise ValueError(f"Unknown page codec {codec!r}, expected one of {sorted(CODECS)}")
@@ -0,0 +1,500 @@
+from array import array
+from itertools import chain, groupby, repeat
+from backend.b_tree import BTree
+from backend.record import encode_record, Record, Records
+from backend.schema import Schema
+from utils.errors import ExecutionError
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+SEGMENT_ROWS = 4096          # rows per column segment
+DELETED = -1                 # column position of a segment's list of deleted row offsets
+
+# segment encodings
+PLAIN = 0
+RLE = 1                      # (value, run length) pairs
+DICTIONARY = 2               # distinct values plus one small code per row
+
+# how a list of values is stored
+VALUES_INT = 1
+VALUES_FLOAT = 2
+VALUES_ANY = 3               # a record of the values, any types
+
+
+def encode_values(values):
+    """Typed bytes for a list of values: packed int64 / float64 when they are all ints / floats."""
+    kinds = set(map(type, values))
+    if kinds == {int}:
+        try:
+            return bytes([VALUES_INT]) + array("q", values).tobytes()
+        except OverflowError:
+            pass
+    elif kinds == {float}:
+        return bytes([VALUES_FLOAT]) + array("d", values).tobytes()
+    return bytes([VALUES_ANY]) + encode_record(values)
+
+
+def decode_values(data):
+    kind, body = data[0], bytes(data[1:])
+    if kind == VALUES_INT:
+        return array("q", body).tolist()
+    if kind == VALUES_FLOAT:
+        return array("d", body).tolist()
+    if kind == VALUES_ANY:
+        return Record(body).values()
+    raise ExecutionError(f"Unknown column value kind {kind}")
+
+
+def _zone(values):
+    """(min, max) of the non-NULL values if they all have one orderable type, else (None, None)."""
+    values = [value for value in values if value is not None]
+    kinds = set(map(type, values))
+    if len(kinds) == 1 and kinds <= {int, float, str}:
+        return min(values), max(values)
+    return None, None
+
+
+def encode_segment(values):
+    """One column's values for one segment, as the record [encoding, count, min, max, body].
+
+    Plain, run-length and dictionary bodies are all built and the
+    smallest one kept. The short fields come first in the record, so
+    they stay in the B-tree cell: checking a segment's min/max never
+    reads the body's overflow pages."""
+    candidates = [(PLAIN, encode_values(values))]
+    if len(set(map(type, values)) - {type(None)}) <= 1:    # 1 == 1.0 == True: only group values of one type
+        runs = [(value, len(list(run))) for value, run in groupby(values)]
+        if len(runs) <= len(values) // 2:
+            lengths = array("I", [length for _, length in runs])
+            candidates.append((RLE, encode_record([encode_values([value for value, _ in runs]),
+                                                   lengths.tobytes()])))
+        distinct = list(dict.fromkeys(values))
+        if len(distinct) <= min(len(values) // 2, 65536):
+            typecode = "B" if len(distinct) <= 256 else "H"
+            codes = array(typecode, map({value: i for i, value in enumerate(distinct)}.__getitem__, values))
+            candidates.append((DICTIONARY, encode_record([encode_values(distinct), typecode, codes.tobytes()])))
+    encoding, body = min(candidates, key=lambda candidate: len(candidate[1]))
+    low, high = _zone(values)
+    return encode_record([encoding, len(values), low, high, body])
+
+
+def decode_segment(record):
+    encoding, body = record[0], record[4]
+    if encoding == PLAIN:
+        return decode_values(body)
+    parts = Record(body)
+    if encoding == RLE:
+        lengths = array("I", parts[1])
+        return list(chain.from_iterable(map(repeat, decode_values(parts[0]), lengths)))
+    if encoding == DICTIONARY:
+        return list(map(decode_values(parts[0]).__getitem__, array(parts[1], parts[2])))
+    raise ExecutionError(f"Unknown segment encoding {encoding}")
+
+
+def zone_excludes(low, high, operator, value):
+    """True when no value in [low, high] can satisfy `<value in row> <operator> value`.
+
+    NULLs are left out of a segment's bounds, so != (which NULLs satisfy)
+    never excludes a segment."""
+    if low is None or type(low) is not type(value):
+        return False                # unknown or incomparable bounds: the rows must be looked at
+    if operator == "=":
+        return value < low or value > high
+    if operator == "<":
+        return low >= value
+    if operator == "<=":
+        return low > value
+    if operator == ">":
+        return high <= value
+    if operator == ">=":
+        return high < value
+    return False
+
+
+def _changes(old, new):
+    return old != new or type(old) is not type(new)        # 1 == 1.0, but they are stored differently
+
+
+class ColumnarTable:
+    """A table stored column by column, for scans that read a few columns of many rows.
+
+    Rows are appended to a row-format delta B-tree (rowid -> record). Each
+    time SEGMENT_ROWS rowids have been handed out, those rows move into a
+    new segment: one record per column (see encode_segment) in the
+    segments B-tree under (segment, column position), plus
+    (segment, DELETED) listing rows deleted before or after the move.
+    Rowids follow from positions, so a segment stores no rowids. Updates
+    to segment rows rewrite the changed columns' segments; a cursor
+    (ColumnarCursor.update/delete) collects a segment's changes and writes
+    each changed column and the deleted list once. Columnar tables have no
+    indexes."""
+
+    storage = "columnar"
+
+    def __init__(self, pager, name, columns, root_page=None, delta_page=None):
+        self.pager = pager
+        self.name = name
+        self.columns = list(columns)
+        self.schema = Schema(self.columns)
+        self.segments = BTree(pager, root_page_num=root_page)
+        self.delta = BTree(pager, root_page_num=delta_page)
+        self.indexes = {}
+        self._segment_count = None
+        self._next_rowid = None
+
+    @property
+    def root_page(self):
+        return self.segments.root_page_num
+
+    @property
+    def delta_page(self):
+        return self.delta.root_page_num
+
+    @property
+    def segment_count(self):
+        if self._segment_count is None:
+            with self.segments.cursor() as cursor:
+                self._segment_count = cursor.key[0] + 1 if cursor.last() else 0
+        return self._segment_count
+
+    def _new_rowid(self):
+        if self._next_rowid is None:
+            with self.delta.cursor() as cursor:
+                last = cursor.key if cursor.last() else 0
+            self._next_rowid = max(last, self.segment_count * SEGMENT_ROWS) + 1
+        rowid = self._next_rowid
+        self._next_rowid += 1
+        return rowid
+
+    def _check(self, values):
+        if len(values) != len(self.columns):
+            raise ExecutionError(f"Table '{self.name}' has {len(self.columns)} columns, got {len(values)} values")
+
+    def _record(self, values):
+        self._check(values)
+        return encode_record(values)
+
+    def insert(self, values):
+        record = self._record(values)
+        rowid = self._new_rowid()
+        self.delta.insert(rowid, record)
+        if rowid == (self.segment_count + 1) * SEGMENT_ROWS:
+            self._flush_segment()
+        logger.debug(f"Inserted row {rowid} into columnar '{self.name}'")
+        return rowid
+
+    def _flush_segment(self):
+        # the delta holds every live row of the next segment: move them into column segments
+        segment = self.segment_count
+        first = segment * SEGMENT_ROWS + 1
+        rows, deleted = [], []
+        with self.delta.cursor() as cursor:
+            found = cursor.seek(first)
+            for offset in range(SEGMENT_ROWS):
+                if found and cursor.key == first + offset:
+                    rows.append(Record(cursor.payload).values())
+                    cursor.delete()
+                    found = cursor.next()
+                else:
+                    rows.append([None] * len(self.columns))
+                    deleted.append(offset)
+
+        for position, values in enumerate(zip(*rows)):
+            self.segments.insert((segment, position), encode_segment(list(values)))
+        if deleted:
+            self.segments.insert((segment, DELETED), array("I", deleted).tobytes())
+        self._segment_count = segment + 1
+        logger.info(f"Moved rows {first}-{first + SEGMENT_ROWS - 1} of '{self.name}' into segment {segment}")
+
+    def _locate(self, rowid):
+        """(segment, offset) of a rowid that lives in a segment, or None for delta rows."""
+        segment, offset = divmod(rowid - 1, SEGMENT_ROWS)
+        return (segment, offset) if 0 <= segment < self.segment_count else None
+
+    def deleted_offsets(self, segment):
+        value = self.segments.get((segment, DELETED))
+        return set(array("I", value)) if value else set()
+
+    def _store_deleted(self, segment, deleted):
+        self.segments.delete((segment, DELETED))
+        self.segments.insert((segment, DELETED), array("I", sorted(deleted)).tobytes())
+
+    def _column(self, segment, position):
+        return decode_segment(Record(self.segments.get((segment, position))))
+
+    def _store_column(self, segment, position, values):
+        self.segments.delete((segment, position))
+        self.segments.insert((segment, position), encode_segment(values))
+
+    def _header(self, segment, position):
+        """(count, min, max) of a column segment, or None; read from the B-tree cell, never the body's overflow pages."""
+        with self.segments.cursor() as cursor:
+            if not cursor.seek((segment, position)) or cursor.key != (segment, position):
+                return None
+            record = Record(cursor.payload)
+            return record[1], record[2], record[3]
+
+    def _values(self, rowid):
+        location = self._locate(rowid)
+        if location is None:
+            value = self.delta.get(rowid)
+            if value is None:
+                raise ExecutionError(f"Row {rowid} not found in '{self.name}'")
+            return Record(value).values()
+        segment, offset = location
+        if offset in self.deleted_offsets(segment):
+            raise ExecutionError(f"Row {rowid} not found in '{self.name}'")
+        return [self._column(segment, position)[offset] for position in range(len(self.columns))]
+
+    def get(self, rowid):
+        try:
+            return self.row(self._values(rowid))
+        except ExecutionError:
+            return None
+
+    def row(self, values):
+        return self.schema.row(values)
+
+    def update(self, rowid, values):
+        record = self._record(values)
+        location = self._locate(rowid)
+        if location is None:
+            if not self.delta.delete(rowid):
+                raise ExecutionError(f"Row {rowid} not found in '{self.name}'")
+            self.delta.insert(rowid, record)
+            return
+        segment, offset = location
+        if offset in self.deleted_offsets(segment):
+            raise ExecutionError(f"Row {rowid} not found in '{self.name}'")
+        for position, value in enumerate(values):
+            column = self._column(segment, position)
+            if _changes(column[offset], value):
+                column[offset] = value
+                self._store_column(segment, position, column)
+
+    def delete(self, rowid):
+        location = self._locate(rowid)
+        if location is None:
+            if not self.delta.delete(rowid):
+                raise ExecutionError(f"Row {rowid} not found in '{self.name}'")
+            return
+        segment, offset = location
+        deleted = self.deleted_offsets(segment)
+        if offset in deleted:
+            raise ExecutionError(f"Row {rowid} not found in '{self.name}'")
+        deleted.add(offset)
+        self._store_deleted(segment, deleted)
+
+    def cursor(self, where=None):
+        return ColumnarCursor(self, where)
+
+    def index_scan(self, index_name, operator, value):
+        raise ExecutionError(f"Columnar table '{self.name}' has no indexes")
+
+    def segment_info(self):
+        """(segment, column, encoding, row count, min, max, stored bytes) of every column segment."""
+        info = []
+        with self.segments.cursor() as cursor:
+            for (segment, position), value in cursor.items():
+                if position != DELETED:
+                    record = Record(value)
+                    info.append((segment, self.columns[position], record[0], record[1], record[2], record[3],
+                                 len(value)))
+        return info
+
+    def drop(self):
+        self.segments.drop()
+        self.delta.drop()
+
+
+class ColumnarCursor:
+    """Walks a columnar table's rows in rowid order: the segments, then the delta.
+
+    Works like a TableCursor. A segment's columns are decoded the first
+    time a row of it needs them, so next_batch() reads only the columns
+    a query asks for. `where` (a parsed value_compare clause) lets whole
+    segments whose min/max rule it out be skipped unread; the rows that
+    are returned still have to be filtered by the caller.
+
+    update() and delete() of a segment row change the cursor's decoded
+    columns and deleted offsets only. The segment is written back when
+    the cursor leaves it or is closed: each changed column and the
+    deleted list once, however many of its rows changed. Until then other
+    readers of the table see the segment as it was."""
+
+    def __init__(self, table, where=None):
+        self.table = table
+        self.where = None
+        if where and where.get("type") == "value_compare" and where["column"] in table.columns:
+            self.where = (table.columns.index(where["column"]), where["operator"], str(where["value"]))
+        self.segment = -1
+        self.offsets = []            # live row offsets of the current segment
+        self.position = 0            # index into offsets of the next row to return
+        self.decoded = {}            # column position -> values of the current segment
+        self.deleted = set()         # deleted row offsets of the current segment
+        self.changed = set()         # positions of decoded columns with unwritten updates
+        self.deletes_changed = False
+        self.delta_cursor = None
+        self.in_delta = False
+        self.rowid = None
+        self.segments_skipped = 0
+
+    def _enter_next_segment(self):
+        table = self.table
+        self._write_segment()
+        while self.segment + 1 < table.segment_count:
+            self.segment += 1
+            if self.where and self._excluded(self.segment):
+                self.segments_skipped += 1
+                continue
+            header = table._header(self.segment, 0)
+            count = header[0] if header else 0
+            self.deleted = deleted = table.deleted_offsets(self.segment)
+            self.offsets = [offset for offset in range(count) if offset not in deleted]
+            self.position = 0
+            self.decoded = {}
+            if self.offsets:
+                return True
+        return False
+
+    def _write_segment(self):
+        for position in sorted(self.changed):
+            self.table._store_column(self.segment, position, self.decoded[position])
+        if self.deletes_changed:
+            self.table._store_deleted(self.segment, self.deleted)
+        self.changed = set()
+        self.deletes_changed = False
+
+    def _excluded(self, segment):
+        position, operator, value = self.where
+        header = self.table._header(segment, position)
+        return header is not None and zone_excludes(header[1], header[2], operator, value)
+
+    def _column(self, position):
+        values = self.decoded.get(position)
+        if values is None:
+            values = self.decoded[position] = self.table._column(self.segment, position)
+        return values
+
+    def next(self):
+        if not self.in_delta:
+            if self.position < len(self.offsets) or self._enter_next_segment():
+                offset = self.offsets[self.position]
+                self.position += 1
+                self.rowid = self.segment * SEGMENT_ROWS + offset + 1
+                return True
+            self.in_delta = True
+            self.delta_cursor = self.table.delta.cursor()
+            found = self.delta_cursor.first()
+        else:
+            found = self.delta_cursor.next()
+        self.rowid = self.delta_cursor.key if found else None
+        return found
+
+    @property
+    def record(self):
+        """The current row, indexed by column ordinal and decoded as it is read."""
+        if self.in_delta:
+            return Record(self.delta_cursor.payload)
+        return SegmentRecord(self.table, self.segment, self.decoded, self.offsets[self.position - 1])
+
+    def values(self):
+        return self.record.values()
+
+    def row(self):
+        return self.table.row(self.values())
+
+    def next_batch(self, size):
+        """Up to `size` following rows as Records-like columns; all from one segment, or from the delta."""
+        if not self.in_delta and (self.position < len(self.offsets) or self._enter_next_segment()):
+            offsets = self.offsets[self.position:self.position + size]
+            self.position += len(offsets)
+            self.rowid = self.segment * SEGMENT_ROWS + offsets[-1] + 1
+            return SegmentSlice(self.table, self.segment, self.decoded, offsets)
+        records = Records()
+        while len(records) < size and self.next():
+            records.extend(map(Record, self.delta_cursor.payloads(size - len(records))))
+            self.rowid = self.delta_cursor.key
+        return records
+
+    def update(self, values):
+        """Replace the current row's values; a segment row is written with the rest of its segment."""
+        if self.rowid is None:
+            raise ExecutionError("No current row to update")
+        if self.in_delta:
+            self.table.update(self.rowid, values)
+            return
+        self.table._check(values)
+        offset = self.offsets[self.position - 1]
+        for position, value in enumerate(values):
+            column = self._column(position)
+            if _changes(column[offset], value):
+                column[offset] = value
+                self.changed.add(position)
+
+    def delete(self):
+        if self.rowid is None:
+            raise ExecutionError("No current row to delete")
+        if self.in_delta:
+            self.delta_cursor.delete()
+        else:
+            self.deleted.add(self.offsets[self.position - 1])
+            self.deletes_changed = True
+
+    def close(self):
+        if not self.in_delta:
+            self._write_segment()
+        if self.delta_cursor is not None:
+            self.delta_cursor.close()
+        self.rowid = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class SegmentRecord:
+    """One row of a segment, read like a Record: a column is decoded for the whole segment when first read."""
+
+    def __init__(self, table, segment, decoded, offset):
+        self.table = table
+        self.segment = segment
+        self.decoded = decoded       # shared with the cursor while it is on this segment
+        self.offset = offset
+
+    def __len__(self):
+        return len(self.table.columns)
+
+    def __getitem__(self, position):
+        values = self.decoded.get(position)
+        if values is None:
+            values = self.decoded[position] = self.table._column(self.segment, position)
+        return values[self.offset]
+
+    def values(self):
+        return [self[position] for position in range(len(self))]
+
+
+class SegmentSlice:
+    """Some live rows of one segment, read a column at a time (see core.vectors.Batch)."""
+
+    def __init__(self, table, segment, decoded, offsets):
+        self.table = table
+        self.segment = segment
+        self.decoded = decoded       # shared with the cursor while it is on this segment
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def column(self, position):
+        values = self.decoded.get(position)
+        if values is None:
+            values = self.decoded[position] = self.table._column(self.segment, position)
+        offsets = self.offsets
+        if offsets[-1] - offsets[0] == len(offsets) - 1:          # no deleted rows inside the slice
+            return values[offsets[0]:offsets[-1] + 1]
+        return [values[offset] for offset in offsets]
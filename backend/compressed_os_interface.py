@@ -0,0 +1,270 @@
+import os
+import struct
+import time
+from utils.logger import get_logger
+from utils.errors import ExecutionError
+from backend.os_interface import SYNC_OFF
+from backend.codec import make_codec
+from backend.header import DatabaseHeader, HEADER, validate_page_size
+
+logger = get_logger(__name__)
+
+MAP_MAGIC = b"PYSQLMAP"
+MAP_HEADER = struct.Struct("<8sIII")      # magic, page size, slot size, entry count
+MAP_ENTRY = struct.Struct("<IIHHI")       # page number, first slot, slot count, flags, stored length
+
+FLAG_RAW = 0x1                            # stored uncompressed: encoding did not save a slot
+
+
+class CompressedOSInterface:
+    """Page codec layer between the Pager and an OSInterface.
+
+    Presents the OSInterface API for full-size logical pages, but stores
+    each page encoded (zlib by default) in as few fixed-size physical
+    slots of the underlying file as it needs. A mapping table
+    (logical page -> slots) lives in `<db>-map`.
+
+    Rewritten pages always go to fresh slots. The old slots only become
+    reusable after sync() has made the new data and the new map durable,
+    so the map on disk always points at valid page images."""
+
+    def __init__(self, os_interface, codec="zlib", slot_size=None):
+        self.os_interface = os_interface
+        self.codec = make_codec(codec)
+        self.slot_size = slot_size              # defaults to page_size // 8 for a new file
+        self.header = None
+        self.map_path = os_interface.filepath + "-map"
+
+        self.mapping = {}           # page_number -> (first_slot, slot_count, flags, stored_length)
+        self.free_runs = []         # sorted (first_slot, slot_count) runs available for reuse
+        self.pending_free = []      # runs released since the last sync
+        self.next_slot = 0
+
+        self.stats = {"pages_encoded": 0, "pages_decoded": 0, "logical_bytes": 0, "stored_bytes": 0,
+                      "encode_seconds": 0.0, "decode_seconds": 0.0}
+        logger.debug(f"Initialized page codec layer: {self.codec.name}")
+
+    # OSInterface API
+    @property
+    def page_size(self):
+        return self.os_interface.page_size
+
+    @property
+    def filepath(self):
+        return self.os_interface.filepath
+
+    @property
+    def file(self):
+        return self.os_interface.file
+
+    @property
+    def sync_level(self):
+        return self.os_interface.sync_level
+
+    @property
+    def file_size(self):
+        """Logical size: what the file would be uncompressed."""
+        return (max(self.mapping) + 1) * self.page_size if self.mapping else 0
+
+    @property
+    def physical_size(self):
+        return self.next_slot * self.slot_size
+
+    @property
+    def compression_ratio(self):
+        if not self.stats["stored_bytes"]:
+            return 1.0
+        return self.stats["logical_bytes"] / self.stats["stored_bytes"]
+
+    def report(self):
+        """Compression ratio and codec CPU cost so far."""
+        encoded = self.stats["pages_encoded"] or 1
+        decoded = self.stats["pages_decoded"] or 1
+        return {
+            "codec": self.codec.name,
+            "pages": len(self.mapping),
+            "logical_bytes": self.stats["logical_bytes"],
+            "stored_bytes": self.stats["stored_bytes"],
+            "compression_ratio": self.compression_ratio,
+            "encode_us_per_page": self.stats["encode_seconds"] / encoded * 1e6,
+            "decode_us_per_page": self.stats["decode_seconds"] / decoded * 1e6,
+        }
+
+    def open_file(self):
+        # the header sits in logical page 0, which is only readable through the map
+        self.os_interface.open_file(read_header=False)
+        if os.path.exists(self.map_path):
+            self._load_map()
+            page0 = self.read_page(0)
+            if len(page0) >= HEADER.size and not DatabaseHeader.is_blank(page0):
+                self.header = DatabaseHeader.parse(page0)
+        elif os.fstat(self.os_interface.file.fileno()).st_size:
+            raise ExecutionError(f"'{self.filepath}' has no page map; it is not a compressed database")
+        else:
+            self.slot_size = self.slot_size or self.page_size // 8
+        logger.info(f"Opened compressed database '{self.filepath}' ({len(self.mapping)} pages)")
+
+    def close_file(self):
+        if self.os_interface.file is not None:
+            self._save_map()
+        self.os_interface.close_file()
+
+    def read_page(self, page_number):
+        entry = self.mapping.get(page_number)
+        if entry is None:
+            return b""                          # past EOF, like OSInterface
+        first_slot, slot_count, flags, stored_length = entry
+
+        try:
+            stored = os.pread(self.os_interface.file.fileno(), stored_length, first_slot * self.slot_size)
+            if flags & FLAG_RAW:
+                return stored
+            start = time.perf_counter()
+            data = self.codec.decode(stored, self.page_size)
+            self.stats["decode_seconds"] += time.perf_counter() - start
+            self.stats["pages_decoded"] += 1
+            return data
+
+        except Exception as e:
+            logger.error(f"Error reading compressed page {page_number}: {e}")
+            raise ExecutionError("Error reading page ")
+
+    def read_pages(self, first_page, count):
+        pages = []
+        for page_number in range(first_page, first_page + count):
+            data = self.read_page(page_number)
+            if len(data) < self.page_size:
+                break
+            pages.append(data)
+        return pages
+
+    def write_page(self, page_number, data):
+        if self.os_interface.file is None:
+            raise RuntimeError("File not open. Use open_file() first.")
+        if len(data) != self.page_size:
+            raise ValueError(f"Data must be exactly {self.page_size} bytes")
+
+        try:
+            start = time.perf_counter()
+            stored = self.codec.encode(data)
+            self.stats["encode_seconds"] += time.perf_counter() - start
+            self.stats["pages_encoded"] += 1
+
+            flags = 0
+            if len(stored) > self.page_size - self.slot_size:
+                stored, flags = bytes(data), FLAG_RAW
+
+            slot_count = max(1, -(-len(stored) // self.slot_size))
+            first_slot = self._allocate_slots(slot_count)
+            self._pwrite_all(stored, first_slot * self.slot_size)
+
+            old = self.mapping.get(page_number)
+            if old is not None:
+                self.pending_free.append((old[0], old[1]))
+                self.stats["logical_bytes"] -= self.page_size
+                self.stats["stored_bytes"] -= old[1] * self.slot_size
+            self.mapping[page_number] = (first_slot, slot_count, flags, len(stored))
+            self.stats["logical_bytes"] += self.page_size
+            self.stats["stored_bytes"] += slot_count * self.slot_size
+            logger.debug(f"Wrote page {page_number} as {len(stored)} bytes in {slot_count} slots at slot {first_slot}")
+
+        except Exception as e:
+            logger.error(f"Error writing compressed page {page_number}: {e}")
+            raise ExecutionError("Error writing page")
+
+    def _pwrite_all(self, data, offset):
+        # pwrite may take only part of the data; a truncated slot run would not decode
+        fd = self.os_interface.file.fileno()
+        remainder = memoryview(data)
+        while remainder:
+            n = os.pwrite(fd, remainder, offset)
+            if not n:
+                raise OSError(f"Write at offset {offset} made no progress")
+            remainder = remainder[n:]
+            offset += n
+
+    def write_pages(self, first_page, pages):
+        for page_number, data in enumerate(pages, start=first_page):
+            self.write_page(page_number, data)
+
+    def sync(self):
+        self.os_interface.sync()            # page images first, then the map pointing at them
+        self._save_map()
+        self._release_pending()
+
+    # slot management
+    def _allocate_slots(self, count):
+        for i, (first, length) in enumerate(self.free_runs):
+            if length >= count:
+                if length == count:
+                    del self.free_runs[i]
+                else:
+                    self.free_runs[i] = (first + count, length - count)
+                return first
+        first = self.next_slot
+        self.next_slot += count
+        return first
+
+    def _release_pending(self):
+        runs = sorted(self.free_runs + self.pending_free)
+        self.pending_free = []
+        merged = []
+        for first, length in runs:
+            if merged and merged[-1][0] + merged[-1][1] == first:
+                merged[-1] = (merged[-1][0], merged[-1][1] + length)
+            else:
+                merged.append((first, length))
+        self.free_runs = merged
+
+    # mapping table
+    def _save_map(self):
+        parts = [MAP_HEADER.pack(MAP_MAGIC, self.page_size, self.slot_size, len(self.mapping))]
+        for page_number in sorted(self.mapping):
+            first_slot, slot_count, flags, stored_length = self.mapping[page_number]
+            parts.append(MAP_ENTRY.pack(page_number, first_slot, slot_count, flags, stored_length))
+
+        tmp_path = self.map_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(b"".join(parts))
+            if self.sync_level != SYNC_OFF:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, self.map_path)
+        if self.sync_level != SYNC_OFF:
+            self._sync_directory()
+
+    def _sync_directory(self):
+        # the rename is only durable once the directory is: until then a crash
+        # can bring back the old map, so its slots must not be reused before this
+        fd = os.open(os.path.dirname(os.path.abspath(self.map_path)), os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _load_map(self):
+        with open(self.map_path, "rb") as f:
+            raw = f.read()
+        magic, page_size, slot_size, count = MAP_HEADER.unpack_from(raw, 0)
+        if magic != MAP_MAGIC:
+            raise ExecutionError(f"'{self.map_path}' is not a page map")
+        self.os_interface.page_size = validate_page_size(page_size)
+        self.slot_size = slot_size
+
+        used = []
+        for i in range(count):
+            page_number, first_slot, slot_count, flags, stored_length = \
+                MAP_ENTRY.unpack_from(raw, MAP_HEADER.size + i * MAP_ENTRY.size)
+            self.mapping[page_number] = (first_slot, slot_count, flags, stored_length)
+            used.append((first_slot, slot_count))
+            self.stats["logical_bytes"] += self.page_size
+            self.stats["stored_bytes"] += slot_count * self.slot_size
+
+        # every slot not referenced by the map is free (including those of torn writes)
+        used.sort()
+        cursor = 0
+        for first, length in used:
+            if first > cursor:
+                self.free_runs.append((cursor, first - cursor))
+            cursor = max(cursor, first + length)
+        self.next_slot = cursor
@@ -0,0 +1,67 @@
+import struct
+from utils.errors import ExecutionError
+
+HEADER_MAGIC = b"PySQLite format\x00"
+FORMAT_VERSION = 1
+# magic, format version, reserved, page size, page count, free-list trunk, free page count, schema root
+HEADER = struct.Struct("<16sHHIIIII")
+
+MIN_PAGE_SIZE = 1024
+MAX_PAGE_SIZE = 65536
+
+# Free-list trunk page: next trunk, leaf count, then leaf page numbers
+TRUNK_HEADER = struct.Struct("<II")
+TRUNK_LEAF = struct.Struct("<I")
+
+
+def validate_page_size(page_size):
+    if not MIN_PAGE_SIZE <= page_size <= MAX_PAGE_SIZE or page_size & (page_size - 1):
+        raise ExecutionError(f"Invalid page size {page_size}: must be a power of two "
+                             f"between {MIN_PAGE_SIZE} and {MAX_PAGE_SIZE}")
+    return page_size
+
+
+class DatabaseHeader:
+    """Self-describing database metadata at the start of page 0.
+
+    Identifies the file (magic, format version) and records its page
+    size, so a file is always opened with the page size it was created
+    with. The page count lives here so the Pager never has to stat the
+    file. Freed pages form a list of trunk pages, each holding the
+    numbers of other free (leaf) pages. schema_root is the root page of
+    the catalog (0 until one is created)."""
+
+    def __init__(self, page_size, page_count=1, freelist_trunk=0, freelist_count=0, schema_root=0,
+                 version=FORMAT_VERSION):
+        self.version = version
+        self.page_size = page_size
+        self.page_count = page_count
+        self.freelist_trunk = freelist_trunk      # 0 = empty list (page 0 is never free)
+        self.freelist_count = freelist_count
+        self.schema_root = schema_root
+
+    @staticmethod
+    def is_blank(data):
+        return not any(data[:HEADER.size])
+
+    @staticmethod
+    def parse(data):
+        if len(data) < HEADER.size:
+            raise ExecutionError("Database header truncated")
+        magic, version, _, page_size, page_count, freelist_trunk, freelist_count, schema_root = \
+            HEADER.unpack_from(data, 0)
+        if magic != HEADER_MAGIC:
+            raise ExecutionError("File is not a database (bad header magic)")
+        if version != FORMAT_VERSION:
+            raise ExecutionError(f"Unsupported database format version {version} (expected {FORMAT_VERSION})")
+        validate_page_size(page_size)
+        return DatabaseHeader(page_size, page_count, freelist_trunk, freelist_count, schema_root, version)
+
+    def pack_into(self, buffer):
+        HEADER.pack_into(buffer, 0, HEADER_MAGIC, self.version, 0, self.page_size, self.page_count,
+                         self.freelist_trunk, self.freelist_count, self.schema_root)
+
+    def __repr__(self):
+        return (f"DatabaseHeader(version={self.version}, page_size={self.page_size}, "
+                f"page_count={self.page_count}, freelist_trunk={self.freelist_trunk}, "
+                f"freelist_count={self.freelist_count}, schema_root={self.schema_root})")
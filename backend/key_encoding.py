@@ -0,0 +1,118 @@
+import struct
+from utils.errors import BTreeError
+
+# Order-preserving ("memcomparable") key encoding: comparing two encoded
+# keys bytewise gives the same order as comparing the values, so B-tree
+# pages can order and search keys without decoding them.
+#
+#   None    TAG_NULL
+#   int     TAG_INT, 8 bytes big-endian with the sign bit flipped
+#   float   TAG_FLOAT, the IEEE double big-endian, with the sign bit flipped
+#           for positive values and every bit flipped for negative ones
+#   str     TAG_STR, UTF-8 with 0x00 escaped as 0x00 0xFF, ended by 0x00 0x00
+#   bytes   TAG_BYTES, escaped and terminated like str
+#   tuple   TAG_TUPLE, the encoded elements, then 0x00 (a prefix sorts first)
+#
+# Values of different types order by tag: None < int < float < str < bytes
+# < tuple, so an int and a float never compare as numbers. -0.0 is stored
+# as 0.0 and every NaN as the positive quiet NaN, which sorts above +inf.
+
+TAG_NULL = 0x05
+TAG_INT = 0x10
+TAG_FLOAT = 0x18
+TAG_STR = 0x20
+TAG_BYTES = 0x30
+TAG_TUPLE = 0x40
+
+TERMINATOR = b"\x00\x00"
+ESCAPED_ZERO = b"\x00\xff"
+END_OF_TUPLE = 0x00
+
+INT = struct.Struct(">Q")
+SIGN_BIT = 1 << 63
+FLOAT = struct.Struct(">d")
+ALL_BITS = (1 << 64) - 1
+NAN = FLOAT.unpack(INT.pack(0x7FF8000000000000))[0]     # the positive quiet NaN
+
+
+def encode_key(key) -> bytes:
+    out = bytearray()
+    _encode(key, out)
+    return bytes(out)
+
+
+def _encode(key, out):
+    if key is None:
+        out.append(TAG_NULL)
+    elif isinstance(key, int):
+        if not -SIGN_BIT <= key < SIGN_BIT:
+            raise BTreeError(f"Integer key {key} does not fit in 64 bits")
+        out.append(TAG_INT)
+        out += INT.pack(key + SIGN_BIT)
+    elif isinstance(key, float):
+        if key != key:
+            key = NAN                                     # one NaN, whatever its sign and payload
+        bits = INT.unpack(FLOAT.pack(key + 0.0))[0]       # + 0.0 turns -0.0 into 0.0
+        out.append(TAG_FLOAT)
+        out += INT.pack(bits ^ ALL_BITS if bits & SIGN_BIT else bits | SIGN_BIT)
+    elif isinstance(key, str):
+        out.append(TAG_STR)
+        out += key.encode("utf-8").replace(b"\x00", ESCAPED_ZERO)
+        out += TERMINATOR
+    elif isinstance(key, (bytes, bytearray, memoryview)):
+        out.append(TAG_BYTES)
+        out += bytes(key).replace(b"\x00", ESCAPED_ZERO)
+        out += TERMINATOR
+    elif isinstance(key, tuple):
+        out.append(TAG_TUPLE)
+        for element in key:
+            _encode(element, out)
+        out.append(END_OF_TUPLE)
+    else:
+        raise BTreeError(f"Unsupported key type: {type(key).__name__}")
+
+
+def decode_key(data):
+    data = bytes(data)
+    key, end = _decode(data, 0)
+    if end != len(data):
+        raise BTreeError(f"Trailing bytes after encoded key ({len(data) - end})")
+    return key
+
+
+def _decode(data, pos):
+    try:
+        tag = data[pos]
+        pos += 1
+        if tag == TAG_NULL:
+            return None, pos
+        if tag == TAG_INT:
+            return INT.unpack_from(data, pos)[0] - SIGN_BIT, pos + INT.size
+        if tag == TAG_FLOAT:
+            bits = INT.unpack_from(data, pos)[0]
+            bits = bits ^ SIGN_BIT if bits & SIGN_BIT else bits ^ ALL_BITS
+            return FLOAT.unpack(INT.pack(bits))[0], pos + INT.size
+        if tag in (TAG_STR, TAG_BYTES):
+            raw, pos = _unescape(data, pos)
+            return (raw.decode("utf-8") if tag == TAG_STR else raw), pos
+        if tag == TAG_TUPLE:
+            elements = []
+            while data[pos] != END_OF_TUPLE:
+                element, pos = _decode(data, pos)
+                elements.append(element)
+            return tuple(elements), pos + 1
+    except (IndexError, ValueError, struct.error) as e:
+        raise BTreeError(f"Malformed encoded key: {e}")
+    raise BTreeError(f"Unknown key tag 0x{tag:02x}")
+
+
+def _unescape(data, pos):
+    parts = []
+    while True:
+        zero = data.index(0, pos)
+        parts.append(data[pos:zero])
+        if data[zero + 1] == 0x00:
+            return b"\x00".join(parts), zero + 2
+        if data[zero + 1] != 0xFF:
+            raise BTreeError("Malformed escape in encoded key")
+        pos = zero + 2
@@ -1,37 +1,84 @@
 import os
+import mmap
 from utils.logger import get_logger
 from utils.errors import ExecutionError
+from backend.header import DatabaseHeader, HEADER, validate_page_size
 logger = get_logger(__name__)
 
 DEFAULT_PAGE_SIZE = 4096
 
+# Durability barrier issued by sync() at the end of every flush
+SYNC_OFF = "off"          # leave the data in the OS page cache
+SYNC_NORMAL = "normal"    # fdatasync: file contents reach the disk
+SYNC_FULL = "full"        # fsync (F_FULLFSYNC where available): contents and metadata
+SYNC_LEVELS = (SYNC_OFF, SYNC_NORMAL, SYNC_FULL)
+
+# Upper bound on buffers per pwritev call (IOV_MAX)
+try:
+    IOV_MAX = os.sysconf("SC_IOV_MAX")
+except (AttributeError, ValueError, OSError):
+    IOV_MAX = 1024
+
 class OSInterface:
-    def __init__(self, filepath, page_size = DEFAULT_PAGE_SIZE):
+    def __init__(self, filepath, page_size = DEFAULT_PAGE_SIZE, use_mmap=False, sync_level=SYNC_NORMAL):
+        if sync_level not in SYNC_LEVELS:
+            raise ValueError(f"sync_level must be one of {SYNC_LEVELS}, got {sync_level!r}")
+
         self.filepath = filepath
-        self.page_size = page_size
-        self.file = None
-        logger.debug(f"Initialized OS-Interface with file: {self.filepath}, page size: {self.page_size}")
+        self.page_size = validate_page_size(page_size)
+        self.header = None                       # DatabaseHeader read at open_file(), None for a new file
+        self.use_mmap = use_mmap
+        self.sync_level = sync_level
         self.file = None
+        self._mmap = None                        # read-only mapping, only used when use_mmap is set
+        self._mapped_size = 0
+        logger.debug(f"Initialized OS-Interface with file: {self.filepath}, page size: {self.page_size}, mmap: {self.use_mmap}, sync: {self.sync_level}")
 
-    def open_file(self):
-        if self.file is None:
-            self.file = open(self.filepath, "r+b") if os.path.exists(self.filepath) else open(self.filepath, "w+b")
+    def open_file(self, read_header=True):
+        """Open (or create) the database file.
+
+        An existing file is identified by its header, which also fixes the
+        page size: the size stored in the file wins over the one requested.
+        A new or blank file keeps the requested page size and gets its
+        header from the Pager."""
         try:
-            if not os.path.exists(self.filepath):
-                with open(self.filepath, 'wb') as file:
-                    file.write(b'\x00' * self.page_size)
-                    logger.info(f"Created new file '{self.filepath}' with one empty page")
+            if self.file is None:
+                mode = "r+b" if os.path.exists(self.filepath) else "w+b"
+                # Unbuffered, so pwritev() on the descriptor never races a stale userspace buffer
+                self.file = open(self.filepath, mode, buffering=0)
+                logger.info(f"Opened file '{self.filepath}' successfully")
 
-            self.file = open(self.filepath, 'r+b') 
-            logger.info(f"Opened file '{self.filepath}' successfully")
+            if read_header:
+                self._read_header()
 
+            if self.use_mmap:
+                self._remap()
+
+        except ExecutionError:
+            self.close_file()
+            raise
         except Exception as e:
             logger.error(f"Error opening file: {e}")
             raise ExecutionError("Error opening file")
-    
+
+    def _read_header(self):
+        self.file.seek(0)
+        raw = self.file.read(HEADER.size)
+        if len(raw) < HEADER.size or DatabaseHeader.is_blank(raw):
+            self.header = None
+            return
+
+        self.header = DatabaseHeader.parse(raw)
+        if self.header.page_size != self.page_size:
+            logger.info(f"Using page size {self.header.page_size} from '{self.filepath}' "
+                        f"(requested {self.page_size})")
+            self.page_size = self.header.page_size
+        logger.debug(f"Read header of '{self.filepath}': {self.header}")
+
     def close_file(self):
         if self.file:
             try:
+                self._unmap()
                 self.file.close()
                 logger.info(f"Closed file '{self.filepath}'")
 
@@ -45,8 +92,9 @@ class OSInterface:
     def read_page(self, page_number):
         if self.file is None:
             raise RuntimeError("File not open. Use open_file() first.")
-        if self.file is None:
-            raise RuntimeError("File not open. Use open_file() first.")
+
+        if self.use_mmap:
+            return self._read_page_mapped(page_number)
 
         try:
             offset = page_number * self.page_size
@@ -59,6 +107,41 @@ class OSInterface:
             logger.error(f"Error reading page {page_number}: {e}")
             raise ExecutionError("Error reading page ")
 
+    def read_pages(self, first_page, count):
+        """Read up to `count` consecutive pages with a single positional read.
+
+        Returns one buffer per complete page found (fewer at EOF). Uses
+        pread, so it is safe to call from a prefetch thread while the
+        main thread keeps using seek/read."""
+        if self.file is None:
+            raise RuntimeError("File not open. Use open_file() first.")
+
+        if self.use_mmap:
+            pages = []
+            for page_number in range(first_page, first_page + count):
+                data = self._read_page_mapped(page_number)
+                if len(data) < self.page_size:
+                    break
+                pages.append(data)
+            return pages
+
+        try:
+            offset = first_page * self.page_size
+            if hasattr(os, "pread"):
+                raw = os.pread(self.file.fileno(), count * self.page_size, offset)
+            else:
+                self.file.seek(offset)
+                raw = self.file.read(count * self.page_size)
+
+            view = memoryview(raw)
+            full_pages = len(raw) // self.page_size
+            logger.debug(f"Read {full_pages} pages starting at page {first_page} (offset {offset})")
+            return [view[i * self.page_size:(i + 1) * self.page_size] for i in range(full_pages)]
+
+        except Exception as e:
+            logger.error(f"Error reading pages {first_page}..{first_page + count - 1}: {e}")
+            raise ExecutionError("Error reading pages")
+
     def write_page(self, page_number, data):
         if self.file is None:
             raise RuntimeError("File not open. Use open_file() first.")
@@ -68,14 +151,90 @@ class OSInterface:
 
         try:
             offset = page_number * self.page_size
-            self.file.seek(offset)
-            self.file.write(data)
-            self.file.flush()
+            self._write_all(offset, data)
             logger.debug(f"Wrote page {page_number} (offset {offset})")
 
         except Exception as e:
             logger.error(f"Error writing page {page_number}: {e}")
             raise ExecutionError("Error writing page")
+
+    def write_pages(self, first_page, pages):
+        """Write a run of consecutive pages starting at first_page with as few
+        syscalls as possible (one pwritev per IOV_MAX pages)."""
+        if self.file is None:
+            raise RuntimeError("File not open. Use open_file() first.")
+
+        for data in pages:
+            if len(data) != self.page_size:
+                raise ValueError(f"Data must be exactly {self.page_size} bytes")
+
+        offset = first_page * self.page_size
+        try:
+            if hasattr(os, "pwritev"):
+                fd = self.file.fileno()
+                for start in range(0, len(pages), IOV_MAX):
+                    batch = pages[start:start + IOV_MAX]
+                    self._pwritev_all(fd, batch, offset)
+                    offset += len(batch) * self.page_size
+            else:
+                self._write_all(offset, b"".join(pages))
+
+            logger.debug(f"Wrote {len(pages)} pages starting at page {first_page}")
+
+        except Exception as e:
+            logger.error(f"Error writing pages {first_page}..{first_page + len(pages) - 1}: {e}")
+            raise ExecutionError("Error writing pages")
+
+    def _write_all(self, offset, data):
+        # the file is unbuffered: a single write() may take only part of the data
+        self.file.seek(offset)
+        remainder = memoryview(data)
+        while remainder:
+            n = self.file.write(remainder)
+            if not n:
+                raise OSError(f"Write at offset {offset + len(data) - len(remainder)} made no progress")
+            remainder = remainder[n:]
+
+    @staticmethod
+    def _pwritev_all(fd, buffers, offset):
+        expected = sum(len(buf) for buf in buffers)
+        written = os.pwritev(fd, buffers, offset)
+        if written < expected:
+            # Short write: push the remainder out with plain pwrite calls
+            remainder = memoryview(b"".join(buffers))[written:]
+            offset += written
+            while remainder:
+                n = os.pwrite(fd, remainder, offset)
+                if not n:
+                    raise OSError(f"Write at offset {offset} made no progress")
+                remainder = remainder[n:]
+                offset += n
+
+    def sync(self):
+        """Durability barrier, strength chosen by sync_level."""
+        if self.file is None:
+            raise RuntimeError("File not open. Use open_file() first.")
+
+        if self.sync_level == SYNC_OFF:
+            return
+
+        try:
+            fd = self.file.fileno()
+            if self.sync_level == SYNC_FULL:
+                if hasattr(os, "F_FULLFSYNC"):
+                    import fcntl
+                    fcntl.fcntl(fd, os.F_FULLFSYNC)
+                else:
+                    os.fsync(fd)
+            elif hasattr(os, "fdatasync"):
+                os.fdatasync(fd)
+            else:
+                os.fsync(fd)
+            logger.debug(f"Synced '{self.filepath}' ({self.sync_level})")
+
+        except Exception as e:
+            logger.error(f"Error syncing file: {e}")
+            raise ExecutionError("Error syncing file")
     
     @property
     def file_size(self):
@@ -85,4 +244,55 @@ class OSInterface:
         self.file.seek(0, os.SEEK_END)
         size = self.file.tell()
         self.file.seek(current, os.SEEK_SET)
-        return size
\ No newline at end of file
+        return size
+
+    # mmap read path
+    def _read_page_mapped(self, page_number):
+        """Serve a page as a zero-copy memoryview over the mapped file.
+
+        The mapping is refreshed whenever a page past its end is requested,
+        so pages appended through write_page become visible. Like the
+        regular path, a page past EOF comes back short (empty)."""
+        offset = page_number * self.page_size
+        end = offset + self.page_size
+
+        try:
+            if end > self._mapped_size:
+                self._remap()
+
+            if self._mmap is None or offset >= self._mapped_size:
+                logger.debug(f"Read page {page_number} past EOF (offset {offset})")
+                return b""
+
+            data = memoryview(self._mmap)[offset:min(end, self._mapped_size)]
+            logger.debug(f"Read mapped page {page_number} (offset {offset})")
+            return data
+
+        except Exception as e:
+            logger.error(f"Error reading mapped page {page_number}: {e}")
+            raise ExecutionError("Error reading page ")
+
+    def _remap(self):
+        size = os.fstat(self.file.fileno()).st_size
+        if self._mmap is not None and size == self._mapped_size:
+            return
+
+        self._unmap()
+        if size == 0:
+            return                               # mmap cannot map an empty file
+
+        self._mmap = mmap.mmap(self.file.fileno(), size, access=mmap.ACCESS_READ)
+        self._mapped_size = size
+        logger.debug(f"Mapped '{self.filepath}' ({size} bytes)")
+
+    def _unmap(self):
+        if self._mmap is None:
+            return
+        try:
+            self._mmap.close()
+        except BufferError:
+            # Pages handed out earlier still reference the old mapping; it is
+            # released once the last of those memoryviews goes away.
+            logger.debug(f"Deferred unmapping '{self.filepath}' ({self._mapped_size} bytes): pages still reference it")
+        self._mmap = None
+        self._mapped_size = 0
@@ -0,0 +1,106 @@
+import struct
+from utils.errors import BTreeError
+
+# Overflow page: next page in the chain (0 = last), then payload bytes
+OVERFLOW_HEADER = struct.Struct("<I")
+OVERFLOW_POINTER = struct.Struct("<I")    # first overflow page, stored after a cell's local bytes
+
+
+class OverflowValue:
+    """A B-tree value too large for its cell.
+
+    The cell keeps the first `local` bytes; the remaining bytes live in a
+    chain of overflow pages starting at `first_page`."""
+
+    __slots__ = ("local", "length", "first_page")
+
+    def __init__(self, local, length, first_page):
+        self.local = local
+        self.length = length
+        self.first_page = first_page
+
+    def __repr__(self):
+        return f"OverflowValue(length={self.length}, local={len(self.local)}, first_page={self.first_page})"
+
+
+def stored_length(value):
+    """Bytes a value takes inside its cell."""
+    if isinstance(value, OverflowValue):
+        return len(value.local) + OVERFLOW_POINTER.size
+    return len(value)
+
+
+def write_chain(pager, data):
+    """Store `data` in freshly allocated overflow pages; returns the first page number."""
+    capacity = pager.page_size - OVERFLOW_HEADER.size
+    pages = [pager.allocate_page() for _ in range(-(-len(data) // capacity))]
+    for i, page_num in enumerate(pages):
+        chunk = data[i * capacity:(i + 1) * capacity]
+        with pager.pinned(page_num) as page:
+            buffer = page.writable()
+            OVERFLOW_HEADER.pack_into(buffer, 0, pages[i + 1] if i + 1 < len(pages) else 0)
+            buffer[OVERFLOW_HEADER.size:OVERFLOW_HEADER.size + len(chunk)] = chunk
+            pager.mark_dirty(page)
+    return pages[0] if pages else 0
+
+
+def read_chain(pager, first_page, length, start=0, end=None):
+    """Bytes [start, end) of a chain holding `length` bytes.
+
+    Pages before `start` are visited only for their next pointers; pages
+    after `end` are never read."""
+    end = length if end is None else min(end, length)
+    capacity = pager.page_size - OVERFLOW_HEADER.size
+    parts, page_num, position = [], first_page, 0
+    while page_num and position < end:
+        with pager.pinned(page_num) as page:
+            next_page = OVERFLOW_HEADER.unpack_from(page.data, 0)[0]
+            if position + capacity > start:
+                lo = max(start - position, 0)
+                hi = min(end - position, capacity)
+                parts.append(bytes(page.data[OVERFLOW_HEADER.size + lo:OVERFLOW_HEADER.size + hi]))
+        position += capacity
+        page_num = next_page
+    data = b"".join(parts)
+    if len(data) != max(0, end - start):
+        raise BTreeError(f"Overflow chain at page {first_page} is truncated")
+    return data
+
+
+def free_chain(pager, first_page):
+    """Return every page of a chain to the free list."""
+    page_num = first_page
+    while page_num:
+        with pager.pinned(page_num) as page:
+            next_page = OVERFLOW_HEADER.unpack_from(page.data, 0)[0]
+        pager.free_page(page_num)
+        page_num = next_page
+
+
+class Payload:
+    """Read access to one stored value.
+
+    Bytes in the cell are served directly; overflow pages are read only
+    for ranges that reach past the local part."""
+
+    def __init__(self, pager, value):
+        self.pager = pager
+        self.value = value
+
+    def __len__(self):
+        return self.value.length if isinstance(self.value, OverflowValue) else len(self.value)
+
+    def read(self, start=0, end=None):
+        value = self.value
+        if not isinstance(value, OverflowValue):
+            return value[start:end]
+        end = value.length if end is None else min(end, value.length)
+        local = len(value.local)
+        if end <= local:
+            return value.local[start:end]
+        head = value.local[start:local] if start < local else b""
+        return head + read_chain(self.pager, value.first_page, value.length - local,
+                                 max(start - local, 0), end - local)
+
+    def __bytes__(self):
+        return self.read()
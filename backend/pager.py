@@ -1,55 +1,459 @@
-from backend.os_interface import OSInterface
+import threading
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import wraps
+from backend.os_interface import OSInterface
+from backend.replacement import make_policy
+from backend.header import DatabaseHeader, TRUNK_HEADER, TRUNK_LEAF
+from utils.logger import get_logger
+from utils.errors import ExecutionError
+
+logger = get_logger(__name__)
+
+DEFAULT_CACHE_SIZE = 64
+SEQUENTIAL_THRESHOLD = 2     # consecutive sequential misses before read-ahead kicks in
+
+def synchronized(method):
+    """Serialize a Pager method on the pager lock, so several threads can share one Pager."""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+    return wrapper
 
 class Page:
-    def __init__(self, number: int, data: bytes, dirty=False):
+    def __init__(self, number: int, data: bytes, dirty=False, size=None):
         self.number = number
-        self.data = data
+        self.data = data             # read-only bytes/memoryview as loaded, or an owned bytearray once written
+        self.size = size or len(data)
         self.dirty = dirty
+        self.pin_count = 0
+
+    def writable(self) -> bytearray:
+        """The page's own mutable buffer, for encoding in place with struct.pack_into.
+
+        Pages are loaded as read-only views (possibly straight out of the mmap);
+        the first call copies them once into a full-size bytearray (copy-on-write)."""
+        if not isinstance(self.data, bytearray):
+            buffer = bytearray(self.size)
+            buffer[:len(self.data)] = self.data
+            self.data = buffer
+        return self.data
         
 
 class Pager:
-    def __init__(self, os_interface: OSInterface, cache_size = 64):
+    def __init__(self, os_interface: OSInterface, cache_size = DEFAULT_CACHE_SIZE, wal = None, policy = "lru",
+                 cache_bytes = None, read_ahead = 0, prefetch_async = False):
         self.os_interface = os_interface  
-        self.cache_size = cache_size
-        self.cache = OrderedDict()   # page_number -> Page
-        self.dirty_pages = set()
         self.page_size = os_interface.page_size
+        if cache_bytes is not None:
+            cache_size = cache_bytes // self.page_size
+        self.cache_size = max(1, cache_size)
+        self.cache = {}              # page_number -> Page
+        self.decoded = {}            # page_number -> object decoded from a cached page (e.g. a BTreeNode)
+        self.policy = make_policy(policy, self.cache_size)
+        self.lock = threading.RLock()
+        self.dirty_pages = set()
+        self.wal = wal               # WriteAheadLog; when set, the main file is only written by checkpoints
 
-    #  returns a page from cache or loads from disk
-    def get_page(self, page_number: int) -> Page:
-        if page_number in self.cache:
-            self.cache.move_to_end(page_number) # LRU Cache
-            return self.cache[page_number]
-        
-        data = self.os_interface.read_page(page_number)
-        page = Page(page_number, data)
-        self._cache_page(page)
+        # read-ahead: pages fetched ahead of use wait here until get_page asks for them
+        self.read_ahead = read_ahead
+        self.prefetch_async = prefetch_async
+        self._prefetched = OrderedDict()   # page_number -> (data, checkpoint epoch)
+        self._inflight = {}                # page_number -> Future of the background read covering it
+        self._invalidated = set()          # pages written while a background read of them was in flight
+        self._prefetch_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pager-prefetch") if prefetch_async else None
+        self._last_miss = None
+        self._sequential_run = 0
+        self._prefetch_end = 0
+
+        self.stats = {"hits": 0, "misses": 0, "prefetched": 0, "prefetch_hits": 0,
+                      "decoded_hits": 0, "decoded_misses": 0}
+        self.header = None
+        self._load_header()
+        logger.debug(f"Initialized pager with {self.cache_size} pages, policy: {type(self.policy).__name__}")
+
+    # database header (page 0)
+    def _load_header(self):
+        data = self.get_page(0).data
+        if len(data) < self.page_size or DatabaseHeader.is_blank(data):
+            file_pages = (self.os_interface.file_size + self.page_size - 1) // self.page_size
+            if self.wal:
+                file_pages = max(file_pages, self.wal.max_page + 1)
+            self.header = DatabaseHeader(page_size=self.page_size, page_count=max(1, file_pages))
+            self._write_header()
+            logger.info(f"Initialized database header: {self.header}")
+        else:
+            self.header = DatabaseHeader.parse(data)
+            if self.header.page_size != self.page_size:
+                raise ExecutionError(f"Header page size {self.header.page_size} does not match "
+                                     f"the file's page size {self.page_size}")
+            logger.debug(f"Loaded database header: {self.header}")
+
+    def set_schema_root(self, page_number: int):
+        self.header.schema_root = page_number
+        self._write_header()
+
+    def _write_header(self):
+        page = self.get_page(0)
+        self.header.pack_into(page.writable())
+        self.mark_dirty(page)
+
+    # page allocation
+    @synchronized
+    def allocate_page(self) -> int:
+        """Return the number of a zero-filled page, reusing a freed page when possible."""
+        header = self.header
+        if header.freelist_count == 0:
+            page_number = header.page_count
+            header.page_count += 1
+        else:
+            trunk = self.get_page(header.freelist_trunk)
+            next_trunk, leaf_count = TRUNK_HEADER.unpack_from(trunk.data, 0)
+            if leaf_count:
+                page_number = TRUNK_LEAF.unpack_from(trunk.data, TRUNK_HEADER.size + (leaf_count - 1) * TRUNK_LEAF.size)[0]
+                TRUNK_HEADER.pack_into(trunk.writable(), 0, next_trunk, leaf_count - 1)
+                self.mark_dirty(trunk)
+            else:
+                page_number = trunk.number
+                header.freelist_trunk = next_trunk
+            header.freelist_count -= 1
+
+        self._write_header()
+        self.mark_dirty(Page(page_number, bytearray(self.page_size)))
+        logger.debug(f"Allocated page {page_number}")
+        return page_number
+
+    @synchronized
+    def free_page(self, page_number: int):
+        """Put a page on the free list; its contents are discarded."""
+        header = self.header
+        if page_number <= 0 or page_number >= header.page_count:
+            raise ValueError(f"Cannot free page {page_number}")
+        cached = self.cache.get(page_number)
+        if cached is not None and cached.pin_count:
+            raise RuntimeError(f"Cannot free pinned page {page_number}")
+
+        capacity = (self.page_size - TRUNK_HEADER.size) // TRUNK_LEAF.size
+        if header.freelist_trunk:
+            trunk = self.get_page(header.freelist_trunk)
+            next_trunk, leaf_count = TRUNK_HEADER.unpack_from(trunk.data, 0)
+            if leaf_count < capacity:
+                data = trunk.writable()
+                TRUNK_LEAF.pack_into(data, TRUNK_HEADER.size + leaf_count * TRUNK_LEAF.size, page_number)
+                TRUNK_HEADER.pack_into(data, 0, next_trunk, leaf_count + 1)
+                self.mark_dirty(trunk)
+                self._discard(page_number)
+                header.freelist_count += 1
+                self._write_header()
+                logger.debug(f"Freed page {page_number} (leaf of trunk {trunk.number})")
+                return
+
+        # Trunk full (or no list yet): the freed page becomes the new trunk
+        data = bytearray(self.page_size)
+        TRUNK_HEADER.pack_into(data, 0, header.freelist_trunk, 0)
+        self.mark_dirty(Page(page_number, data))
+        header.freelist_trunk = page_number
+        header.freelist_count += 1
+        self._write_header()
+        logger.debug(f"Freed page {page_number} (new free-list trunk)")
+
+    def _discard(self, page_number):
+        # drop a cached page without writing it back
+        if self.cache.pop(page_number, None) is not None:
+            self.policy.removed(page_number)
+        self.decoded.pop(page_number, None)
+        self._forget_prefetched(page_number)
+
+    #  returns a page from cache or loads from disk (newest WAL image first)
+    @synchronized
+    def get_page(self, page_number: int, pin=False) -> Page:
+        page = self.cache.get(page_number)
+        if page is not None:
+            self.stats["hits"] += 1
+            self.policy.accessed(page_number)
+        else:
+            self.stats["misses"] += 1
+            data = self.wal.read_page(page_number) if self.wal else None
+            if data is None:
+                data = self._take_prefetched(page_number)
+            if data is None:
+                data = self.os_interface.read_page(page_number)
+            page = Page(page_number, data, size=self.page_size)
+            self._cache_page(page)
+            self._detect_sequential(page_number)
+
+        if pin:
+            page.pin_count += 1
         return page
-    
-    # flags a page and bumps it in LRU
+
+    # decoded pages: parsed once, dropped as soon as the page is dirtied or leaves the cache
+    @synchronized
+    def get_decoded(self, page_number: int, decode):
+        """`decode(page.data)` for a page, reused until the page changes or is evicted.
+
+        The result is shared by every caller, so it must be treated as
+        read-only and must not keep references into the page buffer."""
+        decoded = self.peek_decoded(page_number)
+        if decoded is not None:
+            return decoded
+        self.stats["decoded_misses"] += 1
+        decoded = decode(self.get_page(page_number).data)
+        self.decoded[page_number] = decoded
+        return decoded
+
+    @synchronized
+    def peek_decoded(self, page_number: int):
+        """The cached decoded form of a page, or None without decoding it."""
+        decoded = self.decoded.get(page_number)
+        if decoded is not None:
+            self.stats["decoded_hits"] += 1
+            self.policy.accessed(page_number)
+        return decoded
+
+    @property
+    def decoded_hit_rate(self):
+        lookups = self.stats["decoded_hits"] + self.stats["decoded_misses"]
+        return self.stats["decoded_hits"] / lookups if lookups else 0.0
+
+    # flags a page and bumps it in the replacement order
+    @synchronized
     def mark_dirty(self, page: Page):
         page.dirty = True
-        self._cache_page(page)  # refresh LRU
+        self.decoded.pop(page.number, None)
+        if self.header is not None and page.number >= self.header.page_count:
+            # written past the end without allocate_page(): extend the file
+            self.header.page_count = page.number + 1
+            self._write_header()
+        if self.cache.get(page.number) is page:
+            self.policy.accessed(page.number)
+        else:
+            self._cache_page(page)
+
+    # pinned pages are never chosen for eviction (e.g. while a B-tree operation holds them)
+    @synchronized
+    def pin(self, page: Page):
+        page.pin_count += 1
+
+    @synchronized
+    def unpin(self, page: Page):
+        if page.pin_count <= 0:
+            raise RuntimeError(f"Page {page.number} is not pinned")
+        page.pin_count -= 1
 
-    # writing dirty pages to disk
+    @contextmanager
+    def pinned(self, page_number: int):
+        page = self.get_page(page_number, pin=True)
+        try:
+            yield page
+        finally:
+            self.unpin(page)
+
+    def _is_pinned(self, page_number):
+        return self.cache[page_number].pin_count > 0
+
+    def is_pinned(self, page_number):
+        """True while some caller (e.g. an open cursor) holds the page pinned."""
+        page = self.cache.get(page_number)
+        return page is not None and page.pin_count > 0
+
+    # read-ahead
+    @synchronized
+    def advise_sequential(self, first_page, count=None):
+        """Hint from a scan that pages from first_page on will be read in order."""
+        count = count or self.read_ahead
+        if not count:
+            return
+        self._last_miss = first_page - 1
+        self._sequential_run = SEQUENTIAL_THRESHOLD
+        self.prefetch(first_page, count)
+
+    def prefetch(self, first_page, count):
+        """Read `count` pages from first_page in one large read, on the prefetch thread if enabled."""
+        first_page = max(first_page, 0)
+        with self._prefetch_lock:
+            while count and (first_page in self.cache or first_page in self._prefetched or first_page in self._inflight):
+                first_page += 1
+                count -= 1
+            if not count:
+                return
+            self._prefetch_end = max(self._prefetch_end, first_page + count)
+
+            if self._executor is not None:
+                # registered under the lock, so the worker cannot finish before its pages are tracked
+                future = self._executor.submit(self._read_ahead, first_page, count)
+                for page_number in range(first_page, first_page + count):
+                    self._inflight[page_number] = future
+                return
+
+        self._read_ahead(first_page, count)
+
+    def _read_ahead(self, first_page, count):
+        epoch = self._checkpoint_epoch()
+        try:
+            pages = self.os_interface.read_pages(first_page, count)
+        except Exception as e:
+            logger.warning(f"Read-ahead of pages {first_page}..{first_page + count - 1} failed: {e}")
+            pages = []
+
+        with self._prefetch_lock:
+            for page_number, data in enumerate(pages, start=first_page):
+                if page_number in self._invalidated or page_number in self.cache:
+                    continue
+                self._prefetched[page_number] = (data, epoch)
+                self.stats["prefetched"] += 1
+
+            for page_number in range(first_page, first_page + count):
+                self._inflight.pop(page_number, None)
+                self._invalidated.discard(page_number)
+
+            # keep the buffer bounded: it holds at most two read-ahead windows
+            limit = max(2 * self.read_ahead, count)
+            while len(self._prefetched) > limit:
+                self._prefetched.popitem(last=False)
+
+    def _take_prefetched(self, page_number):
+        if not self._prefetched and not self._inflight:
+            return None
+
+        with self._prefetch_lock:
+            future = self._inflight.get(page_number)
+        if future is not None:
+            future.result()
+
+        with self._prefetch_lock:
+            entry = self._prefetched.pop(page_number, None)
+        if entry is None or entry[1] != self._checkpoint_epoch():
+            return None
+        self.stats["prefetch_hits"] += 1
+        return entry[0]
+
+    def _detect_sequential(self, page_number):
+        if not self.read_ahead:
+            return
+
+        if self._last_miss is not None and page_number == self._last_miss + 1:
+            self._sequential_run += 1
+        else:
+            self._sequential_run = 1
+            self._prefetch_end = 0
+        self._last_miss = page_number
+
+        # top up once the reader is halfway through the current window
+        if self._sequential_run >= SEQUENTIAL_THRESHOLD and page_number + self.read_ahead // 2 >= self._prefetch_end:
+            start = max(page_number + 1, self._prefetch_end)
+            self.prefetch(start, page_number + 1 + self.read_ahead - start)
+
+    def _forget_prefetched(self, page_number):
+        # the on-disk image is about to change: never serve an older prefetched copy
+        if not self._prefetched and not self._inflight:
+            return
+        with self._prefetch_lock:
+            self._prefetched.pop(page_number, None)
+            if page_number in self._inflight:
+                self._invalidated.add(page_number)
+
+    def _checkpoint_epoch(self):
+        return self.wal.stats["checkpoints"] if self.wal else 0
+
+    @synchronized
+    def close(self):
+        self.flush_all()
+        self._drop_unpinned()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    # writing dirty pages to disk: sorted, adjacent pages coalesced into one write,
+    # and a single durability barrier for the whole flush. The written pages stay
+    # cached, clean: a commit per statement keeps the cache and decoded nodes warm.
+    @synchronized
     def flush_all(self):
-        for page in list(self.cache.values()):
-            self._flush_page(page)
-        self.cache.clear()
+        if self.wal:
+            self.commit()
+            return
+
+        dirty = sorted((page for page in self.cache.values() if page.dirty), key=lambda page: page.number)
+
+        for run in self._adjacent_runs(dirty):
+            for page in run:
+                self._forget_prefetched(page.number)
+            self.os_interface.write_pages(run[0].number, [page.data for page in run])
+            for page in run:
+                page.dirty = False
+
+        if dirty:
+            self.os_interface.sync()
+
+    def _drop_unpinned(self):
+        for page_number in [n for n, page in self.cache.items() if page.pin_count == 0]:
+            del self.cache[page_number]
+            self.policy.removed(page_number)
+            self.decoded.pop(page_number, None)
+
+    # WAL mode: append every dirty page to the log as one committed transaction
+    def commit(self):
+        if not self.wal:
+            self.flush_all()
+            return
+
+        with self.lock:
+            dirty = sorted((page for page in self.cache.values() if page.dirty), key=lambda page: page.number)
+            seq = self.wal.append_commit([(page.number, page.data) for page in dirty])
+            for page in dirty:
+                page.dirty = False
+        # the fsync runs outside the pager lock, so other threads' commits can append and share it
+        if seq is not None:
+            self.wal.wait_durable(seq)
+
+    def checkpoint(self):
+        if self.wal:
+            return self.wal.checkpoint()
+        return False
+
+    @staticmethod
+    def _adjacent_runs(pages):
+        run = []
+        for page in pages:
+            if run and page.number != run[-1].number + 1:
+                yield run
+                run = []
+            run.append(page)
+        if run:
+            yield run
 
     def _flush_page(self, page: Page):
         if page.dirty:
-            self.os_interface.write_page(page.number, page.data)
+            self._forget_prefetched(page.number)
+            if self.wal:
+                self.wal.append_frame(page.number, page.data)
+            else:
+                self.os_interface.write_page(page.number, page.data)
             page.dirty = False
 
     def _cache_page(self, page: Page):
-        if len(self.cache) >= self.cache_size:
-            old_page = next(iter(self.cache.values()))
+        if page.number in self.cache:
+            self.policy.removed(page.number)     # replaced by a new Page object
+            self.decoded.pop(page.number, None)
+
+        while len(self.cache) >= self.cache_size and page.number not in self.cache:
+            victim = self.policy.victim(self._is_pinned)
+            if victim is None:
+                # Everything is pinned: overcommit rather than evict a page in use
+                logger.warning(f"All {len(self.cache)} cached pages pinned; growing cache past {self.cache_size}")
+                break
+            old_page = self.cache.pop(victim)
+            self.decoded.pop(victim, None)
             self._flush_page(old_page)
-            self.cache.pop(old_page.number)
+            self.policy.evicted(victim)
+
         self.cache[page.number] = page
+        self.policy.admitted(page.number)
+        if page.number in self._prefetched:
+            self._forget_prefetched(page.number)
 
     @property
     def num_pages(self):
-        return (self.os_interface.file_size + self.page_size - 1) // self.page_size
\ No newline at end of file
+        return self.header.page_count
\ No newline at end of file
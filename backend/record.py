@@ -0,0 +1,109 @@
+import struct
+from itertools import accumulate
+from utils.errors import ExecutionError
+from backend.overflow import Payload
+
+# Row record: column count, then (type, body length) per column, then the
+# column bodies. Short bodies come first, in column order, followed by the
+# long ones (> LONG_COLUMN bytes), so the header and the narrow columns of
+# a big row sit in the B-tree cell and only the wide columns reach into
+# overflow pages.
+RECORD_HEADER = struct.Struct("<H")
+COLUMN_ENTRY = struct.Struct("<BI")
+LONG_COLUMN = 64
+
+TYPE_NULL = 0
+TYPE_INT = 1
+TYPE_FLOAT = 2
+TYPE_TEXT = 3
+TYPE_BLOB = 4
+
+INT = struct.Struct("<q")
+FLOAT = struct.Struct("<d")
+
+
+def encode_record(values):
+    entries, bodies = [], []
+    for value in values:
+        if value is None:
+            kind, body = TYPE_NULL, b""
+        elif isinstance(value, int):
+            if not -(1 << 63) <= value < (1 << 63):
+                raise ExecutionError(f"Integer {value} does not fit in 64 bits")
+            kind, body = TYPE_INT, INT.pack(value)
+        elif isinstance(value, float):
+            kind, body = TYPE_FLOAT, FLOAT.pack(value)
+        elif isinstance(value, str):
+            kind, body = TYPE_TEXT, value.encode("utf-8")
+        elif isinstance(value, (bytes, bytearray, memoryview)):
+            kind, body = TYPE_BLOB, bytes(value)
+        else:
+            raise ExecutionError(f"Cannot store value of type {type(value).__name__}")
+        entries.append(COLUMN_ENTRY.pack(kind, len(body)))
+        bodies.append(body)
+
+    short = [body for body in bodies if len(body) <= LONG_COLUMN]
+    long = [body for body in bodies if len(body) > LONG_COLUMN]
+    return RECORD_HEADER.pack(len(values)) + b"".join(entries) + b"".join(short) + b"".join(long)
+
+
+class Record:
+    """Lazily decoded row record.
+
+    Takes the record bytes or a Payload (e.g. BTreeCursor.payload).
+    Only the header is read up front; each column's bytes are read and
+    decoded the first time it is accessed, so columns a query never
+    touches are never read from overflow pages."""
+
+    def __init__(self, payload):
+        self.payload = payload if isinstance(payload, Payload) else Payload(None, payload)
+        count = RECORD_HEADER.unpack(self.payload.read(0, RECORD_HEADER.size))[0]
+        header_end = RECORD_HEADER.size + count * COLUMN_ENTRY.size
+        entries = self.payload.read(RECORD_HEADER.size, header_end)
+        self.columns = list(COLUMN_ENTRY.iter_unpack(entries))
+
+        lengths = [length for _, length in self.columns]
+        if max(lengths, default=0) <= LONG_COLUMN:       # the usual case: bodies in column order
+            self.offsets = list(accumulate(lengths, initial=header_end))[:count]
+        else:
+            self.offsets = [0] * count
+            position = header_end
+            for long in (False, True):
+                for i, length in enumerate(lengths):
+                    if (length > LONG_COLUMN) == long:
+                        self.offsets[i] = position
+                        position += length
+        self.cache = {}
+
+    def __len__(self):
+        return len(self.columns)
+
+    def __getitem__(self, index):
+        if index in self.cache:
+            return self.cache[index]
+        kind, length = self.columns[index]
+        body = self.payload.read(self.offsets[index], self.offsets[index] + length) if length else b""
+        if kind == TYPE_NULL:
+            value = None
+        elif kind == TYPE_INT:
+            value = INT.unpack(body)[0]
+        elif kind == TYPE_FLOAT:
+            value = FLOAT.unpack(body)[0]
+        elif kind == TYPE_TEXT:
+            value = body.decode("utf-8")
+        elif kind == TYPE_BLOB:
+            value = body
+        else:
+            raise ExecutionError(f"Unknown column type {kind} in record")
+        self.cache[index] = value
+        return value
+
+    def values(self):
+        return [self[i] for i in range(len(self))]
+
+
+class Records(list):
+    """A list of Records read a column at a time (see core.vectors.Batch)."""
+
+    def column(self, position):
+        return [record[position] for record in self]
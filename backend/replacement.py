@@ -0,0 +1,139 @@
+from collections import OrderedDict
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class ReplacementPolicy:
+    """Decides which cached page the Pager evicts next.
+
+    The Pager owns the pages; a policy only tracks page numbers. `victim`
+    proposes a page to evict (skipping pinned ones), and the Pager reports
+    back with `evicted` once the page is actually gone."""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+
+    def admitted(self, page_number):
+        raise NotImplementedError
+
+    def accessed(self, page_number):
+        raise NotImplementedError
+
+    def victim(self, is_pinned):
+        raise NotImplementedError
+
+    def evicted(self, page_number):
+        raise NotImplementedError
+
+    def removed(self, page_number):
+        self.evicted(page_number)
+
+    def clear(self):
+        raise NotImplementedError
+
+    @staticmethod
+    def _first_unpinned(queue, is_pinned):
+        for page_number in queue:
+            if not is_pinned(page_number):
+                return page_number
+        return None
+
+
+class LRUPolicy(ReplacementPolicy):
+    """Plain least-recently-used order (the original Pager behaviour)."""
+
+    def __init__(self, capacity):
+        super().__init__(capacity)
+        self.order = OrderedDict()
+
+    def admitted(self, page_number):
+        self.order[page_number] = None
+        self.order.move_to_end(page_number)
+
+    def accessed(self, page_number):
+        self.order.move_to_end(page_number)
+
+    def victim(self, is_pinned):
+        return self._first_unpinned(self.order, is_pinned)
+
+    def evicted(self, page_number):
+        self.order.pop(page_number, None)
+
+    def clear(self):
+        self.order.clear()
+
+
+class TwoQPolicy(ReplacementPolicy):
+    """Full 2Q (Johnson & Shasha): scan resistant replacement.
+
+    New pages enter the FIFO `a1in`. Pages evicted from it are remembered in
+    the ghost list `a1out`; only a page referenced again while its ghost is
+    remembered is promoted into the LRU `am`. A full table scan therefore
+    cycles through `a1in` and never pushes hot index pages out of `am`."""
+
+    def __init__(self, capacity, kin_ratio=0.25, kout_ratio=0.5):
+        super().__init__(capacity)
+        self.kin = max(1, int(capacity * kin_ratio))
+        self.kout = max(1, int(capacity * kout_ratio))
+        self.a1in = OrderedDict()    # resident, FIFO
+        self.a1out = OrderedDict()   # ghosts (not resident), FIFO
+        self.am = OrderedDict()      # resident, LRU
+
+    def admitted(self, page_number):
+        if page_number in self.a1out:
+            del self.a1out[page_number]
+            self.am[page_number] = None
+        else:
+            self.a1in[page_number] = None
+
+    def accessed(self, page_number):
+        if page_number in self.am:
+            self.am.move_to_end(page_number)
+        # hits in a1in are deliberately ignored: correlated references
+
+    def victim(self, is_pinned):
+        if len(self.a1in) > self.kin or not self.am:
+            page_number = self._first_unpinned(self.a1in, is_pinned)
+            if page_number is not None:
+                return page_number
+        page_number = self._first_unpinned(self.am, is_pinned)
+        if page_number is not None:
+            return page_number
+        return self._first_unpinned(self.a1in, is_pinned)
+
+    def evicted(self, page_number):
+        if page_number in self.a1in:
+            del self.a1in[page_number]
+            self.a1out[page_number] = None
+            if len(self.a1out) > self.kout:
+                self.a1out.popitem(last=False)
+        else:
+            self.am.pop(page_number, None)
+
+    def removed(self, page_number):
+        self.a1in.pop(page_number, None)
+        self.am.pop(page_number, None)
+
+    def clear(self):
+        self.a1in.clear()
+        self.a1out.clear()
+        self.am.clear()
+
+
+POLICIES = {
+    "lru": LRUPolicy,
+    "2q": TwoQPolicy,
+}
+
+
+def make_policy(policy, capacity):
+    """Build a policy from a name in POLICIES, a policy class, or return an instance as is."""
+    if isinstance(policy, ReplacementPolicy):
+        return policy
+    if isinstance(policy, type) and issubclass(policy, ReplacementPolicy):
+        return policy(capacity)
+    try:
+        return POLICIES[policy.lower()](capacity)
+    except (KeyError, AttributeError):
+        raise ValueError(f"Unknown replacement policy {policy!r}, expected one of {sorted(POLICIES)}")
@@ -0,0 +1,84 @@
+from collections.abc import Mapping
+from functools import lru_cache
+from operator import attrgetter
+from utils.errors import ExecutionError
+
+
+class Row(Mapping):
+    """A result row: the values of a fixed list of columns, held in __slots__.
+
+    Reads like the dict rows it replaces (row["name"], keys(), items(),
+    == against a dict), but the column names live once on the class, made
+    by row_type(), instead of in every row."""
+
+    __slots__ = ()
+    fields = ()
+    _getters = {}
+
+    def __getitem__(self, name):
+        return self._getters[name](self)
+
+    def __iter__(self):
+        return iter(self.fields)
+
+    def __len__(self):
+        return len(self.fields)
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+
+@lru_cache(maxsize=1024)
+def row_type(fields):
+    """The Row class for a tuple of distinct column names; Row(value, ...) takes the values in that order."""
+    slots = tuple(f"_{i}" for i in range(len(fields)))
+    source = f"def __init__(self, {', '.join(slots)}):\n" + "".join(f"    self.{slot} = {slot}\n" for slot in slots)
+    namespace = {}
+    exec(compile(source + "    pass\n", f"<row {', '.join(fields)}>", "exec"), namespace)
+    return type(f"Row({', '.join(fields)})", (Row,), {
+        "__module__": __name__,
+        "__slots__": slots,
+        "__init__": namespace["__init__"],
+        "fields": fields,
+        "_getters": {field: attrgetter(slot) for field, slot in zip(fields, slots)},
+    })
+
+
+class Schema:
+    """A table's column names and their ordinals.
+
+    While a plan runs, a row is a sequence indexed by ordinal (a Record,
+    or a list of values once it has been updated). The planner turns
+    column names into ordinals with ordinal() once per plan, instead of
+    the VM hashing the name on every row."""
+
+    def __init__(self, columns):
+        self.columns = tuple(columns)
+        self.ordinals = {name: i for i, name in enumerate(self.columns)}
+
+    def __len__(self):
+        return len(self.columns)
+
+    def __contains__(self, name):
+        return name in self.ordinals
+
+    def ordinal(self, name):
+        try:
+            return self.ordinals[name]
+        except KeyError:
+            raise ExecutionError(f"Column '{name}' not found")
+
+    def positions(self, columns=None):
+        """Ordinals of `columns` (all of them for None or *), each column once."""
+        if not columns or columns == ["*"]:
+            return tuple(range(len(self.columns)))
+        return tuple(dict.fromkeys(map(self.ordinal, columns)))
+
+    def row_type(self, positions=None):
+        """The Row class for the columns at `positions` (all of them if None)."""
+        if positions is None:
+            return row_type(self.columns)
+        return row_type(tuple(self.columns[position] for position in positions))
+
+    def row(self, values):
+        return row_type(self.columns)(*values)
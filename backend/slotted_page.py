@@ -0,0 +1,285 @@
+import struct
+from utils.errors import BTreeError
+from backend.overflow import OverflowValue, OVERFLOW_POINTER
+
+# Page header: is_leaf, cell count, key prefix length, start of the cell content
+# area, free bytes inside the content area, previous leaf, next leaf, right-most child
+PAGE_HEADER = struct.Struct("<?HHIIIII")
+COUNTS = struct.Struct("<HH")             # cell count and prefix length, at offset 1
+RIGHT_CHILD_OFFSET = PAGE_HEADER.size - 4
+CELL_POINTER = struct.Struct("<H")
+# key length, full value length; then the key, the local value bytes and,
+# if the value spilled, the first overflow page
+LEAF_CELL = struct.Struct("<HI")
+INTERNAL_CELL = struct.Struct("<IH")      # left child page, key length; then key bytes
+KEY_LENGTH = struct.Struct("<H")
+
+
+def leaf_cell(key, value):
+    if isinstance(value, OverflowValue):
+        return LEAF_CELL.pack(len(key), value.length) + key + value.local + OVERFLOW_POINTER.pack(value.first_page)
+    return LEAF_CELL.pack(len(key), len(value)) + key + value
+
+
+def internal_cell(child, key):
+    return INTERNAL_CELL.pack(child, len(key)) + key
+
+
+def max_cell_size(page_size):
+    """Largest cell allowed in a page: any four of them fit together."""
+    return (page_size - PAGE_HEADER.size) // 4 - CELL_POINTER.size
+
+
+def local_value_size(page_size, key_length, value_length):
+    """How many bytes of a leaf value stay in the cell.
+
+    Entries up to max_cell_size are stored whole. Larger values keep only
+    a short prefix (the cell totals page_size // 16) and spill the rest to
+    overflow pages, so big rows do not crowd leaves."""
+    if LEAF_CELL.size + key_length + value_length <= max_cell_size(page_size):
+        return value_length
+    return max(0, page_size // 16 - LEAF_CELL.size - key_length - OVERFLOW_POINTER.size)
+
+
+def common_prefix(first, last):
+    """Longest common prefix of two keys (of a whole sorted run, given its ends)."""
+    n = min(len(first), len(last))
+    i = 0
+    while i < n and first[i] == last[i]:
+        i += 1
+    return first[:i]
+
+
+class SlottedPage:
+    """Slotted layout of a B-tree page, read and edited in place.
+
+    After the header come an optional key prefix shared by every key in
+    the page (internal nodes only), then the cell pointer array (u16
+    offsets in key order) growing towards the end of the page; cells are
+    packed from the end of the page towards the front. Cells store keys
+    without the prefix. Deleting a cell leaves a hole in the content area
+    that is counted in `free bytes` and reclaimed by defragment() when an
+    insert needs the room. Internal cells hold a key and the child to its
+    left; the right-most child lives in the header.
+
+    Reads work on any buffer (bytes, memoryview); edits need a writable
+    one such as Page.writable()."""
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.size = len(buffer)
+
+    # header
+    @property
+    def is_leaf(self):
+        return self.buffer[0] == 1
+
+    @property
+    def cell_count(self):
+        return COUNTS.unpack_from(self.buffer, 1)[0]
+
+    def header(self):
+        is_leaf, count, prefix_length, content_start, free_bytes, prev_leaf, next_leaf, right_child = \
+            PAGE_HEADER.unpack_from(self.buffer, 0)
+        return (is_leaf, count, prefix_length, content_start or self.size, free_bytes,
+                prev_leaf, next_leaf, right_child)
+
+    def _set_header(self, is_leaf, count, prefix_length, content_start, free_bytes, prev_leaf, next_leaf,
+                    right_child):
+        PAGE_HEADER.pack_into(self.buffer, 0, is_leaf, count, prefix_length, content_start, free_bytes,
+                              prev_leaf, next_leaf, right_child)
+
+    def prefix(self):
+        prefix_length = COUNTS.unpack_from(self.buffer, 1)[1]
+        return bytes(self.buffer[PAGE_HEADER.size:PAGE_HEADER.size + prefix_length])
+
+    def free_space(self):
+        """Bytes available for new cells and their pointers, counting holes."""
+        _, count, prefix_length, content_start, free_bytes, _, _, _ = self.header()
+        return content_start - self._pointers_end(prefix_length, count) + free_bytes
+
+    @staticmethod
+    def _pointers_end(prefix_length, count):
+        return PAGE_HEADER.size + prefix_length + count * CELL_POINTER.size
+
+    # cells
+    def _slot(self, index):
+        return PAGE_HEADER.size + COUNTS.unpack_from(self.buffer, 1)[1] + index * CELL_POINTER.size
+
+    def cell_offset(self, index):
+        return CELL_POINTER.unpack_from(self.buffer, self._slot(index))[0]
+
+    def cell_size(self, offset, is_leaf=None):
+        if is_leaf is None:
+            is_leaf = self.is_leaf
+        if is_leaf:
+            key_length, value_length = LEAF_CELL.unpack_from(self.buffer, offset)
+            local = local_value_size(self.size, key_length, value_length)
+            return LEAF_CELL.size + key_length + local + (OVERFLOW_POINTER.size if local < value_length else 0)
+        return INTERNAL_CELL.size + INTERNAL_CELL.unpack_from(self.buffer, offset)[1]
+
+    def key(self, index):
+        """Key of cell `index` as stored, i.e. without the page's prefix."""
+        offset = self.cell_offset(index)
+        if self.is_leaf:
+            key_length = LEAF_CELL.unpack_from(self.buffer, offset)[0]
+            start = offset + LEAF_CELL.size
+        else:
+            key_length = INTERNAL_CELL.unpack_from(self.buffer, offset)[1]
+            start = offset + INTERNAL_CELL.size
+        return self.buffer[start:start + key_length]
+
+    def value(self, index):
+        """The value bytes stored in the cell (only the local prefix of a spilled value)."""
+        offset = self.cell_offset(index)
+        key_length, value_length = LEAF_CELL.unpack_from(self.buffer, offset)
+        start = offset + LEAF_CELL.size + key_length
+        return self.buffer[start:start + local_value_size(self.size, key_length, value_length)]
+
+    def stored_value(self, index):
+        """The value of leaf cell `index` as a BTreeNode holds it: bytes or an OverflowValue."""
+        offset = self.cell_offset(index)
+        key_length, value_length = LEAF_CELL.unpack_from(self.buffer, offset)
+        start = offset + LEAF_CELL.size + key_length
+        local = local_value_size(self.size, key_length, value_length)
+        data = bytes(self.buffer[start:start + local])
+        if local == value_length:
+            return data
+        return OverflowValue(data, value_length, OVERFLOW_POINTER.unpack_from(self.buffer, start + local)[0])
+
+    def child(self, index):
+        """Child left of key `index`; index == cell count gives the right-most child."""
+        if index == self.cell_count:
+            return struct.unpack_from("<I", self.buffer, RIGHT_CHILD_OFFSET)[0]
+        return INTERNAL_CELL.unpack_from(self.buffer, self.cell_offset(index))[0]
+
+    def set_child(self, index, page_number):
+        if index == self.cell_count:
+            struct.pack_into("<I", self.buffer, RIGHT_CHILD_OFFSET, page_number)
+        else:
+            struct.pack_into("<I", self.buffer, self.cell_offset(index), page_number)
+
+    # search
+    def bisect_left(self, key):
+        """Index of the first key >= `key` (a full encoded key), searched in the page buffer."""
+        return self._bisect(key, False)
+
+    def bisect_right(self, key):
+        """Index of the first key > `key`."""
+        return self._bisect(key, True)
+
+    def _bisect(self, key, right):
+        buffer = self.buffer
+        count, prefix_length = COUNTS.unpack_from(buffer, 1)
+        if prefix_length:
+            # every key starts with the prefix: either the search key does too, or it sorts past one end
+            head = key[:prefix_length]
+            prefix = bytes(buffer[PAGE_HEADER.size:PAGE_HEADER.size + prefix_length])
+            if head != prefix:
+                return 0 if head < prefix else count
+            key = key[prefix_length:]
+
+        leaf = buffer[0] == 1
+        length_at = 0 if leaf else INTERNAL_CELL.size - KEY_LENGTH.size
+        header_size = LEAF_CELL.size if leaf else INTERNAL_CELL.size
+        pointers = PAGE_HEADER.size + prefix_length
+        copy = isinstance(buffer, memoryview)       # memoryviews only support == comparisons
+        lo, hi = 0, count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            offset = CELL_POINTER.unpack_from(buffer, pointers + mid * CELL_POINTER.size)[0]
+            start = offset + header_size
+            probe = buffer[start:start + KEY_LENGTH.unpack_from(buffer, offset + length_at)[0]]
+            if copy:
+                probe = bytes(probe)
+            if probe < key or (right and probe == key):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    # edits
+    def insert_cell(self, index, cell):
+        """Insert `cell` at position `index`, shifting only the pointers after it.
+
+        Returns False if the page cannot hold it even after defragmenting."""
+        is_leaf, count, prefix_length, content_start, free_bytes, prev_leaf, next_leaf, right_child = self.header()
+        needed = len(cell) + CELL_POINTER.size
+        pointers_end = self._pointers_end(prefix_length, count)
+        if content_start - pointers_end < needed:
+            if content_start - pointers_end + free_bytes < needed:
+                return False
+            content_start = self.defragment()
+            free_bytes = 0
+
+        content_start -= len(cell)
+        self.buffer[content_start:content_start + len(cell)] = cell
+        slot = self._slot(index)
+        self.buffer[slot + CELL_POINTER.size:pointers_end + CELL_POINTER.size] = self.buffer[slot:pointers_end]
+        CELL_POINTER.pack_into(self.buffer, slot, content_start)
+        self._set_header(is_leaf, count + 1, prefix_length, content_start, free_bytes, prev_leaf, next_leaf,
+                         right_child)
+        return True
+
+    def delete_cell(self, index):
+        is_leaf, count, prefix_length, content_start, free_bytes, prev_leaf, next_leaf, right_child = self.header()
+        offset = self.cell_offset(index)
+        size = self.cell_size(offset, is_leaf)
+        if offset == content_start:
+            content_start += size
+        else:
+            free_bytes += size
+        self.buffer[offset:offset + size] = bytes(size)
+
+        slot = self._slot(index)
+        pointers_end = self._pointers_end(prefix_length, count)
+        self.buffer[slot:pointers_end - CELL_POINTER.size] = self.buffer[slot + CELL_POINTER.size:pointers_end]
+        self.buffer[pointers_end - CELL_POINTER.size:pointers_end] = b"\x00\x00"
+        if count == 1:
+            content_start, free_bytes = self.size, 0
+        self._set_header(is_leaf, count - 1, prefix_length, content_start, free_bytes, prev_leaf, next_leaf,
+                         right_child)
+
+    def defragment(self):
+        """Repack all cells against the end of the page; returns the new content start."""
+        is_leaf, count, prefix_length, content_start, _, prev_leaf, next_leaf, right_child = self.header()
+        cells = []
+        for index in range(count):
+            offset = self.cell_offset(index)
+            cells.append(bytes(self.buffer[offset:offset + self.cell_size(offset, is_leaf)]))
+
+        end = self.size
+        pointers = PAGE_HEADER.size + prefix_length
+        for index, cell in enumerate(cells):
+            end -= len(cell)
+            self.buffer[end:end + len(cell)] = cell
+            CELL_POINTER.pack_into(self.buffer, pointers + index * CELL_POINTER.size, end)
+        if end > content_start:
+            self.buffer[content_start:end] = bytes(end - content_start)
+        self._set_header(is_leaf, count, prefix_length, end, 0, prev_leaf, next_leaf, right_child)
+        return end
+
+    def rewrite(self, is_leaf, cells, prev_leaf=0, next_leaf=0, right_child=0, prefix=b""):
+        """Replace the whole page with `cells` (in key order, keys without `prefix`), packed."""
+        _, old_count, old_prefix_length, old_content_start, _, _, _, _ = self.header()
+        old_pointers_end = min(self._pointers_end(old_prefix_length, old_count), self.size)
+        pointers_end = self._pointers_end(len(prefix), len(cells))
+        if pointers_end + sum(map(len, cells)) > self.size:
+            raise BTreeError("Serialized node exceeds page size")
+
+        self.buffer[PAGE_HEADER.size:PAGE_HEADER.size + len(prefix)] = prefix
+        end = self.size
+        pointers = PAGE_HEADER.size + len(prefix)
+        for index, cell in enumerate(cells):
+            end -= len(cell)
+            self.buffer[end:end + len(cell)] = cell
+            CELL_POINTER.pack_into(self.buffer, pointers + index * CELL_POINTER.size, end)
+
+        # clear what the old page used inside the new gap, so page images stay deterministic
+        stale_end = min(old_pointers_end, end)
+        if stale_end > pointers_end:
+            self.buffer[pointers_end:stale_end] = bytes(stale_end - pointers_end)
+        if old_content_start < end:
+            start = max(old_content_start, pointers_end)
+            self.buffer[start:end] = bytes(end - start)
+        self._set_header(is_leaf, len(cells), len(prefix), end, 0, prev_leaf, next_leaf, right_child)
@@ -0,0 +1,319 @@
+from backend.b_tree import BTree
+from backend.key_encoding import encode_key, TAG_TUPLE, TAG_NULL
+from backend.record import encode_record, Record, Records
+from backend.schema import Schema
+from utils.errors import ExecutionError, BTreeError
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class Table:
+    """Rows of one table, stored in a B-tree keyed by rowid.
+
+    Each row is a record (see backend.record) in column order under an
+    integer rowid handed out in insertion order, so scans return rows in
+    the order they were inserted and only the pages a scan is on need to
+    be in memory. Every change is applied to the table's indexes too."""
+
+    storage = "row"
+
+    def __init__(self, pager, name, columns, root_page=None):
+        self.pager = pager
+        self.name = name
+        self.columns = list(columns)
+        self.schema = Schema(self.columns)
+        self.tree = BTree(pager, root_page_num=root_page)
+        self.indexes = {}            # index name -> Index
+        self._next_rowid = None
+
+    @property
+    def root_page(self):
+        return self.tree.root_page_num
+
+    def _new_rowid(self):
+        if self._next_rowid is None:
+            with self.tree.cursor() as cursor:
+                self._next_rowid = cursor.key + 1 if cursor.last() else 1
+        rowid = self._next_rowid
+        self._next_rowid += 1
+        return rowid
+
+    def _record(self, values):
+        if len(values) != len(self.columns):
+            raise ExecutionError(f"Table '{self.name}' has {len(self.columns)} columns, got {len(values)} values")
+        return encode_record(values)
+
+    def insert(self, values):
+        """Append a row (values in column order); returns its rowid."""
+        record = self._record(values)
+        for index in self.indexes.values():
+            index.check(values)             # before the row is written: a key that cannot be stored leaves no trace
+        rowid = self._new_rowid()
+        self.tree.insert(rowid, record)
+        for index in self.indexes.values():
+            index.add(values, rowid)
+        logger.debug(f"Inserted row {rowid} into '{self.name}'")
+        return rowid
+
+    def update(self, rowid, values):
+        record = self._record(values)
+        old = self._values(rowid) if self.indexes else None
+        changed = [index for index in self.indexes.values() if old[index.position] != values[index.position]]
+        for index in changed:
+            index.check(values)
+        if not self.tree.delete(rowid):
+            raise ExecutionError(f"Row {rowid} not found in '{self.name}'")
+        self.tree.insert(rowid, record)
+        for index in changed:
+            index.remove(old, rowid)
+            index.add(values, rowid)
+
+    def delete(self, rowid):
+        old = self._values(rowid) if self.indexes else None
+        if not self.tree.delete(rowid):
+            raise ExecutionError(f"Row {rowid} not found in '{self.name}'")
+        for index in self.indexes.values():
+            index.remove(old, rowid)
+
+    def _values(self, rowid):
+        value = self.tree.get(rowid)
+        if value is None:
+            raise ExecutionError(f"Row {rowid} not found in '{self.name}'")
+        return Record(value).values()
+
+    def get(self, rowid):
+        """The row with this rowid as a Row (see backend.schema), or None."""
+        value = self.tree.get(rowid)
+        return None if value is None else self.row(Record(value))
+
+    def row(self, record):
+        return self.schema.row(record.values())
+
+    def cursor(self):
+        return TableCursor(self)
+
+    def index_scan(self, index_name, operator, value):
+        if index_name not in self.indexes:
+            raise ExecutionError(f"Index '{index_name}' not found on '{self.name}'")
+        return IndexScan(self, self.indexes[index_name], operator, value)
+
+    def drop(self):
+        """Free every page holding the table and its indexes."""
+        for index in self.indexes.values():
+            index.tree.drop()
+        self.tree.drop()
+
+
+class TableCursor:
+    """Walks a table's rows in rowid order.
+
+    The first next() moves onto the first row. Rows may be updated or
+    deleted while the cursor is open (see BTreeCursor)."""
+
+    def __init__(self, table):
+        self.table = table
+        self.cursor = table.tree.cursor()
+        self.started = False
+        self.rowid = None
+        self.record = None
+
+    def next(self):
+        if self.started:
+            found = self.cursor.next()
+        else:
+            found = self.cursor.first()
+            if found:
+                # a full scan reads the leaves in order: let the pager read ahead of it
+                self.table.pager.advise_sequential(self.cursor.page.number + 1)
+        self.started = True
+        if not found:
+            self.rowid = self.record = None
+            return False
+        self.rowid = self.cursor.key
+        self.record = Record(self.cursor.payload)
+        return True
+
+    def next_batch(self, size):
+        """Records of up to `size` following rows, taken a leaf at a time; empty at the end.
+
+        Afterwards the cursor is on the last of them, as if next() had
+        been called once per row."""
+        records = Records()
+        while len(records) < size and self.next():
+            records.extend(map(Record, self.cursor.payloads(size - len(records))))
+            self.rowid, self.record = self.cursor.key, records[-1]
+        return records
+
+    def row(self):
+        return self.table.row(self.record)
+
+    def update(self, values):
+        if self.rowid is None:
+            raise ExecutionError("No current row to update")
+        self.table.update(self.rowid, values)
+
+    def delete(self):
+        """Delete the current row; next() then moves to the row after it."""
+        if self.rowid is None:
+            raise ExecutionError("No current row to delete")
+        old = self.record.values() if self.table.indexes else None
+        self.cursor.delete()
+        for index in self.table.indexes.values():
+            index.remove(old, self.rowid)
+
+    def close(self):
+        self.cursor.close()
+        self.rowid = self.record = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class Index:
+    """Secondary index on one column of a Table.
+
+    A B-tree whose keys are (column value, rowid) tuples with empty
+    values: entries sort by value, rows with equal values by rowid, and
+    every key is unique."""
+
+    def __init__(self, pager, name, table, column, root_page=None):
+        if column not in table.columns:
+            raise ExecutionError(f"Table '{table.name}' has no column '{column}'")
+        self.name = name
+        self.table = table
+        self.column = column
+        self.position = table.columns.index(column)
+        self.tree = BTree(pager, root_page_num=root_page)
+
+    @property
+    def root_page(self):
+        return self.tree.root_page_num
+
+    def _key(self, values, rowid):
+        value = values[self.position]
+        key = (value, rowid)
+        try:
+            self.tree.check_key(key)
+        except BTreeError:
+            raise ExecutionError(f"Cannot index {type(value).__name__} value {value!r:.40} in column "
+                                 f"'{self.column}': unsupported type or too large for a key")
+        return key
+
+    def check(self, values):
+        """Raise ExecutionError unless a row with these values can be indexed.
+
+        Any rowid will do: rowids encode to a fixed size."""
+        self._key(values, 0)
+
+    def add(self, values, rowid):
+        self.tree.insert(self._key(values, rowid))
+
+    def remove(self, values, rowid):
+        self.tree.delete(self._key(values, rowid))
+
+    def build(self):
+        """Fill the (empty) index from the table's rows with one sorted bulk load."""
+        keys = []
+        with self.table.cursor() as cursor:
+            while cursor.next():
+                keys.append(self._key(cursor.record.values(), cursor.rowid))
+        keys.sort(key=encode_key)
+        return self.tree.bulk_load(keys)
+
+
+class IndexScan:
+    """Rows whose indexed column satisfies `column <operator> value`, in index order.
+
+    Works like a TableCursor. Bounds are checked on the encoded index
+    keys: an entry's key starts with `bound` (the tuple tag and the
+    encoded value) exactly when its value equals `value`, and sorts
+    below it exactly when its value is smaller. NULLs never match."""
+
+    OPERATORS = ("=", "<", "<=", ">", ">=")
+
+    def __init__(self, table, index, operator, value):
+        if operator not in self.OPERATORS:
+            raise ExecutionError(f"Index scans do not support operator '{operator}'")
+        self.table = table
+        self.index = index
+        self.operator = operator
+        self.value = value
+        self.bound = bytes([TAG_TUPLE]) + encode_key(value)
+        self.cursor = index.tree.cursor()
+        self.started = False
+        self.rowid = None
+        self.record = None
+
+    def _start(self):
+        if self.operator in ("<", "<="):
+            found = self.cursor.first()
+            nulls = bytes([TAG_TUPLE, TAG_NULL])
+            while found and self.cursor.encoded_key.startswith(nulls):
+                found = self.cursor.next()
+            return found
+        found = self.cursor.seek((self.value,))
+        if self.operator == ">":
+            while found and self.cursor.encoded_key.startswith(self.bound):
+                found = self.cursor.next()
+        return found
+
+    def _in_range(self):
+        key, bound = self.cursor.encoded_key, self.bound
+        if self.operator == "=":
+            return key.startswith(bound)
+        if self.operator == "<":
+            return key < bound
+        if self.operator == "<=":
+            return key < bound or key.startswith(bound)
+        return True                 # > and >= start past the bound and run to the end
+
+    def next(self):
+        found = self.cursor.next() if self.started else self._start()
+        self.started = True
+        if not found or not self._in_range():
+            self.rowid = self.record = None
+            return False
+        self.rowid = self.cursor.key[1]
+        self.record = Record(self.table.tree.get(self.rowid))
+        return True
+
+    def next_batch(self, size):
+        """Records of up to `size` following matching rows; empty at the end."""
+        records = Records()
+        while len(records) < size and self.next():
+            records.append(self.record)
+        return records
+
+    def row(self):
+        return self.table.row(self.record)
+
+    def update(self, values):
+        if self.rowid is None:
+            raise ExecutionError("No current row to update")
+        self.table.update(self.rowid, values)
+
+    def delete(self):
+        """Delete the current row; next() then moves to the next matching row."""
+        if self.rowid is None:
+            raise ExecutionError("No current row to delete")
+        old = self.record.values()
+        if not self.table.tree.delete(self.rowid):
+            raise ExecutionError(f"Row {self.rowid} not found in '{self.table.name}'")
+        self.cursor.delete()                    # this scan's own entry, in place
+        for index in self.table.indexes.values():
+            if index is not self.index:
+                index.remove(old, self.rowid)
+
+    def close(self):
+        self.cursor.close()
+        self.rowid = self.record = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
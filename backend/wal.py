@@ -0,0 +1,342 @@
+import os
+import struct
+import threading
+import time
+import zlib
+from utils.logger import get_logger
+from utils.errors import WALError
+from backend.os_interface import SYNC_OFF, SYNC_NORMAL, SYNC_FULL, SYNC_LEVELS
+
+logger = get_logger(__name__)
+
+WAL_MAGIC = b"PYSQLWAL"
+WAL_HEADER = struct.Struct("<8sII")      # magic, page size, salt
+FRAME_HEADER = struct.Struct("<IIII")    # page number, commit flag, salt, checksum
+
+DEFAULT_AUTOCHECKPOINT = 1000            # frames in the log before a checkpoint is triggered
+
+
+class WriteAheadLog:
+    """Append-only log of page images kept next to the database file.
+
+    Every modified page is appended as a frame to `<db>-wal`; the last frame of
+    a transaction carries the commit flag. The main file is only written by
+    checkpoint(), which copies the newest committed image of each page back
+    and truncates the log, so a crash at any point leaves either the old or
+    the new version of a transaction.
+
+    Commits from several threads share fsyncs (group commit): the first
+    committer to reach the barrier waits `group_commit_window` seconds, then
+    syncs every frame appended so far on behalf of everyone waiting.
+    """
+
+    def __init__(self, os_interface, sync_level=SYNC_NORMAL, autocheckpoint=DEFAULT_AUTOCHECKPOINT,
+                 background_checkpoint=False, group_commit_window=0.0):
+        if sync_level not in SYNC_LEVELS:
+            raise ValueError(f"sync_level must be one of {SYNC_LEVELS}, got {sync_level!r}")
+
+        self.os_interface = os_interface
+        self.page_size = os_interface.page_size
+        self.filepath = os_interface.filepath + "-wal"
+        self.sync_level = sync_level
+        self.autocheckpoint = autocheckpoint
+        self.background_checkpoint = background_checkpoint
+        self.group_commit_window = group_commit_window
+
+        self.fd = None
+        self.salt = 0
+        self.end_offset = WAL_HEADER.size
+        self.index = {}              # page_number -> frame offset, including uncommitted frames
+        self.committed_index = {}    # page_number -> frame offset, as of the last commit
+        self.pending = []            # page numbers appended since the last commit
+
+        self.lock = threading.RLock()
+        self.sync_cond = threading.Condition(self.lock)
+        self.commit_seq = 0          # bumped by every commit
+        self.synced_seq = 0          # highest commit known to be durable
+        self.syncing = False
+
+        self._checkpoint_event = threading.Event()
+        self._checkpoint_thread = None
+        self._closing = False
+
+        self.stats = {"commits": 0, "syncs": 0, "frames": 0, "checkpoints": 0}
+        logger.debug(f"Initialized WAL for '{self.os_interface.filepath}' (sync: {sync_level}, "
+                     f"autocheckpoint: {autocheckpoint}, background: {background_checkpoint})")
+
+    @property
+    def frame_size(self):
+        return FRAME_HEADER.size + self.page_size
+
+    @property
+    def frame_count(self):
+        return (self.end_offset - WAL_HEADER.size) // self.frame_size
+
+    @property
+    def max_page(self):
+        return max(self.index) if self.index else -1
+
+    def open(self):
+        try:
+            exists = os.path.exists(self.filepath)
+            self.fd = os.open(self.filepath, os.O_RDWR | os.O_CREAT, 0o644)
+            if exists and os.fstat(self.fd).st_size >= WAL_HEADER.size:
+                self._recover()
+            else:
+                self._reset(salt=int.from_bytes(os.urandom(4), "little"))
+        except WALError:
+            raise
+        except Exception as e:
+            logger.error(f"Error opening WAL '{self.filepath}': {e}")
+            raise WALError(f"Error opening WAL: {e}")
+
+        if self.background_checkpoint:
+            self._checkpoint_thread = threading.Thread(target=self._checkpoint_loop, name="wal-checkpoint", daemon=True)
+            self._checkpoint_thread.start()
+
+        logger.info(f"Opened WAL '{self.filepath}' with {len(self.committed_index)} committed pages")
+
+    def close(self, checkpoint=True):
+        if self.fd is None:
+            return
+
+        if self._checkpoint_thread is not None:
+            self._closing = True
+            self._checkpoint_event.set()
+            self._checkpoint_thread.join()
+            self._checkpoint_thread = None
+
+        if checkpoint:
+            self.checkpoint()
+
+        with self.lock:
+            empty = not self.index
+            os.close(self.fd)
+            self.fd = None
+
+        if empty:
+            os.remove(self.filepath)
+        logger.info(f"Closed WAL '{self.filepath}'")
+
+    # reading
+    def read_page(self, page_number):
+        """Newest image of a page from the log, or None if the log has none."""
+        with self.lock:
+            offset = self.index.get(page_number)
+            if offset is None:
+                return None
+            return os.pread(self.fd, self.page_size, offset + FRAME_HEADER.size)
+
+    # writing
+    def append_frame(self, page_number, data):
+        """Append an uncommitted frame (e.g. a dirty page evicted from the cache)."""
+        with self.lock:
+            self._write_frame(page_number, data, commit=False)
+
+    def commit(self, frames):
+        """Append frames, mark the transaction committed and wait until it is durable."""
+        seq = self.append_commit(frames)
+        if seq is not None:
+            self.wait_durable(seq)
+
+    def append_commit(self, frames):
+        """Append frames and mark the transaction committed, without waiting for the fsync.
+
+        Returns the commit's sequence number for wait_durable(), or None if
+        there was nothing to commit. Callers holding a lock of their own
+        release it in between, so other commits can join the same fsync."""
+        with self.lock:
+            frames = list(frames)
+            if not frames:
+                if not self.pending:
+                    return None
+                # Re-append the last evicted page so the transaction gets a commit frame
+                last = self.pending[-1]
+                frames = [(last, self.read_page(last))]
+
+            for i, (page_number, data) in enumerate(frames):
+                self._write_frame(page_number, data, commit=(i == len(frames) - 1))
+
+            for page_number in self.pending:
+                self.committed_index[page_number] = self.index[page_number]
+            self.pending = []
+
+            self.commit_seq += 1
+            self.stats["commits"] += 1
+            return self.commit_seq
+
+    def wait_durable(self, seq):
+        """Wait until commit `seq` is synced (sharing one fsync with concurrent commits)."""
+        self._sync_through(seq)
+        self._maybe_checkpoint()
+
+    def _write_frame(self, page_number, data, commit):
+        if self.fd is None:
+            raise WALError("WAL not open. Use open() first.")
+        if len(data) != self.page_size:
+            raise WALError(f"Frame data must be exactly {self.page_size} bytes")
+
+        offset = self.end_offset
+        header = self._frame_header(page_number, commit, data)
+        if hasattr(os, "pwritev"):
+            written = os.pwritev(self.fd, [header, data], offset)
+        else:
+            written = os.pwrite(self.fd, header + bytes(data), offset)
+        if written < self.frame_size:
+            # short write: finish the frame before the log moves past it
+            remainder = memoryview(header + bytes(data))[written:]
+            while remainder:
+                n = os.pwrite(self.fd, remainder, offset + self.frame_size - len(remainder))
+                if n <= 0:
+                    raise WALError(f"Could not write frame for page {page_number} at offset {offset}")
+                remainder = remainder[n:]
+
+        self.end_offset += self.frame_size
+        self.index[page_number] = offset
+        self.pending.append(page_number)
+        self.stats["frames"] += 1
+
+    def _frame_header(self, page_number, commit, data):
+        checksum = zlib.crc32(struct.pack("<III", page_number, commit, self.salt))
+        checksum = zlib.crc32(data, checksum)
+        return FRAME_HEADER.pack(page_number, commit, self.salt, checksum)
+
+    # group commit
+    def _sync_through(self, seq):
+        if self.sync_level == SYNC_OFF:
+            with self.lock:
+                self.synced_seq = max(self.synced_seq, seq)
+            return
+
+        with self.sync_cond:
+            while self.synced_seq < seq:
+                if self.syncing:
+                    self.sync_cond.wait()
+                    continue
+
+                # Become the leader: sync everything committed so far for all waiters
+                self.syncing = True
+                self.sync_cond.release()
+                try:
+                    if self.group_commit_window:
+                        time.sleep(self.group_commit_window)
+                    with self.lock:
+                        target = self.commit_seq
+                        fd = self.fd
+                    self._fsync(fd)
+                finally:
+                    self.sync_cond.acquire()
+                    self.syncing = False
+                    self.sync_cond.notify_all()
+
+                self.synced_seq = max(self.synced_seq, target)
+                self.stats["syncs"] += 1
+
+    def _fsync(self, fd):
+        if fd is None:
+            return
+        if self.sync_level == SYNC_FULL:
+            os.fsync(fd)
+        elif hasattr(os, "fdatasync"):
+            os.fdatasync(fd)
+        else:
+            os.fsync(fd)
+
+    # checkpointing
+    def checkpoint(self):
+        """Copy committed pages into the main file and restart the log.
+
+        Returns False when the log holds uncommitted frames and cannot be reset."""
+        with self.lock:
+            if self.fd is None:
+                return False
+            if self.pending:
+                logger.debug("Checkpoint skipped: uncommitted frames in WAL")
+                return False
+            if not self.committed_index:
+                return True
+
+            pages = sorted(self.committed_index)
+            run = []
+            for page_number in pages:
+                if run and page_number != run[-1] + 1:
+                    self._copy_run(run)
+                    run = []
+                run.append(page_number)
+            if run:
+                self._copy_run(run)
+            self.os_interface.sync()
+
+            copied = len(pages)
+            self._reset(salt=(self.salt + 1) & 0xFFFFFFFF)
+            self.stats["checkpoints"] += 1
+
+        logger.info(f"Checkpointed {copied} pages from '{self.filepath}'")
+        return True
+
+    def _copy_run(self, run):
+        data = [os.pread(self.fd, self.page_size, self.committed_index[n] + FRAME_HEADER.size) for n in run]
+        self.os_interface.write_pages(run[0], data)
+
+    def _maybe_checkpoint(self):
+        if not self.autocheckpoint or self.frame_count < self.autocheckpoint:
+            return
+        if self.background_checkpoint:
+            self._checkpoint_event.set()
+        else:
+            self.checkpoint()
+
+    def _checkpoint_loop(self):
+        while True:
+            self._checkpoint_event.wait()
+            self._checkpoint_event.clear()
+            if self._closing:
+                return
+            try:
+                self.checkpoint()
+            except Exception as e:
+                logger.error(f"Background checkpoint failed: {e}")
+
+    # recovery
+    def _reset(self, salt):
+        self.salt = salt
+        os.ftruncate(self.fd, 0)
+        os.pwrite(self.fd, WAL_HEADER.pack(WAL_MAGIC, self.page_size, self.salt), 0)
+        self.end_offset = WAL_HEADER.size
+        self.index = {}
+        self.committed_index = {}
+        self.pending = []
+
+    def _recover(self):
+        magic, page_size, salt = WAL_HEADER.unpack(os.pread(self.fd, WAL_HEADER.size, 0))
+        if magic != WAL_MAGIC:
+            raise WALError(f"'{self.filepath}' is not a WAL file")
+        if page_size != self.page_size:
+            raise WALError(f"WAL page size {page_size} does not match database page size {self.page_size}")
+
+        self.salt = salt
+        size = os.fstat(self.fd).st_size
+        offset = WAL_HEADER.size
+        committed_end = offset
+        uncommitted = {}
+
+        while offset + self.frame_size <= size:
+            header = os.pread(self.fd, FRAME_HEADER.size, offset)
+            data = os.pread(self.fd, self.page_size, offset + FRAME_HEADER.size)
+            page_number, commit, frame_salt, checksum = FRAME_HEADER.unpack(header)
+            if frame_salt != salt or self._frame_header(page_number, commit, data)[-4:] != header[-4:]:
+                break  # torn or stale frame: the log ends here
+
+            uncommitted[page_number] = offset
+            offset += self.frame_size
+            if commit:
+                self.committed_index.update(uncommitted)
+                uncommitted = {}
+                committed_end = offset
+
+        # Drop everything after the last commit frame
+        os.ftruncate(self.fd, committed_end)
+        self.end_offset = committed_end
+        self.index = dict(self.committed_index)
+        logger.info(f"Recovered {len(self.committed_index)} pages from WAL "
+                    f"(discarded {(size - committed_end) // self.frame_size} trailing frames)")
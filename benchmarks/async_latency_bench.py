@@ -0,0 +1,41 @@
+"""Per-query latency of AsyncDatabaseEngine at a given concurrency level.
+
+Usage: python -m benchmarks.async_latency_bench [concurrency] [queries] [workers]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+from engine.async_database import AsyncDatabaseEngine
+
+async def run(concurrency, queries, workers):
+    path = os.path.join(tempfile.mkdtemp(), "async_bench.db")
+    db = await AsyncDatabaseEngine.open(path, max_workers=workers)
+    try:
+        await db.execute("CREATE TABLE items (id INT, name TEXT, qty INT);")
+        for i in range(500):
+            await db.execute(f"INSERT INTO items (id, name, qty) VALUES ({i}, 'item{i}', {i % 7});")
+        db.latencies.clear()
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(i):
+            async with semaphore:
+                await db.fetch(f"SELECT * FROM items WHERE qty = {i % 7};")
+
+        await asyncio.gather(*(one(i) for i in range(queries)))
+        stats = db.latency_stats()
+        print(f"concurrency={concurrency} workers={workers} " +
+              " ".join(f"{key}={value:.3f}" if isinstance(value, float) else f"{key}={value}"
+                       for key, value in stats.items()))
+    finally:
+        await db.close()
+
+def main():
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    queries = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+    asyncio.run(run(concurrency, queries, workers))
+
+if __name__ == "__main__":
+    main()
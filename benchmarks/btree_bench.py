@@ -0,0 +1,64 @@
+"""Insert and point-lookup latency of the B+tree as it grows.
+
+Latency is sampled over a window of operations each time the tree
+reaches the next power of ten, from 1K keys up to max_keys.
+
+Usage: python -m benchmarks.btree_bench [max_keys] [cache_pages]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from backend.os_interface import OSInterface, SYNC_OFF
+from backend.pager import Pager
+from backend.b_tree import BTree
+
+WINDOW = 1000
+
+def measure(tree, pager, keys, start):
+    before = pager.stats["hits"] + pager.stats["misses"]
+    decoded_before = pager.stats["decoded_hits"], pager.stats["decoded_misses"]
+    t0 = time.perf_counter()
+    for key in keys[start:start + WINDOW]:
+        tree.insert(key)
+    insert_us = (time.perf_counter() - t0) / WINDOW * 1e6
+
+    probes = random.sample(keys[:start + WINDOW], WINDOW)
+    t0 = time.perf_counter()
+    for key in probes:
+        tree.search(key)
+    search_us = (time.perf_counter() - t0) / WINDOW * 1e6
+    pages = (pager.stats["hits"] + pager.stats["misses"] - before) / (2 * WINDOW)
+    hits = pager.stats["decoded_hits"] - decoded_before[0]
+    lookups = hits + pager.stats["decoded_misses"] - decoded_before[1]
+    return insert_us, search_us, pages, hits / lookups if lookups else 0.0
+
+def main():
+    max_keys = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    cache_pages = int(sys.argv[2]) if len(sys.argv) > 2 else 1024
+
+    osi = OSInterface(os.path.join(tempfile.mkdtemp(), "btree_bench.db"), sync_level=SYNC_OFF)
+    osi.open_file()
+    pager = Pager(osi, cache_size=cache_pages, policy="2q")
+    tree = BTree(pager)
+
+    keys = random.sample(range(2 ** 32), max_keys + WINDOW)
+    print(f"{'keys':>12} {'height':>6} {'insert us':>10} {'search us':>10} {'pages/op':>9} {'node hits':>9}")
+    inserted, target = 0, 1000
+    try:
+        while target <= max_keys:
+            for key in keys[inserted:target]:
+                tree.insert(key)
+            inserted = target
+            insert_us, search_us, pages, node_hits = measure(tree, pager, keys, inserted)
+            inserted += WINDOW
+            print(f"{target:>12,} {tree.height():>6} {insert_us:>10.1f} {search_us:>10.1f} {pages:>9.2f} {node_hits:>9.1%}")
+            target *= 10
+    finally:
+        pager.close()
+        osi.close_file()
+        os.remove(osi.filepath)
+
+if __name__ == "__main__":
+    main()
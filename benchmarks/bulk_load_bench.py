@@ -0,0 +1,47 @@
+"""Build time and size of a B+tree: repeated inserts vs bulk_load.
+
+Both trees index the same sorted keys. Inserting sorted keys splits every
+leaf half full; bulk_load fills leaves to the fill factor and writes each
+page once.
+
+Usage: python -m benchmarks.bulk_load_bench [keys] [fill_factor]
+"""
+import os
+import sys
+import tempfile
+import time
+from backend.os_interface import OSInterface, SYNC_OFF
+from backend.pager import Pager
+from backend.b_tree import BTree
+
+def build(keys, bulk, fill_factor):
+    osi = OSInterface(os.path.join(tempfile.mkdtemp(), "bulk_load_bench.db"), sync_level=SYNC_OFF)
+    osi.open_file()
+    pager = Pager(osi, cache_size=1024, policy="2q")
+    try:
+        tree = BTree(pager)
+        t0 = time.perf_counter()
+        if bulk:
+            tree.bulk_load(keys, fill_factor=fill_factor)
+        else:
+            for key in keys:
+                tree.insert(key)
+        pager.flush_all()
+        return time.perf_counter() - t0, pager.num_pages, tree.height()
+    finally:
+        pager.close()
+        osi.close_file()
+        os.remove(osi.filepath)
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    fill_factor = float(sys.argv[2]) if len(sys.argv) > 2 else 0.9
+    keys = range(0, count * 2, 2)
+
+    print(f"{'method':>10} {'seconds':>8} {'keys/s':>12} {'pages':>8} {'height':>6}")
+    for name, bulk in (("insert", False), ("bulk_load", True)):
+        seconds, pages, height = build(keys, bulk, fill_factor)
+        print(f"{name:>10} {seconds:>8.2f} {count / seconds:>12,.0f} {pages:>8,} {height:>6}")
+
+if __name__ == "__main__":
+    main()
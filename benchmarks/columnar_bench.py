@@ -0,0 +1,88 @@
+"""Row versus columnar storage for a wide table.
+
+Loads the same `rows` rows of a 16-column table once as a row table and
+once as a columnar table, then reopens the file and runs queries that
+touch one to three columns, cold (first run after reopening) in
+row-at-a-time and batch mode. Reports the pages each table takes, and
+per query the pages read from disk, the seconds taken and the rows/s.
+
+Usage: python -m benchmarks.columnar_bench [rows] [cache_pages]
+"""
+import os
+import sys
+import tempfile
+import time
+from backend.os_interface import OSInterface, SYNC_OFF
+from backend.pager import Pager
+from backend.catalog import Catalog
+from compiler.tokenizer import Tokenizer
+from compiler.parser import Parser
+from compiler.code_generator import CodeGeneration, PlanGenerator
+from core.virtual_machine import VirtualMachine
+from core.vectors import DEFAULT_BATCH_SIZE
+
+COLUMNS = ["id", "grp", "status", "amount"] + [f"pad{i}" for i in range(12)]
+QUERIES = [
+    "SELECT id FROM {t} WHERE grp = '7';",
+    "SELECT id, amount FROM {t} WHERE status = 'open';",
+    "SELECT amount FROM {t} WHERE id < '0000500';",
+]
+
+def values(i):
+    return ([f"{i:07d}", str(i % 100), ("open", "closed", "held")[i % 3], str(i * 7 % 10007)]
+            + [f"{column} of row {i}" for column in COLUMNS[4:]])
+
+def load(path, rows, storage):
+    osi = OSInterface(path, sync_level=SYNC_OFF)
+    osi.open_file()
+    pager = Pager(osi, cache_size=4096, policy="2q")
+    try:
+        before = pager.num_pages
+        table = Catalog(pager).create_table(f"t_{storage}", COLUMNS, storage=storage)
+        for i in range(rows):
+            table.insert(values(i))
+        return pager.num_pages - before
+    finally:
+        pager.close()
+        osi.close_file()
+
+def run(path, query, cache_pages, batch_size):
+    osi = OSInterface(path, sync_level=SYNC_OFF)
+    osi.open_file()
+    pager = Pager(osi, cache_size=cache_pages, policy="2q")
+    try:
+        catalog = Catalog(pager)
+        schema = catalog.schema()
+        parsed = Parser(Tokenizer().tokenize(query), schema_registry=schema).parse()
+        plan = PlanGenerator(schema_registry=schema, catalog=catalog).generate_plan(CodeGeneration().gen(parsed))
+        misses = pager.stats["misses"]
+        t0 = time.perf_counter()
+        result = VirtualMachine(catalog, batch_size=batch_size).execute(plan)
+        return time.perf_counter() - t0, pager.stats["misses"] - misses, len(result)
+    finally:
+        pager.close()
+        osi.close_file()
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    cache_pages = int(sys.argv[2]) if len(sys.argv) > 2 else 1024
+
+    path = os.path.join(tempfile.mkdtemp(), "columnar_bench.db")
+    try:
+        for storage in ("row", "columnar"):
+            t0 = time.perf_counter()
+            pages = load(path, rows, storage)
+            print(f"{storage:>8} table: {rows:,} rows x {len(COLUMNS)} columns in {pages:,} pages, "
+                  f"loaded in {time.perf_counter() - t0:.1f}s")
+        print(f"\n{'query':>52} {'storage':>8} {'mode':>5} {'pages':>7} {'seconds':>8} {'M rows/s':>9} {'rows out':>9}")
+        for query in QUERIES:
+            for storage in ("row", "columnar"):
+                for mode, batch_size in (("row", None), ("batch", DEFAULT_BATCH_SIZE)):
+                    seconds, pages, out = run(path, query.format(t=f"t_{storage}"), cache_pages, batch_size)
+                    print(f"{query.format(t='t'):>52} {storage:>8} {mode:>5} {pages:>7,} {seconds:>8.2f} "
+                          f"{rows / seconds / 1e6:>9.2f} {out:>9,}")
+    finally:
+        os.remove(path)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Mass delete from a table's rowid B-tree.
+
+Bulk-loads `rows` records, then deletes them all three ways: a cursor
+deleting every row as it walks (what a DELETE plan does), key-at-a-time
+deletes in random order, and a cursor deleting every other row. Reports
+the time per delete, the height left behind and the pages freed.
+
+Usage: python -m benchmarks.delete_bench [rows] [cache_pages]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from backend.os_interface import OSInterface, SYNC_OFF
+from backend.pager import Pager
+from backend.b_tree import BTree
+from backend.record import encode_record
+
+def load(pager, rows):
+    tree = BTree(pager)
+    records = ((rowid, encode_record([rowid, f"row {rowid}", rowid % 100])) for rowid in range(1, rows + 1))
+    tree.bulk_load(records, with_values=True)
+    return tree
+
+def cursor_delete(tree, rows, step):
+    deleted = 0
+    with tree.cursor() as cursor:
+        found, position = cursor.first(), 0
+        while found:
+            if position % step == 0:
+                cursor.delete()
+                deleted += 1
+            found, position = cursor.next(), position + 1
+    return deleted
+
+def random_delete(tree, rows, step):
+    keys = list(range(1, rows + 1))
+    random.shuffle(keys)
+    for key in keys:
+        tree.delete(key)
+    return rows
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    cache_pages = int(sys.argv[2]) if len(sys.argv) > 2 else 1024
+
+    osi = OSInterface(os.path.join(tempfile.mkdtemp(), "delete_bench.db"), sync_level=SYNC_OFF)
+    osi.open_file()
+    pager = Pager(osi, cache_size=cache_pages, policy="2q")
+    print(f"{'workload':>16} {'rows':>10} {'seconds':>8} {'us/delete':>10} {'height':>12} {'pages freed':>11}")
+    try:
+        for name, delete, step in (("cursor, all", cursor_delete, 1), ("random keys", random_delete, 1),
+                                   ("cursor, half", cursor_delete, 2)):
+            tree = load(pager, rows)
+            height, free_before = tree.height(), pager.header.freelist_count
+            t0 = time.perf_counter()
+            deleted = delete(tree, rows, step)
+            seconds = time.perf_counter() - t0
+            print(f"{name:>16} {deleted:>10,} {seconds:>8.2f} {seconds / deleted * 1e6:>10.1f} "
+                  f"{f'{height} -> {tree.height()}':>12} {pager.header.freelist_count - free_before:>11,}")
+            tree.drop()
+    finally:
+        pager.close()
+        osi.close_file()
+        os.remove(osi.filepath)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Compare the seek+read page path of OSInterface with the mmap path.
+
+Usage: python -m benchmarks.mmap_read_bench [size_mb] [path]
+"""
+import os
+import sys
+import time
+from backend.os_interface import OSInterface, DEFAULT_PAGE_SIZE
+from backend.pager import Pager
+
+def build_file(path, size_mb):
+    chunk = os.urandom(DEFAULT_PAGE_SIZE) * 256       # 1 MB
+    with open(path, "wb") as f:
+        for _ in range(size_mb):
+            f.write(chunk)
+
+def scan(path, use_mmap):
+    osi = OSInterface(path, use_mmap=use_mmap)
+    osi.open_file()
+    pager = Pager(osi, cache_size=64)
+    try:
+        pages = osi.file_size // DEFAULT_PAGE_SIZE
+        checksum = 0
+        start = time.perf_counter()
+        for page_num in range(pages):
+            checksum ^= pager.get_page(page_num).data[0]
+        elapsed = time.perf_counter() - start
+        return pages, elapsed, checksum
+    finally:
+        osi.close_file()
+
+def main():
+    size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 256
+    path = sys.argv[2] if len(sys.argv) > 2 else "mmap_bench.db"
+
+    created = not os.path.exists(path)
+    if created:
+        print(f"Building {size_mb} MB test file at {path}...")
+        build_file(path, size_mb)
+
+    try:
+        for label, use_mmap in (("seek+read", False), ("mmap", True)):
+            pages, elapsed, checksum = scan(path, use_mmap)
+            print(f"{label:>10}: {pages} pages in {elapsed:.3f}s "
+                  f"({pages / elapsed:,.0f} pages/s, checksum {checksum})")
+    finally:
+        if created:
+            os.remove(path)
+
+if __name__ == "__main__":
+    main()
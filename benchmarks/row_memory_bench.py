@@ -0,0 +1,76 @@
+"""Memory of result rows: backend.schema.Rows versus the dicts they replace.
+
+Bulk-loads a `rows`-row table of `columns` text columns and runs
+SELECT * through the VirtualMachine, row at a time and in batches,
+reporting the time taken and (with tracemalloc) the memory the result
+holds, values included. Then the same values are packed again as Rows,
+as the dicts the VM used to return and as plain tuples, to compare the
+cost of the row objects alone. Sizes are MB per million rows, which is
+also bytes per row. Everything runs under tracemalloc, so the times are
+only comparable with each other.
+
+Usage: python -m benchmarks.row_memory_bench [rows] [columns]
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from backend.os_interface import OSInterface, SYNC_OFF
+from backend.pager import Pager
+from backend.catalog import Catalog
+from backend.record import encode_record
+from compiler.tokenizer import Tokenizer
+from compiler.parser import Parser
+from compiler.code_generator import CodeGeneration, PlanGenerator
+from core.virtual_machine import VirtualMachine
+from core.vectors import DEFAULT_BATCH_SIZE
+
+def measure(build):
+    """(result, seconds, bytes allocated by build() and still held)"""
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    result = build()
+    seconds = time.perf_counter() - t0
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, seconds, held
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    columns = [f"c{i}" for i in range(int(sys.argv[2]) if len(sys.argv) > 2 else 6)]
+
+    osi = OSInterface(os.path.join(tempfile.mkdtemp(), "row_memory_bench.db"), sync_level=SYNC_OFF)
+    osi.open_file()
+    pager = Pager(osi, cache_size=1024, policy="2q")
+    try:
+        catalog = Catalog(pager)
+        table = catalog.create_table("t", columns)
+        records = ((rowid, encode_record([f"{column}-{rowid}" for column in columns]))
+                   for rowid in range(1, rows + 1))
+        table.tree.bulk_load(records, with_values=True)
+        schema = catalog.schema()
+        parsed = Parser(Tokenizer().tokenize("SELECT * FROM t;"), schema_registry=schema).parse()
+        plan = PlanGenerator(schema_registry=schema, catalog=catalog).generate_plan(CodeGeneration().gen(parsed))
+
+        print(f"{rows:,} rows x {len(columns)} columns")
+        print(f"{'':>28} {'seconds':>8} {'MB / M rows':>12}")
+        for mode, batch_size in (("row", None), ("batch", DEFAULT_BATCH_SIZE)):
+            results, seconds, held = measure(lambda: VirtualMachine(catalog, batch_size=batch_size).execute(plan))
+            print(f"{f'SELECT * result, {mode} mode':>28} {seconds:>8.2f} {held / rows:>12.1f}")
+
+        # the values are shared with `results`: only the row objects count below
+        values = [tuple(row.values()) for row in results]
+        make_row = table.schema.row_type()
+        for name, build in (("Row", lambda: [make_row(*row) for row in values]),
+                            ("dict", lambda: [dict(zip(columns, row)) for row in values]),
+                            ("tuple", lambda: [tuple(list(row)) for row in values])):
+            _, seconds, held = measure(build)
+            print(f"{f'{name} objects only':>28} {seconds:>8.2f} {held / rows:>12.1f}")
+    finally:
+        pager.close()
+        osi.close_file()
+        os.remove(osi.filepath)
+
+if __name__ == "__main__":
+    main()
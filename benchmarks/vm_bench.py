@@ -0,0 +1,92 @@
+"""Opcode throughput of the VirtualMachine on a full-table scan.
+
+Bulk-loads a `rows`-row table, then runs a few scan queries, planned
+both with compiled WHERE/projection closures (FILTER, PROJECT_ROW) and
+with the interpreted stack opcodes, and runs the compiled plans again in
+vectorized batch mode. Each is run once with counting handlers to find how many instructions it executes,
+then timed with the real handler table. "scan only" is a bare
+TableCursor walk over the same rows: the storage cost every
+row-at-a-time plan pays. A batch executes one instruction
+per batch rather than per row, so compare tiers by rows/s.
+
+Usage: python -m benchmarks.vm_bench [rows] [cache_pages]
+"""
+import os
+import sys
+import tempfile
+import time
+from backend.os_interface import OSInterface, SYNC_OFF
+from backend.pager import Pager
+from backend.catalog import Catalog
+from backend.record import encode_record
+from compiler.tokenizer import Tokenizer
+from compiler.parser import Parser
+from compiler.code_generator import CodeGeneration, PlanGenerator
+from core.assembler import assemble
+from core.virtual_machine import VirtualMachine
+from core.vectors import DEFAULT_BATCH_SIZE
+
+QUERIES = [
+    "SELECT * FROM t;",
+    "SELECT id FROM t WHERE grp = 7;",
+    "SELECT id, name FROM t WHERE grp < 50;",
+]
+
+def compile_query(catalog, query, compile_expressions):
+    schema = catalog.schema()
+    parsed = Parser(Tokenizer().tokenize(query), schema_registry=schema).parse()
+    planner = PlanGenerator(schema_registry=schema, catalog=catalog, compile_expressions=compile_expressions)
+    return assemble(planner.generate_plan(CodeGeneration().gen(parsed)))
+
+def count_instructions(catalog, program, batch_size):
+    vm = VirtualMachine(catalog, batch_size=batch_size)
+    counts = [0]
+    def counting(handler):
+        def wrapper(pc, args):
+            counts[0] += 1
+            return handler(pc, args)
+        return wrapper
+    vm.handlers = [counting(handler) for handler in vm.handlers]
+    vm.batch_handlers = [counting(handler) for handler in vm.batch_handlers]
+    vm.execute(program)
+    return counts[0]
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    cache_pages = int(sys.argv[2]) if len(sys.argv) > 2 else 1024
+
+    osi = OSInterface(os.path.join(tempfile.mkdtemp(), "vm_bench.db"), sync_level=SYNC_OFF)
+    osi.open_file()
+    pager = Pager(osi, cache_size=cache_pages, policy="2q")
+    try:
+        catalog = Catalog(pager)
+        table = catalog.create_table("t", ["id", "name", "grp"])
+        records = ((rowid, encode_record([str(rowid), f"name{rowid}", str(rowid % 100)]))
+                   for rowid in range(1, rows + 1))
+        table.tree.bulk_load(records, with_values=True)
+
+        t0 = time.perf_counter()
+        with table.cursor() as cursor:
+            while cursor.next():
+                pass
+        scan = time.perf_counter() - t0
+        print(f"{'query':>40} {'tier':>11} {'seconds':>8} {'instructions':>13} {'M ops/s':>8} {'M rows/s':>9}")
+        print(f"{'scan only':>40} {'':>11} {scan:>8.2f} {'':>13} {'':>8} {rows / scan / 1e6:>9.2f}")
+
+        for query in QUERIES:
+            for tier, compile_expressions, batch_size in (("interpreted", False, None), ("compiled", True, None),
+                                                          ("batch", True, DEFAULT_BATCH_SIZE)):
+                program = compile_query(catalog, query, compile_expressions)
+                instructions = count_instructions(catalog, program, batch_size)
+                t0 = time.perf_counter()
+                VirtualMachine(catalog, batch_size=batch_size).execute(program)
+                seconds = time.perf_counter() - t0
+                print(f"{query:>40} {tier:>11} {seconds:>8.2f} {instructions:>13,} {instructions / seconds / 1e6:>8.2f} "
+                      f"{rows / seconds / 1e6:>9.2f}")
+    finally:
+        pager.close()
+        osi.close_file()
+        os.remove(osi.filepath)
+
+if __name__ == "__main__":
+    main()
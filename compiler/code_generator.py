@@ -1,15 +1,104 @@
+import operator
+from functools import lru_cache
 from utils.logger import get_logger
 from utils.errors import ExecutionError
 from utils.errors import CodegenError
 from compiler.parser import Parser
+from backend.schema import Schema
 
 logger = get_logger(__name__)
 
+COMPARE_OPCODES = {
+    "=": "COMPARE_EQ", "!=": "COMPARE_NEQ",
+    "<": "COMPARE_LT", "<=": "COMPARE_LTE",
+    ">": "COMPARE_GT", ">=": "COMPARE_GTE",
+}
+INDEX_OPERATORS = ("=", "<", "<=", ">", ">=")      # predicates an index scan can answer
+PYTHON_OPERATORS = {"=": "==", "!=": "!=", "<": "<", "<=": "<=", ">": ">", ">=": ">="}
+OPERATOR_FUNCTIONS = {"=": operator.eq, "!=": operator.ne, "<": operator.lt,
+                      "<=": operator.le, ">": operator.gt, ">=": operator.ge}
+
+
+def _compiled(name, source, description, make_row=None):
+    """Compile one generated `def <name>(row)`.
+
+    `make_row` is the Row class the source may call as Row(...)."""
+    namespace = {"Row": make_row}
+    exec(compile(source, f"<{description}>", "exec"), namespace)
+    function = namespace[name]
+    function.__qualname__ = description         # shows up in plan listings
+    return function
+
+def compile_predicate(where, schema=None):
+    """A function of a row that is True when the row satisfies `where`.
+
+    Compares exactly like the LOAD_COLUMN / LOAD_CONST / COMPARE_* opcodes:
+    a column against the constant as a string, or two columns for equality.
+    Given the table's Schema it indexes the row by column ordinal, as the
+    VM's rows are; without one it takes a dict. Its `vectorized` attribute
+    does the same for a whole core.vectors.Batch, returning the selection
+    of matching rows. Identical predicates share one function."""
+    key = schema.ordinal if schema is not None else lambda column: column
+    if where.get("type") == "column_compare":
+        return _column_predicate(key(where["left_column"]), key(where["right_column"]),
+                                 f"where {where['left_column']} = {where['right_column']}")
+    value = str(where["value"])
+    return _value_predicate(key(where["column"]), where.get("operator"), value,
+                            f"where {where['column']} {where.get('operator', '=')} {value!r}")
+
+# Cached on everything a function's attributes depend on: a cached function is
+# shared by every program compiled from it, so its attributes are set only here.
+@lru_cache(maxsize=256)
+def _column_predicate(left, right, description):
+    predicate = _compiled("predicate", f"def predicate(row):\n    return row[{left!r}] == row[{right!r}]\n", description)
+    predicate.vectorized = lambda batch: batch.compare(left, operator.eq, batch.column(right))
+    return predicate
+
+@lru_cache(maxsize=256)
+def _value_predicate(column, operator_symbol, value, description):
+    symbol = PYTHON_OPERATORS.get(operator_symbol, "==")
+    compare = OPERATOR_FUNCTIONS.get(operator_symbol, operator.eq)
+    predicate = _compiled("predicate", f"def predicate(row):\n    return row[{column!r}] {symbol} {value!r}\n", description)
+    predicate.vectorized = lambda batch: batch.compare(column, compare, value)
+    return predicate
+
+def compile_projection(columns, schema=None):
+    """A function building the output row of `columns` (all of them for * or none).
+
+    Given the table's Schema it reads the row by column ordinal and
+    returns a backend.schema.Row; without one it maps a dict to a dict."""
+    if schema is not None:
+        positions = schema.positions(columns)
+        return _row_projection(positions, schema.row_type(positions))
+    if not columns or columns == ["*"]:
+        return _dict_projection(None)
+    return _dict_projection(tuple(columns))
+
+@lru_cache(maxsize=256)
+def _row_projection(positions, make_row):
+    values = ", ".join(f"row[{position}]" for position in positions)
+    project = _compiled("project", f"def project(row):\n    return Row({values})\n",
+                        f"select {', '.join(make_row.fields)}", make_row)
+    project.columns, project.row_type = positions, make_row     # what a batch materializes instead
+    return project
+
+@lru_cache(maxsize=256)
+def _dict_projection(columns):
+    if columns is None:
+        project = _compiled("project", "def project(row):\n    return row.copy()\n", "select *")
+        project.columns = project.row_type = None
+        return project
+    fields = ", ".join(f"{column!r}: row[{column!r}]" for column in columns)
+    project = _compiled("project", f"def project(row):\n    return {{{fields}}}\n", f"select {', '.join(columns)}")
+    project.columns, project.row_type = list(columns), None
+    return project
+
 class CreateTableCommand:
-    def __init__(self, columns, table_name):
+    def __init__(self, columns, table_name, options=None):
         logger.debug(f"Creating Table: {table_name} with columns: {columns}")
         self.columns = columns
         self.table_name = table_name
+        self.options = options or {}
         logger.info(f"Table {table_name} creation with columns finished.")
 
 class SelectTableCommand:
@@ -38,6 +127,16 @@ class DropCommand:
     def __init__(self, table_name):
         self.table_name = table_name
 
+class CreateIndexCommand:
+    def __init__(self, index_name, table_name, column):
+        self.index_name = index_name
+        self.table_name = table_name
+        self.column = column
+
+class DropIndexCommand:
+    def __init__(self, index_name):
+        self.index_name = index_name
+
 
 class CodeGeneration:
     def gen(self, parsed_statement):
@@ -77,7 +176,20 @@ class CodeGeneration:
         elif statement_type == "CREATE":
             return CreateTableCommand(
                 table_name=parsed_statement["table_name"],
-                columns=parsed_statement["columns"]
+                columns=parsed_statement["columns"],
+                options=parsed_statement.get("options")
+            )
+
+        elif statement_type == "CREATE_INDEX":
+            return CreateIndexCommand(
+                index_name=parsed_statement["index_name"],
+                table_name=parsed_statement["table_name"],
+                column=parsed_statement["column"]
+            )
+
+        elif statement_type == "DROP_INDEX":
+            return DropIndexCommand(
+                index_name=parsed_statement["index_name"]
             )
 
         else:
@@ -87,8 +199,10 @@ class CodeGeneration:
 
 
 class PlanGenerator:
-    def __init__(self, schema_registry=None):
+    def __init__(self, schema_registry=None, catalog=None, compile_expressions=True):
         self.schema_registry = schema_registry or {}
+        self.catalog = catalog           # consulted for indexes; without one every WHERE is a full scan
+        self.compile_expressions = compile_expressions     # FILTER / PROJECT_ROW instead of stack opcodes
         self.label_counter = 0
     
     def _new_label(self):
@@ -113,6 +227,10 @@ class PlanGenerator:
                 return self._generate_select_plan(command)
             elif isinstance(command, UpdateTableCommand):
                 return self._generate_update_plan(command)
+            elif isinstance(command, CreateIndexCommand):
+                return self._generate_create_index_plan(command)
+            elif isinstance(command, DropIndexCommand):
+                return self._generate_drop_index_plan(command)
             else:
                 raise ValueError(f"Unsupported command type: {type(command)}")
                 
@@ -134,112 +252,136 @@ class PlanGenerator:
         return plan
 
     def _generate_select_plan(self, cmd):
-        loop_label = self._new_label()
-        end_label = self._new_label()
-
-        plan = [
-            ("OPEN_TABLE", cmd.table_name),
-            ("SCAN_START",),
-            ("LABEL", loop_label),
-            ("SCAN_NEXT",),
-            ("JUMP_IF_FALSE", end_label),
-        ]
-
-        # Optional WHERE clause
-        if cmd.where_clause:
-            skip_label = self._new_label()
-            plan.extend([
-                ("LOAD_COLUMN", cmd.where_clause["column"]),
-                ("LOAD_CONST", str(cmd.where_clause["value"])),
-                ("COMPARE_EQ",),
-                ("JUMP_IF_FALSE", skip_label),
-                ("EMIT_ROW", cmd.columns),
-                ("LABEL", skip_label),
-            ])
-        else:
-            plan.append(("EMIT_ROW", cmd.columns))
-
-        plan.append(("JUMP", loop_label))
-        plan.append(("LABEL", end_label))
-        plan.append(("SCAN_END",))
-
-        return plan
-
+        schema = self._schema(cmd.table_name)
+        if not self._resolves(schema, cmd.columns or []):
+            return self._scan_plan(cmd, [("EMIT_ROW", cmd.columns)])     # the VM reports the missing column
+        if self.compile_expressions:
+            return self._scan_plan(cmd, [("PROJECT_ROW", compile_projection(cmd.columns, schema))])
+        positions = schema.positions(cmd.columns)
+        return self._scan_plan(cmd, [("EMIT_ROW", positions, schema.row_type(positions))])
 
     def _generate_update_plan(self, cmd):
-        plan = []
-
-        loop_label = self._new_label()
-        end_label = self._new_label()
-        skip_label = self._new_label()
-
-        plan.append(("OPEN_TABLE", cmd.table_name))
-        plan.append(("SCAN_START",))
-        plan.append(("LABEL", loop_label))
-        plan.append(("SCAN_NEXT",))
-        plan.append(("JUMP_IF_FALSE", end_label))
-
-        # WHERE condition
-        if cmd.where_clause:
-            plan.extend([
-                ("LOAD_COLUMN", cmd.where_clause["column"]),
-                ("LOAD_CONST", str(cmd.where_clause["value"])),
-                ("COMPARE_EQ",),
-                ("JUMP_IF_FALSE", skip_label)
-            ])
-
-        # Perform update
+        schema = self._schema(cmd.table_name)
+        body = []
         for column, value in cmd.updates.items():
-            plan.extend([
+            body.extend([
                 ("LOAD_CONST", str(value)),
-                ("UPDATE_COLUMN", column)
+                ("UPDATE_COLUMN", self._column(schema, column))
             ])
-
-        plan.append(("LABEL", skip_label))
-        plan.append(("JUMP", loop_label))
-        plan.append(("LABEL", end_label))
-        plan.append(("SCAN_END",))
-
-        return plan
-
+        # an index on a column being changed could meet the updated rows again, so it is not used
+        return self._scan_plan(cmd, body, updated_columns=cmd.updates)
 
     def _generate_delete_plan(self, cmd):
-        plan = []
-
+        return self._scan_plan(cmd, [("DELETE_ROW",)])
+
+    def _choose_index(self, cmd, updated_columns=()):
+        """Index that answers cmd's WHERE clause on its own, or None."""
+        where = cmd.where_clause
+        if self.catalog is None or not where or where.get("type") != "value_compare":
+            return None
+        if where["operator"] not in INDEX_OPERATORS or where["column"] in updated_columns:
+            return None
+        return self.catalog.index_on(cmd.table_name, where["column"])
+
+    def _schema(self, table_name):
+        """The table's Schema, for resolving column names to ordinals; None for an unknown table."""
+        if self.catalog is not None and table_name in self.catalog:
+            return self.catalog[table_name].schema
+        columns = self.schema_registry.get(table_name)
+        if columns is None:
+            return None
+        return Schema([column if isinstance(column, str) else column["name"] for column in columns])
+
+    @staticmethod
+    def _resolves(schema, columns):
+        return schema is not None and all(column in schema for column in columns if column != "*")
+
+    @staticmethod
+    def _column(schema, column):
+        """The column's ordinal, or its name for the VM to look up (and report) when it cannot be resolved."""
+        return schema.ordinal(column) if schema is not None and column in schema else column
+
+    @staticmethod
+    def _where_columns(where):
+        if where.get("type") == "column_compare":
+            return [where["left_column"], where["right_column"]]
+        return [where["column"]]
+
+    def _storage(self, table_name):
+        if self.catalog is None or table_name not in self.catalog:
+            return "row"
+        return self.catalog[table_name].storage
+
+    def _scan_plan(self, cmd, body, updated_columns=()):
+        """Run `body` for every row of cmd's table that matches its WHERE clause.
+
+        An equality or range predicate on an indexed column becomes an
+        INDEX_SEEK / INDEX_NEXT loop over just the matching rows; anything
+        else is a SCAN_START / SCAN_NEXT loop testing every row, with one
+        FILTER call per row (or the stack opcodes of _condition when
+        expressions are not compiled). A columnar table's SCAN_START also
+        gets the WHERE clause, to skip segments by their min/max. Columns
+        are referred to by ordinal wherever the table's schema is known."""
         loop_label = self._new_label()
         end_label = self._new_label()
-        skip_label = self._new_label()
+        where = cmd.where_clause
+        index_name = self._choose_index(cmd, updated_columns)
+        schema = self._schema(cmd.table_name)
 
-        plan.append(("OPEN_TABLE", cmd.table_name))
-        plan.append(("SCAN_START",))
-        plan.append(("LABEL", loop_label))
-        plan.append(("SCAN_NEXT",))
-        plan.append(("JUMP_IF_FALSE", end_label))
-
-        # WHERE condition
-        if cmd.where_clause:
+        plan = [("OPEN_TABLE", cmd.table_name)]
+        if index_name:
+            logger.debug(f"Using index {index_name} for {where}")
             plan.extend([
-                ("LOAD_COLUMN", cmd.where_clause["column"]),
-                ("LOAD_CONST", str(cmd.where_clause["value"])),
-                ("COMPARE_EQ",),
-                ("JUMP_IF_FALSE", skip_label)
+                ("LOAD_CONST", str(where["value"])),
+                ("INDEX_SEEK", index_name, where["operator"]),
+                ("LABEL", loop_label),
+                ("INDEX_NEXT",),
+                ("JUMP_IF_FALSE", end_label),
             ])
+            plan.extend(body)
+        else:
+            plan.extend([
+                ("SCAN_START", where) if where and self._storage(cmd.table_name) == "columnar" else ("SCAN_START",),
+                ("LABEL", loop_label),
+                ("SCAN_NEXT",),
+                ("JUMP_IF_FALSE", end_label),
+            ])
+            if where and self.compile_expressions and self._resolves(schema, self._where_columns(where)):
+                plan.append(("FILTER", compile_predicate(where, schema), loop_label))
+                plan.extend(body)
+            elif where:
+                skip_label = self._new_label()
+                plan.extend(self._condition(where, schema))
+                plan.append(("JUMP_IF_FALSE", skip_label))
+                plan.extend(body)
+                plan.append(("LABEL", skip_label))
+            else:
+                plan.extend(body)
 
-        # Delete if condition is met
-        plan.append(("DELETE_ROW",))
-
-        plan.append(("LABEL", skip_label))
         plan.append(("JUMP", loop_label))
         plan.append(("LABEL", end_label))
         plan.append(("SCAN_END",))
-
         return plan
 
+    def _condition(self, where, schema=None):
+        if where.get("type") == "column_compare":
+            return [
+                ("LOAD_COLUMN", self._column(schema, where["left_column"])),
+                ("LOAD_COLUMN", self._column(schema, where["right_column"])),
+                ("COMPARE_EQ",),
+            ]
+        return [
+            ("LOAD_COLUMN", self._column(schema, where["column"])),
+            ("LOAD_CONST", str(where["value"])),
+            (COMPARE_OPCODES.get(where.get("operator"), "COMPARE_EQ"),),
+        ]
 
     def _generate_create_table_plan(self, cmd):
         """Generate opcodes for CREATE TABLE"""
         logger.debug(f"Generating CREATE TABLE plan for {cmd.table_name}")
         plan = [("CREATE_TABLE", cmd.table_name, cmd.columns)]
+        if cmd.options:
+            plan = [("CREATE_TABLE", cmd.table_name, cmd.columns, cmd.options)]
         logger.debug(f"Generated CREATE plan: {plan}")
         return plan
 
@@ -248,4 +390,18 @@ class PlanGenerator:
         logger.debug(f"Generating DROP TABLE plan for {cmd.table_name}")
         plan = [("DROP_TABLE", cmd.table_name)]
         logger.debug(f"Generated DROP plan: {plan}")
-        return plan
\ No newline at end of file
+        return plan
+
+    def _generate_create_index_plan(self, cmd):
+        """Generate opcodes for CREATE INDEX"""
+        logger.debug(f"Generating CREATE INDEX plan for {cmd.index_name}")
+        plan = [("CREATE_INDEX", cmd.index_name, cmd.table_name, cmd.column)]
+        logger.debug(f"Generated CREATE INDEX plan: {plan}")
+        return plan
+
+    def _generate_drop_index_plan(self, cmd):
+        """Generate opcodes for DROP INDEX"""
+        logger.debug(f"Generating DROP INDEX plan for {cmd.index_name}")
+        plan = [("DROP_INDEX", cmd.index_name)]
+        logger.debug(f"Generated DROP INDEX plan: {plan}")
+        return plan
@@ -45,6 +45,21 @@ class Parser:
         self.consume()
         return token
 
+    def at_word(self, word, offset=0):
+        """Whether the token `offset` ahead is the name `word` (any case).
+
+        Words like INDEX, ON and WITH are keywords only where the grammar looks
+        for them, so they stay usable as table and column names."""
+        token = self.peek_token(offset)
+        return token is not None and token.token_type == "IDENTIFIER" and token.value.upper() == word
+
+    def expect_word(self, word):
+        """Consume the name `word` (see at_word)."""
+        if not self.at_word(word):
+            token = self.current_token()
+            raise ParsingError(f"Expected '{word}' but got '{token.value if token else 'end of input'}'")
+        return self.consume()
+
     def parse(self):
         """Main entry point for parsing SQL queries."""
         if not self.tokens:
@@ -5,6 +5,8 @@ logger = get_logger(__name__)
 
 def parse_create(parser):
     parser.expect("KEYWORD", "CREATE")
+    if parser.at_word("INDEX"):
+        return parse_create_index(parser)
     parser.expect("KEYWORD", "TABLE")
     table_name = parser.table_name()
     parser.expect("LPAREN")
@@ -65,11 +67,62 @@ def parse_create(parser):
         parser.expect("COMMA")
     
     parser.expect("RPAREN")
+    options = parse_table_options(parser)
     parser.schema_registry[table_name] = [col['name'] for col in columns]
     logger.info(f"Updated schema registry with table {table_name}")
     
     return {
         "type": "CREATE",
         "table_name": table_name,
-        "columns": columns
+        "columns": columns,
+        "options": options
+    }
+
+def parse_table_options(parser):
+    """Optional WITH (name = value, ...) after a column list, e.g. WITH (storage = columnar)"""
+    options = {}
+    if not parser.at_word("WITH"):
+        return options
+    parser.consume()
+    parser.expect("LPAREN")
+    while True:
+        name = parser.expect("IDENTIFIER").value.lower()
+        parser.expect("EQUALS")
+        value_token = parser.current_token()
+        if not value_token or value_token.token_type not in ("IDENTIFIER", "STRING", "NUMBER"):
+            raise ParsingError(f"Expected a value for table option '{name}'")
+        parser.consume()
+        options[name] = value_token.value.strip("'\"").lower()
+        token = parser.current_token()
+        if not token or token.token_type == "RPAREN":
+            break
+        parser.expect("COMMA")
+    parser.expect("RPAREN")
+
+    if set(options) - {"storage"}:
+        raise ParsingError(f"Unknown table option(s): {', '.join(sorted(set(options) - {'storage'}))}")
+    if options.get("storage", "row") not in ("row", "columnar"):
+        raise ParsingError(f"Unknown storage '{options['storage']}', expected row or columnar")
+    return options
+
+def parse_create_index(parser):
+    """CREATE INDEX name ON table (column)"""
+    parser.expect_word("INDEX")
+    index_name = parser.expect("IDENTIFIER").value
+    parser.expect_word("ON")
+    table_name = parser.table_name()
+    parser.expect("LPAREN")
+    column = parser.expect("IDENTIFIER").value
+    parser.expect("RPAREN")
+
+    columns = parser.schema_registry.get(table_name)
+    if columns is not None and column not in [col if isinstance(col, str) else col['name'] for col in columns]:
+        raise ParsingError(f"Table '{table_name}' has no column '{column}'")
+
+    logger.info(f"CREATE INDEX parsed: {index_name} on {table_name}({column})")
+    return {
+        "type": "CREATE_INDEX",
+        "index_name": index_name,
+        "table_name": table_name,
+        "column": column
     }
\ No newline at end of file
@@ -7,8 +7,20 @@ def parse_drop(self):
     logger.info("Parsing DROP statement....")
     self.consume()
 
+    # DROP TABLE name, DROP INDEX name, or the older DROP name (a table,
+    # which may itself be called index)
+    statement_type = "DROP"
     current_token = self.current_token()
-    if current_token.token_type != "IDENTIFIER":
+    index_name_follows = self.peek_token() is not None and self.peek_token().token_type == "IDENTIFIER"
+    if current_token and current_token.token_type == "KEYWORD" and current_token.value == "TABLE":
+        self.consume()
+        current_token = self.current_token()
+    elif self.at_word("INDEX") and index_name_follows:
+        statement_type = "DROP_INDEX"
+        self.consume()
+        current_token = self.current_token()
+
+    if not current_token or current_token.token_type != "IDENTIFIER":
         logger.error("Expected an entity after DROP (e.g., TABLE, VIEW, etc.)")
         raise ParsingError("Expected an entity after DROP (e.g., TABLE, VIEW, etc.)")
 
@@ -17,9 +29,11 @@ def parse_drop(self):
 
     self.consume()
 
-    if self.current_token().value != ";":
+    if not self.current_token() or self.current_token().value != ";":
         logger.error("Expected ';' at the end of DROP statement")
         raise ParsingError("Expected ';' at the end of DROP statement")
 
     logger.info(f"DROP parsed: entity = {entity_name}")
+    if statement_type == "DROP_INDEX":
+        return {"type": "DROP_INDEX", "index_name": entity_name}
     return {"type": "DROP", "table_name": entity_name}
@@ -0,0 +1,76 @@
+from utils.errors import ExecutionError
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Opcode numbers are positions in this tuple; the VM's handler table follows the same order.
+OPCODES = (
+    "OPEN_TABLE", "CREATE_TABLE", "DROP_TABLE", "INSERT_ROW",
+    "SCAN_START", "SCAN_NEXT", "INDEX_SEEK", "INDEX_NEXT", "SCAN_END",
+    "CREATE_INDEX", "DROP_INDEX",
+    "LOAD_CONST", "LOAD_COLUMN",
+    "COMPARE_EQ", "COMPARE_NEQ", "COMPARE_LT", "COMPARE_LTE", "COMPARE_GT", "COMPARE_GTE",
+    "JUMP_IF_FALSE", "JUMP",
+    "EMIT_ROW", "UPDATE_COLUMN", "DELETE_ROW",
+    "FILTER", "PROJECT_ROW",
+)
+OPCODE_NUMBERS = {name: number for number, name in enumerate(OPCODES)}
+JUMP_OPCODES = {"JUMP": 0, "JUMP_IF_FALSE": 0, "FILTER": 1}     # opcode -> position of its label argument
+
+
+class Program:
+    """A plan assembled for the VirtualMachine.
+
+    Instruction i is `codes[i]` (an opcode number) with the argument tuple
+    `args[i]`. LABELs are gone and every label argument (of JUMP,
+    JUMP_IF_FALSE and FILTER) is the index of the instruction to continue at."""
+
+    def __init__(self, codes, args, plan):
+        self.codes = codes
+        self.args = args
+        self.plan = plan             # the tuple plan it was assembled from
+
+    def __len__(self):
+        return len(self.codes)
+
+    def name(self, index):
+        return OPCODES[self.codes[index]]
+
+    def disassemble(self):
+        """The instructions as (index, opcode name, *arguments) tuples."""
+        return [(index, OPCODES[code], *args) for index, (code, args) in enumerate(zip(self.codes, self.args))]
+
+
+def assemble(plan):
+    """Turn a tuple plan from the PlanGenerator into a Program.
+
+    Bare-string opcodes are accepted as well as tuples. Unknown opcodes
+    and jumps to undefined labels are rejected here, before anything runs."""
+    instructions = []
+    labels = {}
+    for opcode in plan:
+        if isinstance(opcode, str):
+            opcode = (opcode,)
+        if opcode[0] == "LABEL":
+            if opcode[1] in labels:
+                raise ExecutionError(f"Duplicate label: {opcode[1]}")
+            labels[opcode[1]] = len(instructions)
+        elif opcode[0] not in OPCODE_NUMBERS:
+            raise ExecutionError(f"Unknown opcode: {opcode[0]}")
+        else:
+            instructions.append(opcode)
+
+    codes, args = [], []
+    for opcode in instructions:
+        arguments = opcode[1:]
+        if opcode[0] in JUMP_OPCODES:
+            position = JUMP_OPCODES[opcode[0]]
+            label = arguments[position]
+            if label not in labels:
+                raise ExecutionError(f"Undefined label: {label}")
+            arguments = arguments[:position] + (labels[label],) + arguments[position + 1:]
+        codes.append(OPCODE_NUMBERS[opcode[0]])
+        args.append(arguments)
+
+    logger.debug(f"Assembled {len(plan)} plan steps into {len(codes)} instructions")
+    return Program(codes, args, plan)
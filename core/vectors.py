@@ -0,0 +1,128 @@
+from array import array
+from itertools import compress, repeat
+from backend.schema import row_type
+from utils.errors import ExecutionError
+from utils.logger import get_logger
+
+try:
+    import numpy
+except ImportError:          # optional: typed columns fall back to array.array
+    numpy = None
+
+logger = get_logger(__name__)
+
+DEFAULT_BATCH_SIZE = 1024
+VECTOR_TYPES = (list, array) if numpy is None else (list, array, numpy.ndarray)
+
+
+def make_vector(values):
+    """A column vector: int64 / float64 when every value is an int / float, else the list itself."""
+    kinds = set(map(type, values))
+    if kinds == {int}:
+        typecode = "q"
+    elif kinds == {float}:
+        typecode = "d"
+    else:
+        return values
+    try:
+        if numpy is not None:
+            return numpy.array(values, dtype=numpy.int64 if typecode == "q" else numpy.float64)
+        return array(typecode, values)
+    except OverflowError:
+        return values
+
+
+def is_vector(value):
+    return isinstance(value, VECTOR_TYPES)
+
+
+def compare(vector, op, other, selection=None):
+    """Selection vector of the positions (within `selection`, or all) where `op(vector[i], other)` holds.
+
+    `other` is a scalar or another vector of the same batch. NumPy
+    compares numeric vectors in one call; everything else goes through
+    `op` element by element, with exactly the row-at-a-time semantics."""
+    if numpy is not None and isinstance(vector, numpy.ndarray) and (
+            isinstance(other, numpy.ndarray) or type(other) in (int, float)):
+        if selection is None:
+            return numpy.flatnonzero(op(vector, other))
+        selection = numpy.asarray(selection, dtype=numpy.intp)
+        right = other[selection] if isinstance(other, numpy.ndarray) else other
+        return selection[op(vector[selection], right)]
+
+    if selection is None:
+        positions, left = range(len(vector)), vector
+        right = other if is_vector(other) else repeat(other)
+    else:
+        positions, left = selection, map(vector.__getitem__, selection)
+        right = map(other.__getitem__, selection) if is_vector(other) else repeat(other)
+    return list(compress(positions, map(op, left, right)))
+
+
+class Batch:
+    """Up to `size` consecutive rows of a scan, held as column vectors.
+
+    `rows` is what the cursor's next_batch() returned: anything with a
+    length and a column(position) method (backend.record.Records, or a
+    columnar SegmentSlice). Columns are fetched only when a plan first
+    asks for them, so a scan never decodes a column it does not
+    reference; they are named by ordinal (or by name). `selection` lists
+    the positions of the rows still in play; None means all of them."""
+
+    def __init__(self, columns, rows):
+        self.names = columns
+        self.positions = {name: i for i, name in enumerate(columns)}
+        self.source = rows
+        self.vectors = {}
+        self.selection = None
+
+    @classmethod
+    def read(cls, cursor, columns, size):
+        """The next `size` rows of a TableCursor / IndexScan; an empty Batch once it is exhausted."""
+        return cls(columns, cursor.next_batch(size))
+
+    def __len__(self):
+        return len(self.source)
+
+    def _position(self, column):
+        if type(column) is int:
+            return column
+        if column not in self.positions:
+            raise ExecutionError(f"Column '{column}' not found")
+        return self.positions[column]
+
+    def column(self, column):
+        position = self._position(column)
+        vector = self.vectors.get(position)
+        if vector is None:
+            vector = self.vectors[position] = make_vector(self.source.column(position))
+        return vector
+
+    def compare(self, column, op, other):
+        """Selection of the rows in play whose `column` satisfies `op` against `other`."""
+        return compare(self.column(column), op, other, self.selection)
+
+    def compare_vector(self, vector, op, other):
+        return compare(vector, op, other, self.selection)
+
+    def rows(self, columns=None, make_row=None):
+        """The selected rows as Rows of `columns` (all of them if None or *).
+
+        `make_row` is the Row class for those columns, if the plan has it."""
+        if not columns or columns == ["*"]:
+            positions = range(len(self.names))
+        else:
+            positions = list(dict.fromkeys(map(self._position, columns)))
+        if make_row is None:
+            make_row = row_type(tuple(self.names[position] for position in positions))
+        selection = self.selection
+        vectors = []
+        for position in positions:
+            vector = self.column(position)
+            if selection is None:
+                vectors.append(vector.tolist() if hasattr(vector, "tolist") else vector)
+            elif numpy is not None and isinstance(vector, numpy.ndarray):
+                vectors.append(vector[numpy.asarray(selection, dtype=numpy.intp)].tolist())
+            else:
+                vectors.append([vector[i] for i in selection])
+        return list(map(make_row, *vectors))
@@ -1,116 +1,251 @@
+import operator
+import sys
+from core.assembler import OPCODES, OPCODE_NUMBERS, Program, assemble
+from core.vectors import Batch, is_vector
 from utils.errors import ExecutionError
 from utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+HALT = sys.maxsize          # returned by a handler to stop the program
+REFLECTED = {operator.eq: operator.eq, operator.ne: operator.ne, operator.lt: operator.gt,
+             operator.le: operator.ge, operator.gt: operator.lt, operator.ge: operator.le}
+WRITE_OPCODES = frozenset(OPCODE_NUMBERS[name] for name in ("UPDATE_COLUMN", "DELETE_ROW"))
+
 class VirtualMachine:
-    def __init__(self , schema_registry=None):
-        self.tables = {}                         # For storing in-memory tables
+    """Runs assembled plans against a Catalog.
+
+    With a `batch_size`, read-only scans run vectorized: SCAN_NEXT and
+    INDEX_NEXT fetch up to batch_size rows as a core.vectors.Batch,
+    LOAD_COLUMN pushes whole column vectors, comparisons and FILTER narrow
+    the batch's selection vector, and EMIT_ROW / PROJECT_ROW materialize
+    only the selected rows. Any plan runs in either mode with the same
+    results; plans that update or delete rows always run row at a time.
+
+    In row mode current_row is the cursor's record, read by column
+    ordinal (a list of its values once UPDATE_COLUMN has changed it).
+    Column arguments are ordinals when the PlanGenerator could resolve
+    them; column names are looked up in the table's schema as they run.
+    Emitted rows are backend.schema.Rows."""
+
+    def __init__(self, tables, schema_registry=None, batch_size=None):
+        self.tables = tables                     # Catalog of B-tree backed tables (may be shared between VMs)
         self.schema = schema_registry or {}
         self.stack = []
-        self.cursor = None
+        self.cursor = None                       # TableCursor or IndexScan of the running scan
         self.current_table = None
-        self.current_row = None                  # Ensure current_row is initialized
-        self.labels = {}
+        self.current_row = None                  # record of the current row, indexed by column ordinal
+        self.row_changed = False                 # current_row has updates not yet written back
+        self.results = []
         self.program_counter = 0
-    
-    def execute(self, plan):
-        """Execute a plan"""
-        self.program_counter = 0
-        plan_length = len(plan)
-
-        results = []
-
-        self.labels = {
-            op[1]: idx for idx, op in enumerate(plan)
-            if isinstance(op, tuple) and len(op) > 1 and op[0] == 'LABEL'
+        self.batch_size = batch_size
+        self.handlers = self._handler_table()
+        self.batch_handlers = self._batch_handler_table()
+
+    def _handler_table(self):
+        """One handler per opcode number. A handler takes (pc, arguments) and returns the next pc."""
+        handlers = {
+            "OPEN_TABLE": self._op_open_table,
+            "CREATE_TABLE": self._op_create_table,
+            "DROP_TABLE": self._op_drop_table,
+            "INSERT_ROW": self._op_insert_row,
+            "SCAN_START": self._op_scan_start,
+            "SCAN_NEXT": self._op_scan_next,
+            "INDEX_SEEK": self._op_index_seek,
+            "INDEX_NEXT": self._op_scan_next,
+            "SCAN_END": self._op_scan_end,
+            "CREATE_INDEX": self._op_create_index,
+            "DROP_INDEX": self._op_drop_index,
+            "LOAD_CONST": self._op_load_const,
+            "LOAD_COLUMN": self._op_load_column,
+            "COMPARE_EQ": self._comparison(operator.eq),
+            "COMPARE_NEQ": self._comparison(operator.ne),
+            "COMPARE_LT": self._comparison(operator.lt),
+            "COMPARE_LTE": self._comparison(operator.le),
+            "COMPARE_GT": self._comparison(operator.gt),
+            "COMPARE_GTE": self._comparison(operator.ge),
+            "JUMP_IF_FALSE": self._op_jump_if_false,
+            "JUMP": self._op_jump,
+            "EMIT_ROW": self._op_emit_row,
+            "UPDATE_COLUMN": self._op_update_column,
+            "DELETE_ROW": self._op_delete_row,
+            "FILTER": self._op_filter,
+            "PROJECT_ROW": self._op_project_row,
         }
+        return [handlers[name] for name in OPCODES]
+
+    def _batch_handler_table(self):
+        handlers = list(self.handlers)
+        for name, handler in (("SCAN_NEXT", self._op_batch_next), ("INDEX_NEXT", self._op_batch_next),
+                              ("LOAD_COLUMN", self._op_batch_load_column),
+                              ("JUMP_IF_FALSE", self._op_batch_jump_if_false),
+                              ("FILTER", self._op_batch_filter), ("EMIT_ROW", self._op_batch_emit_row),
+                              ("PROJECT_ROW", self._op_batch_project_row)):
+            handlers[OPCODE_NUMBERS[name]] = handler
+        for name, compare in (("COMPARE_EQ", operator.eq), ("COMPARE_NEQ", operator.ne),
+                              ("COMPARE_LT", operator.lt), ("COMPARE_LTE", operator.le),
+                              ("COMPARE_GT", operator.gt), ("COMPARE_GTE", operator.ge)):
+            handlers[OPCODE_NUMBERS[name]] = self._batch_comparison(compare)
+        return handlers
 
-        while self.program_counter < plan_length:
-            opcode = plan[self.program_counter]
-
-            # wrap strings into tuples
-            if isinstance(opcode, str):
-                opcode = (opcode,)
-
-            op = opcode[0]
-            arguments = opcode[1:]
-
-            try:
-                if op == "OPEN_TABLE":
-                    self._open_table(arguments[0])
-
-                elif op == "CREATE_TABLE":
-                    self._create_table(arguments[0], arguments[1])
-
-                elif op == "DROP_TABLE":       
-                    self._drop_table(arguments[0])
-
-                elif op == "INSERT_ROW":
-                    self._insert_row(arguments[0])
-
-                elif op == "SCAN_START":
-                    self._scan_start()
-
-                elif op == "SCAN_NEXT":
-                    if not self._scan_next():
-                        break
-
-                elif op == "SCAN_END":
-                    self._scan_end()
-
-                elif op == "LOAD_CONST":
-                    self.stack.append(arguments[0])
-
-                elif op == "LOAD_COLUMN":
-                    self._load_column(arguments[0])
-
-                elif op == "COMPARE_EQ":
-                    self._compare("==")
-
-                elif op == "COMPARE_NEQ":
-                    self._compare("!=")
-                
-                elif op == "COMPARE_LT":
-                    self._compare("<")
-                
-                elif op == "COMPARE_LTE":
-                    self._compare("<=")
-
-                elif op == "COMPARE_GT":
-                    self._compare(">")
-
-                elif op == "COMPARE_GTE":
-                    self._compare(">=")
-
-                elif op == "JUMP_IF_FALSE":
-                    self._jump_if_false(arguments[0])
-
-                elif op == "JUMP":
-                    self.program_counter = self.labels[arguments[0]] - 1 
-
-                elif op == "LABEL":
-                    pass
-
-                elif op == "EMIT_ROW":
-                    row = self._emit_row(arguments[0]) if arguments else self._emit_row()
-                    results.append(row)
-
-                elif op == "UPDATE_COLUMN":
-                    self._update_column(arguments[0])
+    def execute(self, plan):
+        """Execute a plan: a Program, or a tuple plan which is assembled first"""
+        program = plan if isinstance(plan, Program) else assemble(plan)
+        handlers = self.handlers
+        if self.batch_size and WRITE_OPCODES.isdisjoint(program.codes):
+            handlers = self.batch_handlers
+        codes, args = program.codes, program.args
+        self.results = []
+        pc, end = 0, len(codes)
+        try:
+            while pc < end:
+                pc = handlers[codes[pc]](pc, args[pc])
+        except Exception as e:
+            self._close_cursor()
+            raise ExecutionError(f"Error executiong {program.name(pc)}: {str(e)}")
+        finally:
+            self.program_counter = min(pc, end)
+
+        return self.results
+
+    # Opcode handlers
+    def _op_open_table(self, pc, args):
+        self._open_table(args[0])
+        return pc + 1
+
+    def _op_create_table(self, pc, args):
+        self._create_table(*args)
+        return pc + 1
+
+    def _op_drop_table(self, pc, args):
+        self._drop_table(args[0])
+        return pc + 1
+
+    def _op_insert_row(self, pc, args):
+        self._insert_row(args[0])
+        return pc + 1
+
+    def _op_scan_start(self, pc, args):
+        self._scan_start(*args)
+        return pc + 1
+
+    def _op_scan_next(self, pc, args):
+        # an exhausted scan ends the program
+        return pc + 1 if self._scan_next() else HALT
+
+    def _op_index_seek(self, pc, args):
+        self._index_seek(args[0], args[1])
+        return pc + 1
+
+    def _op_scan_end(self, pc, args):
+        self._scan_end()
+        return pc + 1
+
+    def _op_create_index(self, pc, args):
+        self.tables.create_index(args[0], args[1], args[2])
+        return pc + 1
+
+    def _op_drop_index(self, pc, args):
+        self.tables.drop_index(args[0])
+        return pc + 1
+
+    def _op_load_const(self, pc, args):
+        self.stack.append(args[0])
+        return pc + 1
+
+    def _op_load_column(self, pc, args):
+        self._load_column(args[0])
+        return pc + 1
+
+    def _comparison(self, compare):
+        def handler(pc, args):
+            self._compare(compare)
+            return pc + 1
+        return handler
+
+    def _op_jump_if_false(self, pc, args):
+        if not self.stack:
+            raise ExecutionError("No condition to jump on")
+        return pc + 1 if self.stack.pop() else args[0]
+
+    def _op_jump(self, pc, args):
+        return args[0]
+
+    def _op_emit_row(self, pc, args):
+        self.results.append(self._emit_row(*args))
+        return pc + 1
+
+    def _op_update_column(self, pc, args):
+        self._update_column(args[0])
+        return pc + 1
+
+    def _op_delete_row(self, pc, args):
+        self._delete_row()
+        return pc + 1
+
+    def _op_filter(self, pc, args):
+        # args: compiled predicate of the current row, where to continue if it is false
+        return pc + 1 if args[0](self.current_row) else args[1]
+
+    def _op_project_row(self, pc, args):
+        self.results.append(args[0](self.current_row))
+        return pc + 1
+
+    # Batch-mode handlers: current_row is a Batch, conditions are selection vectors
+    def _op_batch_next(self, pc, args):
+        if self.cursor is None:
+            raise ExecutionError("No scan in progress")
+        batch = Batch.read(self.cursor, self.current_table.columns, self.batch_size)
+        if len(batch):
+            self.current_row = batch
+            self.stack.append(True)
+            return pc + 1
+        self._close_cursor()
+        self.stack.append(False)
+        return HALT
+
+    def _op_batch_load_column(self, pc, args):
+        if self.current_row is None:
+            raise ExecutionError("No active row for column access")
+        self.stack.append(self.current_row.column(args[0]))
+        return pc + 1
+
+    def _batch_comparison(self, compare):
+        def handler(pc, args):
+            if len(self.stack) < 2:
+                raise ExecutionError("Not enough values for comparison")
+            right = self.stack.pop()
+            left = self.stack.pop()
+            batch = self.current_row
+            if is_vector(left):
+                self.stack.append(batch.compare_vector(left, compare, right))
+            elif is_vector(right):
+                self.stack.append(batch.compare_vector(right, REFLECTED[compare], left))
+            else:
+                self.stack.append(compare(left, right))
+            return pc + 1
+        return handler
+
+    def _op_batch_jump_if_false(self, pc, args):
+        if not self.stack:
+            raise ExecutionError("No condition to jump on")
+        condition = self.stack.pop()
+        if isinstance(condition, bool):
+            return pc + 1 if condition else args[0]
+        self.current_row.selection = condition
+        return pc + 1 if len(condition) else args[0]
 
-                elif op == "DELETE_ROW":
-                    self._delete_row()
+    def _op_batch_filter(self, pc, args):
+        selection = self.current_row.selection = args[0].vectorized(self.current_row)
+        return pc + 1 if len(selection) else args[1]
 
-                else:
-                    raise ExecutionError(f"Unknown opcode: {op}")
-                
-                self.program_counter += 1
+    def _op_batch_emit_row(self, pc, args):
+        self.results.extend(self.current_row.rows(*args))
+        return pc + 1
 
-            except Exception as e:
-                raise ExecutionError(f"Error executiong {op}: {str(e)}")
-            
-        return results
+    def _op_batch_project_row(self, pc, args):
+        self.results.extend(self.current_row.rows(args[0].columns, args[0].row_type))
+        return pc + 1
 
     # Implementing the OpCodes
     def _open_table(self, table_name):
@@ -119,131 +254,139 @@ class VirtualMachine:
         
         self.current_table = self.tables[table_name]
 
-    def _create_table(self, table_name, columns):
+    def _create_table(self, table_name, columns, options=None):
         if table_name in self.tables:
             raise ExecutionError(f"Table: '{table_name}' already exists")
         
-        self.tables[table_name] = []
+        storage = (options or {}).get("storage", "row")
+        self.tables.create_table(table_name, [col if isinstance(col, str) else col['name'] for col in columns],
+                                 storage=storage)
         self.schema[table_name] = columns
         logger.info(f"Created table '{table_name}' with columns: {columns}")
 
     def _drop_table(self, table_name):
         if table_name not in self.tables:
-            raise ExecutionError("Table '{table_name}' does not exist")
+            raise ExecutionError(f"Table '{table_name}' does not exist")
         
-        del self.tables[table_name]
-        del self.schema[table_name]
+        self.tables.drop_table(table_name)
+        self.schema.pop(table_name, None)
         logger.info(f"Dropped table '{table_name}'")
 
     def _insert_row(self, table_name):
         if table_name not in self.tables:
             raise ExecutionError(f"Table {table_name} does not exists")
         
-        column_defs = self.schema[table_name]
-        columns = [col if isinstance(col, str) else col['name'] for col in column_defs]
+        table = self.tables[table_name]
+        columns = table.columns
 
         if len(self.stack) < len(columns):
             raise ExecutionError("Not Enough values for Insertion")
         
-        row = {}
-        for col in reversed(columns):
-            row[col] = self.stack.pop()
+        values = self.stack[-len(columns):]
+        del self.stack[-len(columns):]
 
-        self.tables[table_name].append(row)
-        logger.debug(f"Inserted row into '{table_name}': {row}")
+        rowid = table.insert(values)
+        logger.debug(f"Inserted row {rowid} into '{table_name}': {values}")
 
-    def _scan_start(self):
+    def _scan_start(self, where=None):
+        # `where` is only a hint: a columnar table skips segments that cannot match it
         if not self.current_table:
             raise ExecutionError("No table opened for scanning")
             
-        self.cursor = iter(self.current_table)
+        self._close_cursor()
+        self.cursor = self.current_table.cursor(where) if where else self.current_table.cursor()
+        self.current_row = None
+
+    def _index_seek(self, index_name, operator):
+        # walks only the rows where <indexed column> <operator> <value popped from the stack>
+        if not self.current_table:
+            raise ExecutionError("No table opened for index seek")
+        if len(self.stack) == 0:
+            raise ExecutionError("No value to seek for")
+
+        self._close_cursor()
+        self.cursor = self.current_table.index_scan(index_name, operator, self.stack.pop())
         self.current_row = None
 
     def _scan_next(self):
-        try:
-            self.current_row = next(self.cursor)
+        if self.cursor is None:
+            raise ExecutionError("No scan in progress")
+        self._write_row()
+        if self.cursor.next():
+            self.current_row = self.cursor.record
             self.stack.append(True)     
             return True
-        except StopIteration:
-            self.current_row = None
-            self.stack.append(False)    
-            return False
+        self._close_cursor()            # the plan stops here, so SCAN_END may never run
+        self.stack.append(False)    
+        return False
     
     def _scan_end(self):
+        self._write_row()
+        self._close_cursor()
+
+    def _close_cursor(self):
+        # release the pinned leaf (a columnar cursor writes back its segment); an update of the
+        # current row still pending is dropped (only reached on errors or after _write_row)
+        if self.cursor is not None:
+            self.cursor.close()
         self.cursor = None
         self.current_row = None
+        self.row_changed = False
+
+    def _write_row(self):
+        # UPDATE_COLUMN only changes current_row; the row is written back once, before moving on
+        if self.row_changed:
+            self.cursor.update(self.current_row)
+            self.row_changed = False
+
+    def _ordinal(self, column):
+        # plans from the PlanGenerator carry ordinals; a column name is resolved here
+        if type(column) is int:
+            return column
+        if not self.current_table:
+            raise ExecutionError("No table opened for column access")
+        return self.current_table.schema.ordinal(column)
 
-    def _load_column(self, column_name):
-        if not self.current_row:
+    def _load_column(self, column):
+        if self.current_row is None:
             raise ExecutionError("No active row for column access")
         
-        if column_name not in self.current_row:
-            raise ExecutionError(f"Column '{column_name}' not found")
-        
-        self.stack.append(self.current_row[column_name])
+        self.stack.append(self.current_row[self._ordinal(column)])
 
-    def _compare(self, operator):
+    def _compare(self, compare):
         if len(self.stack) < 2:
             raise ExecutionError("Not enough values for comparison")
         right = self.stack.pop()
-        left = self.stack.pop()
-
-        if operator == "==":
-            self.stack.append(left == right)
+        self.stack[-1] = compare(self.stack[-1], right)
 
-        elif operator == "!=":
-            self.stack.append(left != right)
-
-        elif operator == "<":
-            self.stack.append(left < right)
-
-        elif operator == "<=":
-            self.stack.append(left <= right)
-
-        elif operator == ">":
-            self.stack.append(left > right)
-
-        elif operator == ">=":
-            self.stack.append(left >= right)
-
-        else:
-            raise ExecutionError(f"Unsupported operator: {operator}")
-    
-    def _jump_if_false(self, label):
-        if len(self.stack) == 0:
-            raise ExecutionError("No condition to jump on")
-        
-        if not self.stack.pop():
-            if label not in self.labels:
-                raise ExecutionError(f"Undefined label: {label}")
-            
-            self.program_counter = self.labels[label] - 1
-
-    def _emit_row(self, columns=None):
-        if not self.current_row:
+    def _emit_row(self, columns=None, make_row=None):
+        # columns: ordinals with their Row class (from the PlanGenerator), or names / * / None
+        if self.current_row is None:
             raise ExecutionError("No row to emit")
         
-        if columns and columns == ["*"]:
-            return self.current_row.copy()
-        
-        return {col: self.current_row[col] for col in columns} if columns else self.current_row.copy()
+        if make_row is None:
+            columns = self.current_table.schema.positions(columns)
+            make_row = self.current_table.schema.row_type(columns)
+        return make_row(*map(self.current_row.__getitem__, columns))
 
-    def _update_column(self, column_name):
-        if not self.current_row:
+    def _update_column(self, column):
+        if self.current_row is None:
             raise ExecutionError("No active row to update")
         
-        if column_name not in self.current_row:
-            raise ExecutionError(f"Column '{column_name}' not found")
-        
+        position = self._ordinal(column)
         if len(self.stack) == 0:
             raise ExecutionError("No value to update with")
         
-        self.current_row[column_name] = self.stack.pop()
+        if not self.row_changed:
+            self.current_row = self.current_row.values()
+        self.current_row[position] = self.stack.pop()
+        self.row_changed = True
 
     def _delete_row(self):
-        if not self.current_row or not self.current_table:
+        if self.current_row is None or not self.current_table:
             raise ExecutionError("No active row to delete")
         
-        self.current_table.remove(self.current_row)
+        self.cursor.delete()
+        self.row_changed = False
         logger.debug(f"Deleted row: {self.current_row}")
         
\ No newline at end of file
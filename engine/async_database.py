@@ -0,0 +1,150 @@
+import asyncio
+import statistics
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from rich.console import Console
+from engine.database import DatabaseEngine
+from utils.errors import ExecutionError
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_MAX_WORKERS = 4
+LATENCY_WINDOW = 10000          # most recent query latencies kept for latency_stats()
+
+
+class ReadWriteLock:
+    """asyncio lock admitting many readers or a single writer."""
+
+    def __init__(self):
+        self._cond = asyncio.Condition()
+        self._readers = 0
+        self._writer = False
+
+    async def acquire_read(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: not self._writer)
+            self._readers += 1
+
+    async def release_read(self):
+        async with self._cond:
+            self._readers -= 1
+            self._cond.notify_all()
+
+    async def acquire_write(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: not self._writer and self._readers == 0)
+            self._writer = True
+
+    async def release_write(self):
+        async with self._cond:
+            self._writer = False
+            self._cond.notify_all()
+
+
+class AsyncDatabaseEngine:
+    """asyncio front-end for DatabaseEngine.
+
+    Statements run on a bounded thread pool, so tokenizing, planning, VM
+    execution and page I/O never block the event loop. SELECTs take a shared
+    lock and run concurrently, each on its own VirtualMachine; every other
+    statement takes the lock exclusively. Per-query latencies (queue wait
+    included) are recorded for latency_stats().
+
+    Use `await AsyncDatabaseEngine.open(...)` so that opening the file is
+    offloaded as well."""
+
+    def __init__(self, engine, max_workers=DEFAULT_MAX_WORKERS):
+        self.engine = engine
+        self.max_workers = max_workers
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="db-io")
+        self.rwlock = ReadWriteLock()
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+    @classmethod
+    async def open(cls, db_file="example.db", max_workers=DEFAULT_MAX_WORKERS, **engine_options):
+        engine_options.setdefault("console", Console(quiet=True))
+        loop = asyncio.get_running_loop()
+        with ThreadPoolExecutor(max_workers=1) as opener:
+            engine = await loop.run_in_executor(opener, lambda: DatabaseEngine(db_file, **engine_options))
+        logger.info(f"Opened async engine on '{db_file}' with {max_workers} workers")
+        return cls(engine, max_workers=max_workers)
+
+    async def execute(self, query):
+        """Run any statement; returns the result rows (empty for non-SELECT statements)."""
+        start = time.perf_counter()
+        read_only = self._is_read_only(query)
+
+        if read_only:
+            await self.rwlock.acquire_read()
+        else:
+            await self.rwlock.acquire_write()
+
+        try:
+            loop = asyncio.get_running_loop()
+            if read_only:
+                return await loop.run_in_executor(self.executor, self._run_read, query)
+            return await loop.run_in_executor(self.executor, self._run_write, query)
+        finally:
+            if read_only:
+                await self.rwlock.release_read()
+            else:
+                await self.rwlock.release_write()
+            self.latencies.append(time.perf_counter() - start)
+
+    async def fetch(self, query):
+        """Run a SELECT and return its rows."""
+        if not self._is_read_only(query):
+            raise ExecutionError("fetch() only accepts SELECT statements")
+        return await self.execute(query)
+
+    async def commit(self):
+        await self.rwlock.acquire_write()
+        try:
+            await asyncio.get_running_loop().run_in_executor(self.executor, self.engine.pager.commit)
+        finally:
+            await self.rwlock.release_write()
+
+    async def close(self):
+        await self.rwlock.acquire_write()
+        try:
+            await asyncio.get_running_loop().run_in_executor(self.executor, self.engine.close)
+        finally:
+            await self.rwlock.release_write()
+            self.executor.shutdown(wait=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    def latency_stats(self):
+        """Summary of recent query latencies, in milliseconds."""
+        if not self.latencies:
+            return {"count": 0}
+        samples = sorted(latency * 1000 for latency in self.latencies)
+
+        def percentile(p):
+            return samples[min(len(samples) - 1, int(p / 100 * len(samples)))]
+
+        return {
+            "count": len(samples),
+            "mean_ms": statistics.fmean(samples),
+            "p50_ms": percentile(50),
+            "p95_ms": percentile(95),
+            "p99_ms": percentile(99),
+            "max_ms": samples[-1],
+        }
+
+    def _run_read(self, query):
+        return self.engine.query(query, vm=self.engine.new_vm())
+
+    def _run_write(self, query):
+        return self.engine.query(query)
+
+    @staticmethod
+    def _is_read_only(query):
+        words = query.split(None, 1)
+        return bool(words) and words[0].upper() == "SELECT"
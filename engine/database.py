@@ -8,9 +8,13 @@ from compiler.tokenizer import Tokenizer
 from compiler.parser import Parser
 from compiler.code_generator import CodeGeneration, PlanGenerator
 from core.virtual_machine import VirtualMachine
-from backend.os_interface import OSInterface, DEFAULT_PAGE_SIZE
-from backend.pager import Pager
-from backend.b_tree import BTree, BTreeNode
+from backend.os_interface import OSInterface, DEFAULT_PAGE_SIZE, SYNC_NORMAL
+from backend.pager import Pager, DEFAULT_CACHE_SIZE
+from backend.wal import WriteAheadLog
+from backend.compressed_os_interface import CompressedOSInterface
+from backend.b_tree import BTreeNode
+from backend.catalog import Catalog
+from backend.key_encoding import decode_key
 from utils.errors import (
     TokenizationError, ParsingError, CodegenError, ExecutionError, BTreeError
 )
@@ -19,18 +23,33 @@ from ui.renderer import (
 )
 
 class DatabaseEngine:
-    def __init__(self, db_file="example.db"):
-        self.console = Console()
-        self.os = OSInterface(db_file)
+    def __init__(self, db_file="example.db", use_mmap=False, sync_level=SYNC_NORMAL, use_wal=True,
+                 cache_size=DEFAULT_CACHE_SIZE, cache_bytes=None, cache_policy="2q",
+                 read_ahead=16, prefetch_async=False, console=None, compression=None,
+                 page_size=DEFAULT_PAGE_SIZE, batch_size=None):
+        self.console = console or Console()
+        self.os = OSInterface(db_file, page_size=page_size, use_mmap=use_mmap, sync_level=sync_level)
+        if compression:
+            self.os = CompressedOSInterface(self.os, codec=compression)
         self.os.open_file()
-        self.pager = Pager(self.os, cache_size=4)
-        self.btree = BTree(self.pager) 
+        self.wal = None
+        if use_wal:
+            self.wal = WriteAheadLog(self.os, sync_level=sync_level)
+            self.wal.open()
+        self.pager = Pager(self.os, cache_size=cache_size, cache_bytes=cache_bytes,
+                           policy=cache_policy, wal=self.wal,
+                           read_ahead=read_ahead, prefetch_async=prefetch_async)
+        self.catalog = Catalog(self.pager)
+        self._btree = None
+        self.closed = False
         self.schema_registry = {
             "products": ["product_id", "name", "price", "stock"]
         }
+        self.schema_registry.update(self.catalog.schema())
         self.codegen = CodeGeneration()
-        self.planner = PlanGenerator(schema_registry=self.schema_registry)
-        self.vm = VirtualMachine(schema_registry=self.schema_registry)
+        self.planner = PlanGenerator(schema_registry=self.schema_registry, catalog=self.catalog)
+        self.batch_size = batch_size         # rows per vectorized scan batch; None runs scans row at a time
+        self.vm = self.new_vm()
 
     def execute(self, query):
         tokenizer = Tokenizer()
@@ -50,6 +69,7 @@ class DatabaseEngine:
 
             self.console.print("[bold green]Executing plan...[/]")
             result = self.vm.execute(plan)
+            self._commit_if_write(parsed)
 
             if parsed["type"] == "SELECT" and result:
                 print_results_table(result)
@@ -58,7 +78,8 @@ class DatabaseEngine:
                 parts = query.strip().split()
                 for num in parts[1:]:
                     self.btree.insert(int(num))
-                self.console.print(f"[green]Inserted into BTree: {self.btree.root.keys}[/]")
+                self.commit()
+                self.console.print(f"[green]Inserted into BTree: {self.btree.keys()}[/]")
                 return
 
         except (TokenizationError, ParsingError, CodegenError, ExecutionError) as e:
@@ -67,13 +88,47 @@ class DatabaseEngine:
             self.console.print(f"[bold red]Unexpected Error:[/] {e}")
             raise
 
-    def _update_schema_if_needed(self, parsed):
+    def query(self, query, vm=None):
+        """Run one statement without rendering anything and return its result rows.
+
+        Errors propagate to the caller. A separate VirtualMachine (sharing this
+        engine's catalog) lets several read-only queries run at the same time.
+        Statements that change the database are committed before returning."""
+        tokens = Tokenizer().tokenize(query)
+        parsed = Parser(tokens, schema_registry=self.schema_registry).parse()
+        self._update_schema_if_needed(parsed, verbose=False)
+        command = self.codegen.gen(parsed)
+        plan = PlanGenerator(schema_registry=self.schema_registry, catalog=self.catalog).generate_plan(command)
+        result = (vm or self.vm).execute(plan)
+        self._commit_if_write(parsed)
+        return result
+
+    def commit(self):
+        """Make every change so far durable: a WAL commit, or a flush of the dirty pages without a WAL."""
+        self.pager.commit()
+
+    def _commit_if_write(self, parsed):
+        if parsed["type"] != "SELECT":
+            self.commit()
+
+    @property
+    def btree(self):
+        """The demo B-tree of main.py and INSERT_BTEST; it is only added to the catalog when first used."""
+        if self._btree is None:
+            self._btree = self.catalog.tree_named("btree_test")
+        return self._btree
+
+    def new_vm(self):
+        return VirtualMachine(self.catalog, schema_registry=self.schema_registry, batch_size=self.batch_size)
+
+    def _update_schema_if_needed(self, parsed, verbose=True):
         if parsed["type"] == "CREATE":
             table_name = parsed["table_name"]
             columns = [col["name"] for col in parsed["columns"]]
             self.schema_registry[table_name] = columns
-            self.console.print(f"[bold yellow]Updated schema with table '{table_name}'[/]")
-            self.console.print(f"[yellow]Current schema: {list(self.schema_registry.keys())}[/]")
+            if verbose:
+                self.console.print(f"[bold yellow]Updated schema with table '{table_name}'[/]")
+                self.console.print(f"[yellow]Current schema: {list(self.schema_registry.keys())}[/]")
 
     def _generate_execution_plan(self, parsed):
         command = self.codegen.gen(parsed)
@@ -95,7 +150,7 @@ class DatabaseEngine:
         for page_num in range(max_page + 1):
             try:
                 page = self.pager.get_page(page_num)
-                prefix = page.data[:20].decode("utf-8", errors="ignore").strip("\x00")
+                prefix = bytes(page.data[:20]).decode("utf-8", errors="ignore").strip("\x00")
 
                 if prefix:
                     table.add_row(str(page_num), prefix)
@@ -121,7 +176,9 @@ class DatabaseEngine:
                 table.add_row(str(page_num),
                             "Leaf" if node.is_leaf else "Internal",
                             str(len(node.keys)),
-                            ", ".join(map(str, node.keys)))
+                            # separators may be truncated keys, so internal ones are shown raw
+                            ", ".join(str(decode_key(key)) if node.is_leaf else key.hex()
+                                      for key in node.keys))
             except Exception:
                 table.add_row(str(page_num), "-", "-", "-")
 
@@ -129,19 +186,37 @@ class DatabaseEngine:
         self.console.print("[green]✓ B-tree paging test complete.[/]")
 
 
-    def close(self):
+    def close(self, verbose=True):
+        # everything reaches the disk before any output: printing can fail at interpreter shutdown
+        if self.closed:
+            return
+        self.closed = True
+        messages = []
         try:
-            self.console.rule("[cyan]Closing database...[/]")
-            self.pager.flush_all()
-            self.console.print("[green] All dirty pages flushed.[/]")
+            self.pager.close()
+            messages.append("[green] All dirty pages flushed.[/]")
+        except Exception as e:
+            messages.append(f"[red]Failed to flush pages:[/] {e}")
+
+        try:
+            if self.wal:
+                self.wal.close()
+                self.wal = None
+                messages.append("[green] WAL checkpointed.[/]")
         except Exception as e:
-            self.console.print(f"[red]Failed to flush pages:[/] {e}")
+            messages.append(f"[red]Failed to checkpoint WAL:[/] {e}")
 
         try:
             self.os.close_file()
-            self.console.print("[green] File handle closed.[/]")
+            messages.append("[green] File handle closed.[/]")
         except Exception as e:
-            self.console.print(f"[red]Failed to close file:[/] {e}")
+            messages.append(f"[red]Failed to close file:[/] {e}")
+
+        if verbose:
+            self.console.rule("[cyan]Closing database...[/]")
+            for message in messages:
+                self.console.print(message)
 
     def __del__(self):
-        self.close()
+        if not getattr(self, "closed", True):
+            self.close(verbose=False)
@@ -14,7 +14,7 @@ def main():
     for key in [10,15,20,30]:
         db.btree.insert(key)
 
-    console.print(f"[bold green]BTree Root Keys:[/] {db.btree.root.keys}")
+    console.print(f"[bold green]BTree Keys:[/] {db.btree.keys()}")
 
     console.rule("[bold cyan]Pager State After B-Tree Inserts")
     db.test_btree_paging()
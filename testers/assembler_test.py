@@ -0,0 +1,54 @@
+import os
+import tempfile
+from rich.console import Console
+from core.assembler import assemble, OPCODE_NUMBERS
+from engine.database import DatabaseEngine
+from utils.errors import ExecutionError
+
+def test_assemble_resolves_labels():
+    plan = [("OPEN_TABLE", "t"), ("SCAN_START",), ("LABEL", "loop"), ("SCAN_NEXT",),
+            ("JUMP_IF_FALSE", "end"), ("EMIT_ROW", ["*"]), ("JUMP", "loop"), ("LABEL", "end"), "SCAN_END"]
+    program = assemble(plan)
+    for instruction in program.disassemble():
+        print(instruction)
+    assert len(program) == 7
+    assert program.codes[2] == OPCODE_NUMBERS["SCAN_NEXT"]
+    assert program.args[3] == (6,)          # JUMP_IF_FALSE end -> SCAN_END
+    assert program.args[5] == (2,)          # JUMP loop -> SCAN_NEXT
+    assert program.name(6) == "SCAN_END" and program.args[6] == ()
+
+    for bad_plan in ([("NOPE",)], [("JUMP", "nowhere")]):
+        try:
+            assemble(bad_plan)
+            raise AssertionError(f"{bad_plan} assembled")
+        except ExecutionError as e:
+            print("Rejected:", e)
+
+def test_programs_run_like_plans():
+    path = os.path.join(tempfile.mkdtemp(), "assembler_test.db")
+    db = DatabaseEngine(path, console=Console(quiet=True))
+    try:
+        db.query("CREATE TABLE t (id INT, grp INT);")
+        for i in range(30):
+            db.query(f"INSERT INTO t (id, grp) VALUES ({i}, {i % 3});")
+        plan = [("OPEN_TABLE", "t"), ("SCAN_START",), ("LABEL", "loop"), ("SCAN_NEXT",),
+                ("JUMP_IF_FALSE", "end"), ("LOAD_COLUMN", "grp"), ("LOAD_CONST", "1"), ("COMPARE_GT",),
+                ("JUMP_IF_FALSE", "loop"), ("EMIT_ROW", ["id"]), ("JUMP", "loop"), ("LABEL", "end"), ("SCAN_END",)]
+        expected = [{"id": str(i)} for i in range(30) if i % 3 == 2]
+        assert db.vm.execute(plan) == expected
+        program = assemble(plan)
+        assert db.vm.execute(program) == expected and db.vm.execute(program) == expected
+        assert db.query("SELECT id FROM t WHERE grp > 1;") == expected
+
+        try:
+            db.vm.execute([("OPEN_TABLE", "t"), ("SCAN_START",), ("SCAN_NEXT",), ("LOAD_COLUMN", "nope")])
+            raise AssertionError("missing column loaded")
+        except ExecutionError as e:
+            assert "LOAD_COLUMN" in str(e)
+        assert db.vm.cursor is None
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    test_assemble_resolves_labels()
+    test_programs_run_like_plans()
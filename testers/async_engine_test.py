@@ -0,0 +1,28 @@
+import asyncio
+import os
+import tempfile
+from engine.async_database import AsyncDatabaseEngine
+
+async def _concurrent_reads():
+    db = await AsyncDatabaseEngine.open(os.path.join(tempfile.mkdtemp(), "async_test.db"), max_workers=4)
+    try:
+        await db.execute("CREATE TABLE items (id INT, name TEXT);")
+        for i in range(20):
+            await db.execute(f"INSERT INTO items (id, name) VALUES ({i}, 'item{i}');")
+
+        results = await asyncio.gather(*(db.fetch(f"SELECT * FROM items WHERE id = {i};") for i in range(20)))
+        print("Rows per query:", [len(rows) for rows in results])
+        assert all(len(rows) == 1 for rows in results)
+        assert [rows[0]["name"] for rows in results] == [f"item{i}" for i in range(20)]
+
+        stats = db.latency_stats()
+        print("Latency:", stats)
+        assert stats["count"] == 41
+    finally:
+        await db.close()
+
+def test_async_engine():
+    asyncio.run(_concurrent_reads())
+
+if __name__ == "__main__":
+    test_async_engine()
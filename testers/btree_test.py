@@ -0,0 +1,248 @@
+import os
+import random
+import tempfile
+from backend.os_interface import OSInterface
+from backend.pager import Pager
+from backend.b_tree import BTree
+from utils.errors import BTreeError
+
+def _open(path):
+    osi = OSInterface(path)
+    osi.open_file()
+    return osi, Pager(osi, cache_size=16)
+
+def test_btree_splits_and_persists():
+    path = os.path.join(tempfile.mkdtemp(), "btree_test.db")
+    osi, pager = _open(path)
+    tree = BTree(pager, max_keys=4)
+    pager.set_schema_root(tree.root_page_num)
+
+    keys = list(range(1000))
+    random.shuffle(keys)
+    for key in keys:
+        tree.insert(key)
+    tree.insert(keys[0])                          # duplicate: ignored
+
+    print("Height after 1000 inserts:", tree.height())
+    assert tree.height() > 3
+    assert tree.keys() == list(range(1000))
+    assert all(tree.search(key) for key in range(1000))
+    assert not tree.search(1000)
+
+    pager.flush_all()
+    osi.close_file()
+
+    osi, pager = _open(path)
+    try:
+        tree = BTree(pager, root_page_num=pager.header.schema_root, max_keys=4)
+        assert tree.keys() == list(range(1000))
+    finally:
+        osi.close_file()
+
+def test_btree_bulk_load():
+    path = os.path.join(tempfile.mkdtemp(), "btree_bulk_test.db")
+    osi, pager = _open(path)
+    try:
+        tree = BTree(pager, max_keys=8)
+        loaded = tree.bulk_load(range(0, 3000, 3), fill_factor=0.75)
+        print("Bulk loaded", loaded, "keys; height", tree.height(), "pages", pager.num_pages)
+        assert loaded == 1000
+        assert tree.keys() == list(range(0, 3000, 3))
+        assert tree.search(2997) and not tree.search(2998)
+
+        tree.insert(1)                            # regular inserts still split correctly afterwards
+        assert tree.keys()[:3] == [0, 1, 3]
+
+        small = BTree(pager, max_keys=8)
+        assert small.bulk_load([5, 7]) == 2 and small.height() == 1 and small.keys() == [5, 7]
+
+        for bad in ([3, 2], [1, 1]):
+            try:
+                BTree(pager, max_keys=8).bulk_load(bad)
+                assert False, "unsorted input accepted"
+            except BTreeError:
+                pass
+    finally:
+        osi.close_file()
+
+def test_btree_cursor():
+    path = os.path.join(tempfile.mkdtemp(), "btree_cursor_test.db")
+    osi, pager = _open(path)
+    try:
+        tree = BTree(pager, max_keys=4)
+        keys = list(range(0, 400, 2))
+        random.shuffle(keys)
+        for key in keys:
+            tree.insert(key)
+
+        with tree.cursor() as cursor:
+            assert cursor.seek(51) and cursor.key == 52
+            assert cursor.next() and cursor.key == 54
+            assert cursor.prev() and cursor.prev() and cursor.key == 50
+            assert list(cursor.range(100, 110)) == [100, 102, 104, 106, 108]
+            assert list(cursor.range(100, 110, include_hi=True))[-1] == 110
+            assert list(cursor.range(390)) == [390, 392, 394, 396, 398]
+            assert not cursor.seek(399) and not cursor.valid
+            assert cursor.prev() and cursor.key == 398
+
+            assert cursor.last() and cursor.key == 398
+            backwards = [cursor.key]
+            while cursor.prev():
+                backwards.append(cursor.key)
+            assert backwards == list(range(398, -1, -2))
+            print("Pinned pages while positioned:", sum(page.pin_count for page in pager.cache.values()))
+            assert sum(page.pin_count for page in pager.cache.values()) <= 1
+        assert sum(page.pin_count for page in pager.cache.values()) == 0
+
+        bulk = BTree(pager, max_keys=4)
+        bulk.bulk_load(range(100))
+        with bulk.cursor() as cursor:
+            assert list(cursor.range(37, 41)) == [37, 38, 39, 40]
+            assert cursor.last() and cursor.prev() and cursor.key == 98
+    finally:
+        osi.close_file()
+
+def test_btree_variable_length_entries():
+    path = os.path.join(tempfile.mkdtemp(), "btree_var_test.db")
+    osi, pager = _open(path)
+    try:
+        tree = BTree(pager)
+        names = [f"user-{i:05d}" + "x" * (i % 40) for i in range(2000)]
+        shuffled = names[:]
+        random.shuffle(shuffled)
+        for name in shuffled:
+            tree.insert(name, name.encode() * 2)
+        print("Height with 2000 text keys:", tree.height())
+        assert tree.keys() == sorted(names)
+        assert tree.get(names[7]) == names[7].encode() * 2
+        assert tree.get("nobody") is None
+
+        composite = BTree(pager)
+        for key in [(2, "b"), (1, "z"), (2, "a"), (1, None), (-5, "q")]:
+            composite.insert(key)
+        assert composite.keys() == [(-5, "q"), (1, None), (1, "z"), (2, "a"), (2, "b")]
+        with composite.cursor() as cursor:
+            assert list(cursor.range((1,), (2,))) == [(1, None), (1, "z")]
+
+        try:
+            tree.insert("x" * 4096)
+            assert False, "oversized key accepted"
+        except BTreeError as e:
+            print("Rejected:", e)
+    finally:
+        osi.close_file()
+
+def test_btree_prefix_compression_and_truncation():
+    path = os.path.join(tempfile.mkdtemp(), "btree_prefix_test.db")
+    osi, pager = _open(path)
+    try:
+        urls = [f"https://example.com/catalog/products/item-{i:06d}/details" for i in range(3000)]
+        shuffled = urls[:]
+        random.Random(0).shuffle(shuffled)   # a fixed order: truncation saves pages on average, not for every order
+
+        pages = {}
+        for truncate in (False, True):
+            before = pager.num_pages
+            tree = BTree(pager, truncate_keys=truncate)
+            for url in shuffled:
+                tree.insert(url)
+            pages[truncate] = pager.num_pages - before
+            assert tree.keys() == urls
+            assert all(tree.search(url) for url in urls[::97])
+            assert not tree.search("https://example.com/catalog/products/item-")
+            with tree.cursor() as cursor:
+                assert cursor.seek(urls[1500][:-4]) and cursor.key == urls[1500]
+
+        print("Pages without/with suffix truncation:", pages[False], pages[True])
+        assert pages[True] <= pages[False]
+
+        bulk = BTree(pager)
+        bulk.bulk_load(urls)
+        assert bulk.keys() == urls
+        assert bulk.search(urls[2999]) and not bulk.search(urls[2999] + "/")
+    finally:
+        osi.close_file()
+
+def test_btree_delete_rebalances():
+    path = os.path.join(tempfile.mkdtemp(), "btree_delete_test.db")
+    osi, pager = _open(path)
+    try:
+        for max_keys in (4, None):
+            tree = BTree(pager, max_keys=max_keys)
+            keys = list(range(3000))
+            for key in keys:
+                tree.insert(key, b"v" * (key % 40))
+            grown = tree.height()
+
+            doomed = keys[:]
+            random.shuffle(doomed)
+            for key in doomed[:2000]:
+                assert tree.delete(key)
+            assert not tree.delete(doomed[0])
+            remaining = sorted(doomed[2000:])
+            assert tree.keys() == remaining
+            assert all(tree.get(key) == b"v" * (key % 40) for key in remaining[::13])
+
+            with tree.cursor() as cursor:           # delete every other key while walking
+                found, position = cursor.first(), 0
+                while found:
+                    if position % 2 == 0:
+                        cursor.delete()
+                    found, position = cursor.next(), position + 1
+            assert tree.keys() == remaining[1::2]
+            with tree.cursor() as cursor:
+                assert cursor.last() and cursor.key == remaining[-1 if len(remaining) % 2 == 0 else -2]
+
+            free_before = pager.header.freelist_count
+            for key in remaining[1::2]:
+                tree.delete(key)
+            print(f"max_keys={max_keys}: height {grown} -> {tree.height()}, "
+                  f"pages freed {pager.header.freelist_count - free_before}")
+            assert tree.keys() == [] and tree.height() == 1
+            assert pager.header.freelist_count > free_before
+            assert sum(page.pin_count for page in pager.cache.values()) == 0
+
+            pages = pager.num_pages             # freed pages are reused before the file grows
+            for key in keys[:500]:
+                tree.insert(key)
+            assert pager.num_pages == pages
+    finally:
+        osi.close_file()
+
+def test_btree_cursor_deletes_in_a_row():
+    path = os.path.join(tempfile.mkdtemp(), "btree_cursor_delete_test.db")
+    osi, pager = _open(path)
+    try:
+        tree = BTree(pager, max_keys=2)
+        for key in range(1, 8):
+            tree.insert(key)
+        with tree.cursor() as cursor:
+            assert cursor.seek(1) and len(cursor.node.keys) == 1     # a single-key leaf: deleting it merges
+            cursor.delete()
+            assert cursor.key == 2                  # left on the entry after the deleted one
+            cursor.delete()
+            assert cursor.key == 3 and tree.keys() == [3, 4, 5, 6, 7]
+
+            deleted = []                            # the rest, without ever calling next()
+            while cursor.valid:
+                deleted.append(cursor.key)
+                cursor.delete()
+            assert deleted == [3, 4, 5, 6, 7] and tree.keys() == []
+            try:
+                cursor.delete()
+                raise AssertionError("deleted past the end")
+            except BTreeError as e:
+                print("Rejected:", e)
+            assert not cursor.next()
+        assert sum(page.pin_count for page in pager.cache.values()) == 0
+    finally:
+        osi.close_file()
+
+if __name__ == "__main__":
+    test_btree_splits_and_persists()
+    test_btree_bulk_load()
+    test_btree_cursor()
+    test_btree_variable_length_entries()
+    test_btree_prefix_compression_and_truncation()
+    test_btree_delete_rebalances()
+    test_btree_cursor_deletes_in_a_row()
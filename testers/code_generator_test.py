@@ -0,0 +1,117 @@
+import os
+import tempfile
+from rich.console import Console
+from compiler.tokenizer import Tokenizer
+from compiler.parser import Parser
+from compiler.code_generator import CodeGeneration, PlanGenerator, compile_predicate, compile_projection
+from backend.schema import Row, Schema
+from engine.database import DatabaseEngine
+from core.virtual_machine import VirtualMachine
+from utils.errors import ExecutionError
+
+def _plan(db, query, compile_expressions):
+    parsed = Parser(Tokenizer().tokenize(query), schema_registry=db.schema_registry).parse()
+    planner = PlanGenerator(schema_registry=db.schema_registry, compile_expressions=compile_expressions)
+    return planner.generate_plan(CodeGeneration().gen(parsed))
+
+def test_compiled_expressions():
+    predicate = compile_predicate({"type": "value_compare", "column": "age", "operator": ">=", "value": 30})
+    print("Predicate:", predicate.__qualname__)
+    assert predicate({"age": "30"}) and predicate({"age": "4"}) and not predicate({"age": "29"})
+    assert compile_predicate({"type": "value_compare", "column": "age", "operator": ">=", "value": "30"}) is predicate
+    assert compile_predicate({"type": "column_compare", "left_column": "a", "right_column": "b"})({"a": 1, "b": 1})
+    quoted = compile_predicate({"type": "value_compare", "column": "it's", "operator": "=", "value": "x'); 1/0 #"})
+    assert quoted({"it's": "x'); 1/0 #"}) and not quoted({"it's": "x"})
+
+    row = {"id": "1", "name": "a", "age": "2"}
+    assert compile_projection(["name", "id"])(row) == {"name": "a", "id": "1"}
+    copied = compile_projection(["*"])(row)
+    assert copied == row and copied is not row
+
+def test_compiled_plans_match_interpreted():
+    path = os.path.join(tempfile.mkdtemp(), "code_generator_test.db")
+    db = DatabaseEngine(path, console=Console(quiet=True))
+    try:
+        db.query("CREATE TABLE people (id INT, name TEXT, age INT, boss INT);")
+        for i in range(40):
+            db.query(f"INSERT INTO people (id, name, age, boss) VALUES ({i}, 'p{i}', {20 + i % 9}, {i % 5});")
+        queries = ["SELECT * FROM people;", "SELECT name FROM people WHERE age = 23;",
+                   "SELECT id, age FROM people WHERE age > 25;", "SELECT id FROM people WHERE age != 21;",
+                   "SELECT id FROM people WHERE id = boss;", "SELECT id FROM people WHERE age <= 22;"]
+        for query in queries:
+            compiled, interpreted = _plan(db, query, True), _plan(db, query, False)
+            assert "FILTER" in [op[0] for op in compiled] or "WHERE" not in query
+            assert "LOAD_COLUMN" not in [op[0] for op in compiled]
+            assert db.vm.execute(compiled) == db.vm.execute(interpreted), query
+
+        db.query("UPDATE people SET age = 99 WHERE age = 28;")
+        db.query("DELETE FROM people WHERE boss = 0;")
+        assert db.query("SELECT id FROM people WHERE age = 99;") == [{"id": "8"}, {"id": "17"}, {"id": "26"}]
+        assert len(db.query("SELECT id FROM people;")) == 32
+
+        try:
+            db.vm.execute(_plan(db, "SELECT nope FROM people;", True))
+            raise AssertionError("missing column projected")
+        except ExecutionError as e:
+            print("Rejected:", e)
+    finally:
+        db.close()
+
+def test_plans_use_column_ordinals():
+    schema = Schema(["id", "name", "age"])
+    row = schema.row(["1", "a", "2"])
+    print("Row:", row, type(row).__name__)
+    assert row == {"id": "1", "name": "a", "age": "2"} and list(row) == ["id", "name", "age"] and row["age"] == "2"
+    assert not hasattr(row, "__dict__") and schema.positions(["age", "id", "age"]) == (2, 0)
+    assert compile_predicate({"type": "value_compare", "column": "age", "operator": ">", "value": 1}, schema)(["1", "a", "2"])
+    assert compile_projection(["age"], schema)(["1", "a", "2"]) == {"age": "2"}
+    try:
+        schema.ordinal("nope")
+        raise AssertionError("unknown column resolved")
+    except ExecutionError as e:
+        print("Rejected:", e)
+
+    path = os.path.join(tempfile.mkdtemp(), "ordinal_test.db")
+    db = DatabaseEngine(path, console=Console(quiet=True))
+    try:
+        db.query("CREATE TABLE people (id INT, name TEXT, age INT);")
+        for i in range(10):
+            db.query(f"INSERT INTO people (id, name, age) VALUES ({i}, 'p{i}', {20 + i});")
+        plan = _plan(db, "SELECT name FROM people WHERE age = 23;", False)
+        print("Interpreted plan:", plan)
+        assert ("LOAD_COLUMN", 2) in plan and ("EMIT_ROW", (1,), schema.row_type((1,))) in plan
+        update = _plan(db, "UPDATE people SET age = 5 WHERE id = 3;", True)
+        assert ("UPDATE_COLUMN", 2) in update
+        db.vm.execute(update)
+        rows = db.query("SELECT * FROM people WHERE age = 5;")
+        assert rows == [{"id": "3", "name": "p3", "age": "5"}] and isinstance(rows[0], Row)
+    finally:
+        db.close()
+
+def test_shared_expressions_keep_their_schema():
+    # the same WHERE / SELECT text resolves to different ordinals in each table
+    path = os.path.join(tempfile.mkdtemp(), "shared_expressions_test.db")
+    db = DatabaseEngine(path, console=Console(quiet=True))
+    try:
+        db.query("CREATE TABLE a (id INT, age INT);")
+        db.query("CREATE TABLE b (age INT, id INT);")
+        for i in range(10):
+            db.query(f"INSERT INTO a (id, age) VALUES ({i}, {20 + i});")
+            db.query(f"INSERT INTO b (age, id) VALUES ({30 + i}, {i});")
+        plan_a = _plan(db, "SELECT id FROM a WHERE age >= 27;", True)
+        plan_b = _plan(db, "SELECT id FROM b WHERE age >= 27;", True)
+        filter_a, filter_b = ([op[1] for op in plan if op[0] == "FILTER"][0] for plan in (plan_a, plan_b))
+        assert filter_a is not filter_b
+        assert filter_a.vectorized is not filter_b.vectorized
+
+        for vm in (VirtualMachine(db.catalog), VirtualMachine(db.catalog, batch_size=4)):
+            assert vm.execute(plan_a) == [{"id": str(i)} for i in (7, 8, 9)]
+            assert vm.execute(plan_b) == [{"id": str(i)} for i in range(10)]
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    test_compiled_expressions()
+    test_compiled_plans_match_interpreted()
+    test_plans_use_column_ordinals()
+    test_shared_expressions_keep_their_schema()
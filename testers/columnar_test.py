@@ -0,0 +1,209 @@
+import os
+import tempfile
+from rich.console import Console
+from backend.columnar import SEGMENT_ROWS, PLAIN, RLE, DICTIONARY, encode_segment, decode_segment, zone_excludes
+from backend.record import Record
+from engine.database import DatabaseEngine
+from utils.errors import ExecutionError
+
+ROWS = 3 * SEGMENT_ROWS + 500            # three full segments plus rows still in the delta
+COLUMNS = "id TEXT, region TEXT, amount TEXT, day TEXT, note TEXT"
+
+def _engine(path, **options):
+    return DatabaseEngine(path, console=Console(quiet=True), **options)
+
+def _values(i):
+    return [f"{i:06d}", f"r{i % 5}", str(i % 113), f"{i // 1000:03d}", f"note {i} " + "x" * (i % 40)]
+
+def test_segment_encodings():
+    for values in ([1, 1, 1, 2, 2, 3] * 100, ["a", "b", "c", "d"] * 100, [f"v{i}" for i in range(300)],
+                   [1.5, None, 2.5] * 10, ["x", 1, None, 2.0]):
+        record = Record(encode_segment(values))
+        print("Encoding", record[0], "for", values[:4], "...")
+        assert decode_segment(record) == values and [type(v) for v in decode_segment(record)] == [type(v) for v in values]
+    assert Record(encode_segment([7] * 1000))[0] == RLE
+    assert Record(encode_segment(["north", "south", "east"] * 300))[0] == DICTIONARY
+    assert Record(encode_segment(list(range(1000))))[0] == PLAIN
+    assert zone_excludes("010", "020", "<", "005") and not zone_excludes("010", "020", "<=", "010")
+    assert zone_excludes(1, 5, "=", 9) and not zone_excludes(1, 5, "!=", 3) and not zone_excludes(None, None, "=", 1)
+
+def test_columnar_matches_row_table():
+    path = os.path.join(tempfile.mkdtemp(), "columnar_test.db")
+    db = _engine(path)
+    try:
+        db.query(f"CREATE TABLE rows_t ({COLUMNS});")
+        db.query(f"CREATE TABLE cols_t ({COLUMNS}) WITH (storage = columnar);")
+        assert db.catalog["cols_t"].storage == "columnar" and db.catalog["rows_t"].storage == "row"
+        for i in range(ROWS):
+            db.catalog["rows_t"].insert(_values(i))
+            db.catalog["cols_t"].insert(_values(i))
+        assert db.catalog["cols_t"].segment_count == 3
+        db.query("INSERT INTO cols_t (id, region, amount, day, note) VALUES ('999999', 'sql', '1', '999', 'n');")
+        db.query("INSERT INTO rows_t (id, region, amount, day, note) VALUES ('999999', 'sql', '1', '999', 'n');")
+
+        queries = ["SELECT * FROM {t};", "SELECT id FROM {t} WHERE amount = '42';",
+                   "SELECT id, day FROM {t} WHERE id < '001500';", "SELECT note FROM {t} WHERE region = 'r3';",
+                   "SELECT id FROM {t} WHERE day >= '011';", "SELECT id FROM {t} WHERE region != 'r1';",
+                   "SELECT amount FROM {t} WHERE id = '999999';", "SELECT id FROM {t} WHERE amount = day;"]
+        def check(label):
+            for batch_size in (None, 500):
+                db.batch_size = batch_size
+                vm = db.new_vm()
+                for query in queries:
+                    expected = db.query(query.format(t="rows_t"), vm=vm)
+                    assert db.query(query.format(t="cols_t"), vm=vm) == expected, (label, query, batch_size)
+            print(f"{label}: {len(queries)} queries agree in row and batch mode")
+        check("after load")
+
+        # updates and deletes of segment rows and of delta rows
+        for statement in ["UPDATE {t} SET amount = 7 WHERE id = '000010';",
+                          "UPDATE {t} SET note = 0 WHERE id = '012300';",
+                          "UPDATE {t} SET amount = 6, day = 500 WHERE amount = '5';",
+                          "DELETE FROM {t} WHERE region = 'r2';",
+                          "DELETE FROM {t} WHERE id = '012500';"]:
+            for table in ("rows_t", "cols_t"):
+                db.query(statement.format(t=table))
+        assert db.catalog["cols_t"].get(3) is None and db.catalog["cols_t"].get(11)["amount"] == "7"
+        try:
+            db.catalog["cols_t"].delete(3)
+            raise AssertionError("Deleting a deleted row should fail")
+        except ExecutionError as e:
+            print("Expected error:", e)
+        check("after update/delete")
+    finally:
+        db.close()
+
+    db = _engine(path)
+    try:
+        assert db.schema_registry["cols_t"] == ["id", "region", "amount", "day", "note"]
+        assert db.catalog["cols_t"].storage == "columnar"
+        rows = db.query("SELECT * FROM rows_t;")
+        assert db.query("SELECT * FROM cols_t;") == rows and len(rows) > 9000
+        print("Rows after reopen:", len(rows))
+        for i in range(ROWS, SEGMENT_ROWS * 4 + 10):      # crosses into a fourth segment
+            db.catalog["cols_t"].insert(_values(i))
+            db.catalog["rows_t"].insert(_values(i))
+        assert db.catalog["cols_t"].segment_count == 4
+        assert db.query("SELECT id FROM cols_t WHERE day = '016';") == db.query("SELECT id FROM rows_t WHERE day = '016';")
+        try:
+            db.query("CREATE INDEX cols_region ON cols_t (region);")
+            raise AssertionError("Columnar tables should not take indexes")
+        except ExecutionError as e:
+            print("Expected error:", e)
+        db.query("DROP cols_t;")
+        assert "cols_t" not in db.catalog
+
+        # WITH is a keyword only after a CREATE TABLE column list
+        db.query("CREATE TABLE with (with TEXT, on TEXT) WITH (storage = columnar);")
+        db.query("INSERT INTO with (with, on) VALUES ('a', 'b');")
+        assert db.catalog["with"].storage == "columnar"
+        assert db.query("SELECT with FROM with WHERE on = 'b';") == [{"with": "a"}]
+    finally:
+        db.close()
+
+def test_columnar_compression_and_pruning():
+    path = os.path.join(tempfile.mkdtemp(), "columnar_pruning.db")
+    db = _engine(path, batch_size=1024)
+    try:
+        db.query(f"CREATE TABLE rows_t ({COLUMNS});")
+        db.query(f"CREATE TABLE cols_t ({COLUMNS}) WITH (storage = columnar);")
+        for i in range(ROWS):
+            db.catalog["rows_t"].insert(_values(i))
+            db.catalog["cols_t"].insert(_values(i))
+        table = db.catalog["cols_t"]
+        sizes = {(segment, column): (encoding, size) for segment, column, encoding, _, _, _, size in table.segment_info()}
+        print("Segment 0:", {column: sizes[0, column] for column in table.columns})
+        assert sizes[0, "region"][0] in (RLE, DICTIONARY) and sizes[0, "region"][1] * 4 < sizes[0, "id"][1]
+        assert sizes[0, "day"][0] in (RLE, DICTIONARY)
+
+        with table.cursor({"type": "value_compare", "column": "id", "operator": "<", "value": "001000"}) as cursor:
+            count = 0
+            while cursor.next():
+                count += 1
+            print("Segments skipped for id < '001000':", cursor.segments_skipped)
+            assert cursor.segments_skipped == 2 and count == ROWS - 2 * SEGMENT_ROWS
+    finally:
+        db.close()
+
+    # a cold scan of two columns reads far fewer pages from the columnar table
+    db = _engine(path, batch_size=1024)
+    try:
+        pages = {}
+        for name in ("rows_t", "cols_t"):
+            misses = db.pager.stats["misses"]
+            rows = db.query(f"SELECT id, amount FROM {name} WHERE region = 'r1';")
+            pages[name] = db.pager.stats["misses"] - misses
+            assert len(rows) == len(range(1, ROWS, 5))
+        print("Pages read:", pages)
+        assert pages["cols_t"] * 2 < pages["rows_t"]
+    finally:
+        db.close()
+
+def test_bulk_update_and_delete_across_segments():
+    # every row of two full segments changes: each segment's columns and deleted list are written once
+    path = os.path.join(tempfile.mkdtemp(), "columnar_bulk.db")
+    db = _engine(path)
+    try:
+        db.query(f"CREATE TABLE rows_t ({COLUMNS});")
+        db.query(f"CREATE TABLE cols_t ({COLUMNS}) WITH (storage = columnar);")
+        for i in range(2 * SEGMENT_ROWS + 100):
+            db.catalog["rows_t"].insert(_values(i))
+            db.catalog["cols_t"].insert(_values(i))
+        segments = db.catalog["cols_t"].segments
+        writes = []
+        insert = segments.insert
+        segments.insert = lambda key, value=b"": (writes.append(key), insert(key, value))[1]
+        try:
+            for statement, expected in [("UPDATE {t} SET amount = 1, day = 2 WHERE id >= '000000';",
+                                         [(0, 2), (0, 3), (1, 2), (1, 3)]),
+                                        ("DELETE FROM {t} WHERE region != 'r0';", [(0, -1), (1, -1)]),
+                                        ("UPDATE {t} SET amount = 3 WHERE region = 'r0';", [(0, 2), (1, 2)])]:
+                for table in ("rows_t", "cols_t"):
+                    db.query(statement.format(t=table))
+                print(statement.format(t="cols_t"), "wrote", writes)
+                assert writes == expected
+                writes.clear()
+        finally:
+            segments.insert = insert
+        rows = db.query("SELECT * FROM rows_t;")
+        assert db.query("SELECT * FROM cols_t;") == rows and len(rows) == len(range(0, 2 * SEGMENT_ROWS + 100, 5))
+        assert {row["amount"] for row in rows} == {"3"} and {row["day"] for row in rows} == {"2"}
+    finally:
+        db.close()
+
+    db = _engine(path)
+    try:
+        assert db.query("SELECT * FROM cols_t;") == db.query("SELECT * FROM rows_t;")
+        assert db.catalog["cols_t"].get(2) is None and db.catalog["cols_t"].get(1)["amount"] == "3"
+    finally:
+        db.close()
+
+def test_scan_skips_unread_column_bodies():
+    # a scan of one narrow column must not read the wide first column's overflow pages
+    path = os.path.join(tempfile.mkdtemp(), "columnar_wide.db")
+    db = _engine(path, batch_size=1024)
+    try:
+        db.query("CREATE TABLE wide_t (body TEXT, region TEXT) WITH (storage = columnar);")
+        for i in range(2 * SEGMENT_ROWS):
+            db.catalog["wide_t"].insert([f"{i:06d} " + "y" * 200, f"r{i % 5}"])
+        body_bytes = sum(size for _, column, _, _, _, _, size in db.catalog["wide_t"].segment_info() if column == "body")
+    finally:
+        db.close()
+
+    db = _engine(path, batch_size=1024)
+    try:
+        misses = db.pager.stats["misses"]
+        rows = db.query("SELECT region FROM wide_t WHERE region = 'r1';")
+        pages = db.pager.stats["misses"] - misses
+        print(f"Pages read: {pages}, body column: {body_bytes // db.pager.page_size} pages")
+        assert len(rows) == len(range(1, 2 * SEGMENT_ROWS, 5))
+        assert pages * 10 < body_bytes // db.pager.page_size
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    test_segment_encodings()
+    test_columnar_matches_row_table()
+    test_columnar_compression_and_pruning()
+    test_bulk_update_and_delete_across_segments()
+    test_scan_skips_unread_column_bodies()
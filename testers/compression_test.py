@@ -0,0 +1,100 @@
+import os
+import stat
+import tempfile
+from backend.os_interface import OSInterface, DEFAULT_PAGE_SIZE, SYNC_OFF, SYNC_NORMAL
+from backend.compressed_os_interface import CompressedOSInterface
+from backend.pager import Pager
+
+def _text_page(page_num):
+    text = f"row {page_num}: the quick brown fox jumps over the lazy dog. ".encode() * 20
+    return text + b"\x00" * (DEFAULT_PAGE_SIZE - len(text))
+
+def test_compressed_pages_round_trip():
+    path = os.path.join(tempfile.mkdtemp(), "compression_test.db")
+    osi = CompressedOSInterface(OSInterface(path))
+    osi.open_file()
+    pager = Pager(osi, cache_size=4)
+
+    try:
+        for _ in range(50):
+            page_num = pager.allocate_page()
+            page = pager.get_page(page_num)
+            page.data = _text_page(page_num)
+            pager.mark_dirty(page)
+        pager.flush_all()
+
+        report = osi.report()
+        print("Compression:", report)
+        assert report["compression_ratio"] > 4
+        assert os.path.getsize(path) < 51 * DEFAULT_PAGE_SIZE / 4
+
+        # rewrite a page: the old slots are only reused after the map is synced
+        page = pager.get_page(7)
+        page.data = _text_page(700)
+        pager.mark_dirty(page)
+        pager.flush_all()
+        osi.close_file()
+
+        osi = CompressedOSInterface(OSInterface(path))
+        osi.open_file()
+        pager = Pager(osi, cache_size=4)
+        assert pager.num_pages == 51
+        assert pager.get_page(7).data == _text_page(700)
+        assert pager.get_page(50).data == _text_page(50)
+    finally:
+        osi.close_file()
+
+def test_short_compressed_writes():
+    # a slot run only half written would leave the map pointing at a truncated image
+    path = os.path.join(tempfile.mkdtemp(), "short_compressed_test.db")
+    osi = CompressedOSInterface(OSInterface(path))
+    osi.open_file()
+    pwrite = os.pwrite
+    try:
+        os.pwrite = lambda fd, data, offset: pwrite(fd, data[:16], offset)
+        for page_num in range(1, 4):
+            osi.write_page(page_num, _text_page(page_num))
+        os.pwrite = pwrite
+        osi.sync()
+        osi.close_file()
+
+        osi = CompressedOSInterface(OSInterface(path))
+        osi.open_file()
+        for page_num in range(1, 4):
+            assert osi.read_page(page_num) == _text_page(page_num)
+        print("Short compressed writes completed")
+    finally:
+        os.pwrite = pwrite
+        osi.close_file()
+
+def test_map_rename_synced_before_slots_reused():
+    # until the directory holding the renamed map is synced, a crash can bring back the old
+    # map, so the slots it points at must stay untouched until then
+    fsync = os.fsync
+    for sync_level in (SYNC_NORMAL, SYNC_OFF):
+        path = os.path.join(tempfile.mkdtemp(), "map_sync_test.db")
+        osi = CompressedOSInterface(OSInterface(path, sync_level=sync_level))
+        osi.open_file()
+        pending_at_directory_sync = []
+        def recording_fsync(fd):
+            if stat.S_ISDIR(os.fstat(fd).st_mode):
+                pending_at_directory_sync.append(len(osi.pending_free))
+            return fsync(fd)
+        try:
+            osi.write_page(1, _text_page(1))
+            osi.sync()
+            osi.write_page(1, _text_page(2))        # the first image's slots become pending
+            os.fsync = recording_fsync
+            osi.sync()
+            os.fsync = fsync
+            print(f"Pending runs at directory sync ({sync_level}):", pending_at_directory_sync)
+            assert pending_at_directory_sync == ([1] if sync_level != SYNC_OFF else [])
+            assert not osi.pending_free and osi.free_runs
+        finally:
+            os.fsync = fsync
+            osi.close_file()
+
+if __name__ == "__main__":
+    test_compressed_pages_round_trip()
+    test_short_compressed_writes()
+    test_map_rename_synced_before_slots_reused()
@@ -0,0 +1,50 @@
+import os
+import tempfile
+from backend.os_interface import OSInterface
+from backend.pager import Pager
+from backend.b_tree import BTree
+from utils.errors import ExecutionError
+
+def test_page_size_comes_from_header():
+    path = os.path.join(tempfile.mkdtemp(), "header_test.db")
+    osi = OSInterface(path, page_size=16384)
+    osi.open_file()
+    pager = Pager(osi)
+    tree = BTree(pager)
+    pager.set_schema_root(tree.root_page_num)
+    for key in range(700):                      # more keys than a 4 KB page could hold
+        tree.insert(key)
+    pager.flush_all()
+    osi.close_file()
+
+    osi = OSInterface(path)                     # asks for the default 4 KB
+    osi.open_file()
+    try:
+        print("Header at open:", osi.header)
+        assert osi.page_size == 16384
+        pager = Pager(osi)
+        tree = BTree(pager, root_page_num=pager.header.schema_root)
+        assert len(tree.root.keys) == 700
+    finally:
+        osi.close_file()
+
+def test_invalid_files_rejected():
+    for page_size in (512, 3000, 131072):
+        try:
+            OSInterface("unused.db", page_size=page_size)
+            raise AssertionError(f"page size {page_size} accepted")
+        except ExecutionError:
+            pass
+
+    path = os.path.join(tempfile.mkdtemp(), "garbage.db")
+    with open(path, "wb") as f:
+        f.write(b"not a database".ljust(4096, b"!"))
+    try:
+        OSInterface(path).open_file()
+        raise AssertionError("garbage file accepted")
+    except ExecutionError as e:
+        print("Rejected:", e)
+
+if __name__ == "__main__":
+    test_page_size_comes_from_header()
+    test_invalid_files_rejected()
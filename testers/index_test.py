@@ -0,0 +1,173 @@
+import operator
+import os
+import tempfile
+from rich.console import Console
+from compiler.tokenizer import Tokenizer
+from compiler.parser import Parser
+from compiler.code_generator import CodeGeneration, PlanGenerator
+from backend.key_encoding import encode_key
+from engine.database import DatabaseEngine
+from utils.errors import ExecutionError
+
+def _engine(path):
+    return DatabaseEngine(path, console=Console(quiet=True))
+
+def _plan(db, query):
+    parsed = Parser(Tokenizer().tokenize(query), schema_registry=db.schema_registry).parse()
+    command = CodeGeneration().gen(parsed)
+    return PlanGenerator(schema_registry=db.schema_registry, catalog=db.catalog).generate_plan(command)
+
+def _opcodes(plan):
+    return [op[0] for op in plan]
+
+def _pages_read(db, query):
+    def touched():
+        stats = db.pager.stats
+        return stats["hits"] + stats["misses"] + stats["decoded_hits"]
+    before = touched()
+    rows = db.query(query)
+    return rows, touched() - before
+
+def test_index_plans_match_scans():
+    path = os.path.join(tempfile.mkdtemp(), "index_test.db")
+    db = _engine(path)
+    try:
+        db.query("CREATE TABLE items (id INT, name TEXT, grp INT);")
+        for i in range(5):
+            db.query(f"INSERT INTO items (id, name, grp) VALUES ({i}, 'item{i}', {i % 1000});")
+        table = db.catalog["items"]
+        for i in range(5, 20000):
+            table.insert([str(i), f"item{i}", str(i % 1000)])     # the values SQL inserts would store
+
+        queries = ["SELECT * FROM items WHERE grp = 3;", "SELECT id FROM items WHERE grp < 11;",
+                   "SELECT id FROM items WHERE grp >= 98;", "SELECT id FROM items WHERE grp > 98;",
+                   "SELECT id FROM items WHERE grp <= 0;"]
+        expected = {query: db.query(query) for query in queries}
+        _, scan_pages = _pages_read(db, "SELECT * FROM items WHERE grp = 3;")
+
+        db.query("CREATE INDEX items_grp ON items (grp);")
+        for query in queries:
+            assert "INDEX_SEEK" in _opcodes(_plan(db, query))
+            assert sorted(db.query(query), key=lambda row: int(row["id"])) == expected[query], query
+        rows, index_pages = _pages_read(db, "SELECT * FROM items WHERE grp = 3;")
+        print(f"Pages read: full scan {scan_pages}, index {index_pages}")
+        assert len(rows) == 20 and index_pages < scan_pages
+
+        assert "INDEX_SEEK" not in _opcodes(_plan(db, "SELECT * FROM items WHERE grp != 3;"))
+        assert "INDEX_SEEK" not in _opcodes(_plan(db, "SELECT * FROM items WHERE name = 'item3';"))
+        assert "INDEX_SEEK" not in _opcodes(_plan(db, "UPDATE items SET grp = 4 WHERE grp = 3;"))
+
+        # maintenance: the index follows inserts, updates and deletes
+        db.query("INSERT INTO items (id, name, grp) VALUES (20000, 'item20000', 4242);")
+        db.query("UPDATE items SET grp = 4242 WHERE id = 7;")
+        db.query("DELETE FROM items WHERE grp = 3;")
+        assert "INDEX_SEEK" in _opcodes(_plan(db, "DELETE FROM items WHERE grp = 3;"))
+        assert db.query("SELECT id FROM items WHERE grp = 3;") == []
+        assert db.query("SELECT id FROM items WHERE grp = 4242;") == [{"id": "7"}, {"id": "20000"}]
+        assert len(db.query("SELECT id FROM items WHERE grp = 7;")) == 19
+    finally:
+        db.close()
+
+    db = _engine(path)
+    try:
+        assert db.catalog.index_on("items", "grp") == "items_grp"
+        assert db.query("SELECT id FROM items WHERE grp = 4242;") == [{"id": "7"}, {"id": "20000"}]
+        db.query("DROP INDEX items_grp;")
+        assert "INDEX_SEEK" not in _opcodes(_plan(db, "SELECT * FROM items WHERE grp = 4242;"))
+        assert len(db.query("SELECT id FROM items WHERE grp = 4242;")) == 2
+        db.query("DROP TABLE items;")
+        assert "items" not in db.catalog
+    finally:
+        db.close()
+
+def test_index_on_float_column():
+    path = os.path.join(tempfile.mkdtemp(), "index_float.db")
+    db = _engine(path)
+    try:
+        db.query("CREATE TABLE readings (id INT, temp REAL);")
+        table = db.catalog["readings"]
+        temps = [(-1) ** i * (i % 97) / 4 for i in range(3000)] + [None, -0.0, float("inf"), -float("inf")]
+        for i, temp in enumerate(temps):
+            table.insert([i, temp])
+        db.query("CREATE INDEX readings_temp ON readings (temp);")
+        compare = {"=": operator.eq, "<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge}
+        for op, bound in (("=", 2.5), ("<", -3.25), ("<=", 0.0), (">", 20.75), (">=", -0.0)):
+            with table.index_scan("readings_temp", op, bound) as scan:
+                found = []
+                while scan.next():
+                    found.append(scan.record.values()[0])
+            expected = [i for i, temp in enumerate(temps) if temp is not None and compare[op](temp, bound)]
+            print(f"temp {op} {bound}: {len(found)} rows")
+            assert sorted(found) == expected, (op, bound)
+        # every NaN, whatever its sign, encodes alike and sorts above +inf
+        nan = float("nan")
+        ordered = sorted([nan, float("inf"), -nan, -float("inf"), 0.0], key=encode_key)
+        assert ordered[:3] == [-float("inf"), 0.0, float("inf")] and encode_key(ordered[3]) == encode_key(ordered[4])
+        assert encode_key(-nan) == encode_key(nan)
+        table.insert([len(temps), 1.125])
+        with table.index_scan("readings_temp", "=", 1.125) as scan:
+            assert scan.next() and scan.record.values() == [len(temps), 1.125] and not scan.next()
+    finally:
+        db.close()
+
+def test_index_and_on_as_names():
+    # INDEX and ON are keywords only inside CREATE INDEX / DROP INDEX
+    path = os.path.join(tempfile.mkdtemp(), "index_names.db")
+    db = _engine(path)
+    try:
+        db.query("CREATE TABLE index (on INT, index TEXT);")
+        for i in range(5):
+            db.query(f"INSERT INTO index (on, index) VALUES ({i}, 'v{i}');")
+        db.query("UPDATE index SET on = 9 WHERE index = 'v4';")
+        assert db.query("SELECT index FROM index WHERE on = 3;") == [{"index": "v3"}]
+        db.query("CREATE INDEX on ON index (on);")
+        assert db.catalog.index_on("index", "on") == "on"
+        assert "INDEX_SEEK" in _opcodes(_plan(db, "SELECT index FROM index WHERE on >= 3;"))
+        assert db.query("SELECT index FROM index WHERE on >= 3;") == [{"index": "v3"}, {"index": "v4"}]
+        db.query("DROP INDEX on;")
+        assert db.catalog.index_on("index", "on") is None
+        db.query("DELETE FROM index WHERE on = 0;")
+        assert len(db.query("SELECT * FROM index;")) == 4
+        db.query("DROP index;")
+        assert "index" not in db.catalog
+    finally:
+        db.close()
+
+def test_unindexable_value_leaves_table_unchanged():
+    # a value too large for an index key is refused before the row is written
+    path = os.path.join(tempfile.mkdtemp(), "index_large.db")
+    db = _engine(path)
+    try:
+        db.query("CREATE TABLE t (id INT, v VARCHAR(4000));")
+        db.query("INSERT INTO t (id, v) VALUES (1, 'xa');")
+        db.query("CREATE INDEX iv ON t (v);")
+        large = "x" * 2000
+        try:
+            db.query(f"INSERT INTO t (id, v) VALUES (2, '{large}');")
+            raise AssertionError("An oversized index key should fail")
+        except ExecutionError as e:
+            print("Expected error:", str(e)[:100])
+        try:
+            db.catalog["t"].update(1, ["1", large])
+            raise AssertionError("An oversized index key should fail")
+        except ExecutionError as e:
+            print("Expected error:", str(e)[:100])
+        assert db.query("SELECT id FROM t;") == [{"id": "1"}]
+        assert "INDEX_SEEK" in _opcodes(_plan(db, "SELECT id FROM t WHERE v >= 'x';"))
+        assert db.query("SELECT id, v FROM t WHERE v >= 'x';") == [{"id": "1", "v": "xa"}]
+        db.query("INSERT INTO t (id, v) VALUES (3, 'xb');")
+    finally:
+        db.close()
+
+    db = _engine(path)
+    try:
+        assert db.query("SELECT id FROM t;") == [{"id": "1"}, {"id": "3"}]
+        assert db.query("SELECT id FROM t WHERE v >= 'x';") == [{"id": "1"}, {"id": "3"}]
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    test_index_plans_match_scans()
+    test_index_on_float_column()
+    test_index_and_on_as_names()
+    test_unindexable_value_leaves_table_unchanged()
@@ -1,7 +1,12 @@
-from backend.os_interface import OSInterface, DEFAULT_PAGE_SIZE
+import logging
+import os
+import tempfile
+import backend.os_interface as os_interface
+from backend.os_interface import OSInterface, DEFAULT_PAGE_SIZE, SYNC_OFF, SYNC_NORMAL, SYNC_FULL
+from utils.errors import ExecutionError
 
 def test_os_interface():
-    db = OSInterface("example.db")
+    db = OSInterface(os.path.join(tempfile.mkdtemp(), "os_test.db"))
     try:
         db.open_file()
 
@@ -18,5 +23,156 @@ def test_os_interface():
     finally:
         db.close_file()
 
+def _page(fill):
+    return bytes([fill]) * DEFAULT_PAGE_SIZE
+
+def test_mmap_read_path():
+    path = os.path.join(tempfile.mkdtemp(), "mmap_test.db")
+    db = OSInterface(path, use_mmap=True)
+    try:
+        db.open_file(read_header=False)
+        assert db.read_page(0) == b""                    # empty file: nothing mapped yet
+        for page_number in range(3):
+            db.write_page(page_number, _page(page_number + 1))
+        first = db.read_page(0)
+        print("Mapped size after 3 pages:", db._mapped_size)
+        assert isinstance(first, memoryview) and bytes(first) == _page(1)
+        assert db._mapped_size == 3 * DEFAULT_PAGE_SIZE
+
+        # grow the file past the mapping while `first` still references it
+        messages = []
+        handler = logging.Handler()
+        handler.emit = lambda record: messages.append(record.getMessage())
+        os_interface.logger.addHandler(handler)
+        try:
+            db.write_page(9, _page(10))
+            assert bytes(db.read_page(9)) == _page(10)
+        finally:
+            os_interface.logger.removeHandler(handler)
+        assert any(message.startswith("Deferred unmapping") for message in messages)
+        print("Mapped size after growing:", db._mapped_size)
+        assert db._mapped_size == 10 * DEFAULT_PAGE_SIZE
+        assert bytes(first) == _page(1)                  # the old view outlives the remap
+        assert [bytes(page) for page in db.read_pages(1, 3)] == [_page(2), _page(3), bytes(DEFAULT_PAGE_SIZE)]
+        assert len(db.read_pages(8, 5)) == 2 and db.read_page(10) == b""
+        del first
+    finally:
+        db.close_file()
+    assert db._mmap is None
+
+    db = OSInterface(path, use_mmap=True)
+    try:
+        db.open_file(read_header=False)
+        assert [bytes(db.read_page(n)) for n in (0, 2, 9)] == [_page(1), _page(3), _page(10)]
+    finally:
+        db.close_file()
+
+def _on_disk(path, first_page, count):
+    with open(path, "rb") as f:
+        f.seek(first_page * DEFAULT_PAGE_SIZE)
+        return f.read(count * DEFAULT_PAGE_SIZE)
+
+def _recording(name, calls, replacement=None):
+    # swap os.<name> for a wrapper that records each call; returns the original
+    original = getattr(os, name)
+    def wrapper(*args):
+        calls.append(name)
+        return (replacement or original)(*args)
+    setattr(os, name, wrapper)
+    return original
+
+def test_write_pages_vectored():
+    path = os.path.join(tempfile.mkdtemp(), "write_pages_test.db")
+    db = OSInterface(path, sync_level=SYNC_OFF)
+    calls = []
+    pwritev = _recording("pwritev", calls)
+    iov_max = os_interface.IOV_MAX
+    try:
+        db.open_file(read_header=False)
+        db.write_pages(1, [_page(1), _page(2), _page(3)])
+        print("Syscalls for one run of 3 pages:", calls)
+        assert calls == ["pwritev"] and _on_disk(path, 1, 3) == _page(1) + _page(2) + _page(3)
+
+        # runs longer than IOV_MAX are split into several pwritev calls
+        calls.clear()
+        os_interface.IOV_MAX = 2
+        db.write_pages(10, [_page(n) for n in range(5)])
+        assert calls == ["pwritev"] * 3
+        assert _on_disk(path, 10, 5) == b"".join(_page(n) for n in range(5))
+        os_interface.IOV_MAX = iov_max
+
+        # a short pwritev is finished with pwrite calls
+        calls.clear()
+        os.pwritev = pwritev
+        def short_pwritev(fd, buffers, offset):
+            return pwritev(fd, buffers[:1], offset) - 100
+        _recording("pwritev", calls, short_pwritev)
+        pwrite = _recording("pwrite", calls)
+        db.write_pages(20, [_page(7), _page(8), _page(9)])
+        os.pwrite = pwrite
+        print("Syscalls for a short write:", calls)
+        assert calls[0] == "pwritev" and calls[1:] and set(calls[1:]) == {"pwrite"}
+        assert _on_disk(path, 20, 3) == _page(7) + _page(8) + _page(9)
+
+        # a pwrite that makes no progress is reported instead of retried forever
+        _recording("pwrite", calls, lambda fd, data, offset: 0)
+        try:
+            db.write_pages(30, [_page(1), _page(2)])
+            raise AssertionError("stalled write accepted")
+        except ExecutionError as e:
+            print("Stalled write:", e)
+        finally:
+            os.pwrite = pwrite
+    finally:
+        os.pwritev = pwritev
+        os_interface.IOV_MAX = iov_max
+        db.close_file()
+
+def test_short_file_writes():
+    # the file is unbuffered, so write() may take only part of the data
+    path = os.path.join(tempfile.mkdtemp(), "short_write_test.db")
+    db = OSInterface(path, sync_level=SYNC_OFF)
+    pwritev = getattr(os, "pwritev", None)
+    try:
+        db.open_file(read_header=False)
+        write = db.file.write
+        db.file.write = lambda data: write(data[:1000])
+        db.write_page(1, _page(1))
+        if pwritev is not None:
+            del os.pwritev                   # take the seek + write path of write_pages
+        db.write_pages(2, [_page(2), _page(3)])
+        assert _on_disk(path, 1, 3) == _page(1) + _page(2) + _page(3)
+        print("Short writes completed")
+    finally:
+        if pwritev is not None:
+            os.pwritev = pwritev
+        db.close_file()
+
+def test_sync_levels():
+    path = os.path.join(tempfile.mkdtemp(), "sync_test.db")
+    calls = []
+    originals = {name: _recording(name, calls) for name in ("fsync", "fdatasync")}
+    try:
+        normal = ["fdatasync"] if hasattr(os, "fdatasync") else ["fsync"]
+        full = [] if hasattr(os, "F_FULLFSYNC") else ["fsync"]     # macOS goes through fcntl instead
+        for level, expected in ((SYNC_OFF, []), (SYNC_NORMAL, normal), (SYNC_FULL, full)):
+            db = OSInterface(path, sync_level=level)
+            try:
+                db.open_file(read_header=False)
+                db.write_pages(0, [_page(1)])
+                calls.clear()
+                db.sync()
+                print(f"sync() at {level}:", calls)
+                assert calls == expected
+            finally:
+                db.close_file()
+    finally:
+        for name, original in originals.items():
+            setattr(os, name, original)
+
 if __name__ == "__main__":
-    test_os_interface()
\ No newline at end of file
+    test_os_interface()
+    test_mmap_read_path()
+    test_write_pages_vectored()
+    test_short_file_writes()
+    test_sync_levels()
\ No newline at end of file
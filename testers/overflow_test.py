@@ -0,0 +1,66 @@
+import os
+import tempfile
+from backend.os_interface import OSInterface
+from backend.pager import Pager
+from backend.b_tree import BTree
+from backend.record import Record, encode_record
+
+def _pages_touched(pager):
+    return pager.stats["hits"] + pager.stats["misses"]
+
+def test_large_values_spill_to_overflow_pages():
+    path = os.path.join(tempfile.mkdtemp(), "overflow_test.db")
+    osi = OSInterface(path)
+    osi.open_file()
+    pager = Pager(osi, cache_size=64)
+    tree = BTree(pager)
+    pager.set_schema_root(tree.root_page_num)
+
+    bodies = {i: bytes([i % 251]) * (20_000 + i) for i in range(12)}
+    for i, body in bodies.items():
+        tree.insert(i, encode_record([i, f"name-{i}", body]))
+    print("Pages for 12 rows of ~20 KB:", pager.num_pages, "height:", tree.height())
+    assert tree.height() == 1                   # only short prefixes live in the leaf
+    pager.flush_all()
+    osi.close_file()
+
+    osi = OSInterface(path)
+    osi.open_file()
+    try:
+        pager = Pager(osi, cache_size=64)
+        tree = BTree(pager, root_page_num=pager.header.schema_root)
+        with tree.cursor() as cursor:
+            assert cursor.seek(7)
+            before = _pages_touched(pager)
+            record = Record(cursor.payload)
+            assert record[0] == 7 and record[1] == "name-7"
+            assert _pages_touched(pager) == before        # narrow columns: no overflow page read
+
+            assert record[2] == bodies[7]
+            print("Pages read for the wide column:", _pages_touched(pager) - before)
+            assert _pages_touched(pager) - before >= 20_000 // pager.page_size
+
+        assert Record(tree.get(11)).values() == [11, "name-11", bodies[11]]
+    finally:
+        osi.close_file()
+
+def test_duplicate_large_value_frees_its_chain():
+    osi = OSInterface(os.path.join(tempfile.mkdtemp(), "overflow_dup_test.db"))
+    osi.open_file()
+    try:
+        pager = Pager(osi)
+        tree = BTree(pager)
+        tree.insert("k", b"x" * 50_000)
+        pages = pager.num_pages
+        tree.insert("k", b"y" * 50_000)             # duplicate: its overflow pages go back on the free list
+        assert pager.header.freelist_count > 0 and pager.num_pages > pages
+        pages = pager.num_pages
+        tree.insert("other", b"z" * 40_000)         # reuses them
+        assert pager.num_pages == pages
+        assert tree.get("k") == b"x" * 50_000 and tree.get("other") == b"z" * 40_000
+    finally:
+        osi.close_file()
+
+if __name__ == "__main__":
+    test_large_values_spill_to_overflow_pages()
+    test_duplicate_large_value_frees_its_chain()
@@ -1,22 +1,19 @@
+import os
+import tempfile
 from backend.os_interface import OSInterface, DEFAULT_PAGE_SIZE
 from backend.pager import Pager
 
 def test_pager():
-    osi = OSInterface("example.db")
+    osi = OSInterface(os.path.join(tempfile.mkdtemp(), "pager_test.db"))
     osi.open_file()
     pager = Pager(osi, cache_size=2)
 
     try:
-        # Read page 0 (may be empty if db is new)
-        page0 = pager.get_page(0)
-        print("Before write - Page 0:", page0.data[:20])
-
-        # Modify page 0
-        page0.data = b"PageZero" + b"\x00" * (DEFAULT_PAGE_SIZE - 8)
-        pager.mark_dirty(page0)
+        # Page 0 holds the database header; data pages start at 1
+        page1 = pager.get_page(1)
+        print("Before write - Page 1:", page1.data[:20])
 
         # Modify page 1
-        page1 = pager.get_page(1)
         page1.data = b"PageOne" + b"\x00" * (DEFAULT_PAGE_SIZE - 7)
         pager.mark_dirty(page1)
 
@@ -25,22 +22,120 @@ def test_pager():
         page2.data = b"PageTwo" + b"\x00" * (DEFAULT_PAGE_SIZE - 7)
         pager.mark_dirty(page2)
 
+        # Modify page 3
+        page3 = pager.get_page(3)
+        page3.data = b"PageThree" + b"\x00" * (DEFAULT_PAGE_SIZE - 9)
+        pager.mark_dirty(page3)
+
         # Flush all dirty pages to disk
         pager.flush_all()
         print("Pages written to disk.")
 
         # Read back to verify persistence
-        page0_reloaded = pager.get_page(0)
-        print("After write - Page 0:", page0_reloaded.data[:20])
-
         page1_reloaded = pager.get_page(1)
         print("After write - Page 1:", page1_reloaded.data[:20])
 
         page2_reloaded = pager.get_page(2)
         print("After write - Page 2:", page2_reloaded.data[:20])
 
+        page3_reloaded = pager.get_page(3)
+        print("After write - Page 3:", page3_reloaded.data[:20])
+
+        # Reopen: the page count comes from the header, not the file size
+        osi.close_file()
+        osi.open_file()
+        pager = Pager(osi, cache_size=2)
+        print("Page count from header:", pager.num_pages)
+        assert pager.num_pages == 4
+
+    finally:
+        osi.close_file()
+
+def test_free_page_reuse():
+    osi = OSInterface(os.path.join(tempfile.mkdtemp(), "freelist_test.db"))
+    osi.open_file()
+    pager = Pager(osi, cache_size=4)
+
+    try:
+        pages = [pager.allocate_page() for _ in range(600)]
+        for page_num in pages[10:]:
+            pager.free_page(page_num)
+        print("Free pages:", pager.header.freelist_count, "trunk:", pager.header.freelist_trunk)
+
+        reused = {pager.allocate_page() for _ in range(590)}
+        assert reused == set(pages[10:])
+        assert pager.num_pages == 601
+        assert pager.header.freelist_count == 0
+    finally:
+        osi.close_file()
+
+def test_decoded_page_cache():
+    osi = OSInterface(os.path.join(tempfile.mkdtemp(), "decoded_test.db"))
+    osi.open_file()
+    pager = Pager(osi, cache_size=2)
+    decodes = []
+
+    def decode(data):
+        decodes.append(1)
+        return bytes(data[:4])
+
+    try:
+        page = pager.get_page(1)
+        page.writable()[:4] = b"AAAA"
+        pager.mark_dirty(page)
+        assert pager.get_decoded(1, decode) == b"AAAA"
+        assert pager.get_decoded(1, decode) == b"AAAA"
+        assert len(decodes) == 1
+
+        page.writable()[:4] = b"BBBB"
+        pager.mark_dirty(page)                      # dirtying drops the decoded copy
+        assert pager.peek_decoded(1) is None
+        assert pager.get_decoded(1, decode) == b"BBBB"
+
+        pager.get_page(2)
+        pager.get_page(3)                           # evicts page 1, and its decoded copy with it
+        assert 1 not in pager.cache and pager.peek_decoded(1) is None
+        assert pager.get_decoded(1, decode) == b"BBBB"
+        assert len(decodes) == 3
+
+        print("Decoded hit rate:", pager.decoded_hit_rate, pager.stats)
+        assert pager.decoded_hit_rate == 1 / 4
+    finally:
+        osi.close_file()
+
+def test_flush_coalesces_dirty_runs():
+    path = os.path.join(tempfile.mkdtemp(), "flush_runs_test.db")
+    osi = OSInterface(path)
+    osi.open_file()
+    pager = Pager(osi, cache_size=32)
+    writes, syncs = [], []
+    write_pages, sync = osi.write_pages, osi.sync
+    osi.write_pages = lambda first, pages: (writes.append((first, len(pages))), write_pages(first, pages))
+    osi.sync = lambda: (syncs.append(1), sync())
+    try:
+        pager.flush_all()
+        writes.clear(), syncs.clear()
+        for number in (12, 3, 7, 2, 8, 4):               # runs 2-4, 7-8 and 12, dirtied out of order
+            page = pager.get_page(number)
+            page.data = bytes([number]) * DEFAULT_PAGE_SIZE
+            pager.mark_dirty(page)
+        pager.flush_all()
+        print("Runs written:", writes, "syncs:", len(syncs))
+        # page 0 is the header, rewritten because the page count grew
+        assert writes == [(0, 1), (2, 3), (7, 2), (12, 1)] and len(syncs) == 1
+
+        with open(path, "rb") as f:
+            for number in (2, 3, 4, 7, 8, 12):
+                f.seek(number * DEFAULT_PAGE_SIZE)
+                assert f.read(DEFAULT_PAGE_SIZE) == bytes([number]) * DEFAULT_PAGE_SIZE
+        writes.clear(), syncs.clear()
+        pager.flush_all()
+        assert writes == [] and syncs == []              # nothing dirty: no write, no barrier
     finally:
         osi.close_file()
 
 if __name__ == "__main__":
     test_pager()
+    test_flush_coalesces_dirty_runs()
+    test_free_page_reuse()
+    test_decoded_page_cache()
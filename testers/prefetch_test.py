@@ -0,0 +1,45 @@
+import os
+import tempfile
+from backend.os_interface import OSInterface, DEFAULT_PAGE_SIZE
+from backend.pager import Pager
+
+def _build_file(pages):
+    path = os.path.join(tempfile.mkdtemp(), "prefetch_test.db")
+    with open(path, "wb") as f:
+        # page 0 comes out blank, so the pager formats it as the database header
+        for page_num in range(pages):
+            f.write(page_num.to_bytes(4, "little") + b"\x00" * (DEFAULT_PAGE_SIZE - 4))
+    return path
+
+def _scan(prefetch_async):
+    osi = OSInterface(_build_file(64))
+    osi.open_file()
+    pager = Pager(osi, cache_size=8, read_ahead=8, prefetch_async=prefetch_async)
+    try:
+        for page_num in range(1, 64):           # page 0 is the database header
+            page = pager.get_page(page_num)
+            assert int.from_bytes(page.data[:4], "little") == page_num
+
+        # a page rewritten after being prefetched must not be served stale
+        pager.advise_sequential(1)
+        page = pager.get_page(1)
+        page.data = (999).to_bytes(4, "little") + b"\x00" * (DEFAULT_PAGE_SIZE - 4)
+        pager.mark_dirty(page)
+        pager.flush_all()
+        assert int.from_bytes(pager.get_page(1).data[:4], "little") == 999
+
+        print(f"async={prefetch_async}:", pager.stats)
+        assert pager.stats["prefetch_hits"] > 0
+    finally:
+        pager.close()
+        osi.close_file()
+
+def test_sequential_read_ahead():
+    _scan(prefetch_async=False)
+
+def test_background_prefetch():
+    _scan(prefetch_async=True)
+
+if __name__ == "__main__":
+    test_sequential_read_ahead()
+    test_background_prefetch()
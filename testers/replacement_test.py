@@ -0,0 +1,39 @@
+import os
+import tempfile
+from backend.os_interface import OSInterface
+from backend.pager import Pager
+
+def _open_pager(policy, cache_size):
+    osi = OSInterface(os.path.join(tempfile.mkdtemp(), "replacement_test.db"))
+    osi.open_file()
+    return osi, Pager(osi, cache_size=cache_size, policy=policy)
+
+def test_2q_survives_scan():
+    osi, pager = _open_pager("2q", cache_size=8)
+    try:
+        hot = [0, 1]
+        for page_num in hot + list(range(100, 108)) + hot:   # re-referenced after eviction -> promoted
+            pager.get_page(page_num)
+
+        for page_num in range(200, 300):    # one long scan
+            pager.get_page(page_num)
+
+        print("Cached after scan:", sorted(pager.cache))
+        assert all(page_num in pager.cache for page_num in hot)
+    finally:
+        osi.close_file()
+
+def test_pinned_pages_not_evicted():
+    osi, pager = _open_pager("lru", cache_size=2)
+    try:
+        with pager.pinned(0):
+            for page_num in range(1, 10):
+                pager.get_page(page_num)
+            assert 0 in pager.cache
+        print("Pinned page stayed cached:", sorted(pager.cache))
+    finally:
+        osi.close_file()
+
+if __name__ == "__main__":
+    test_2q_survives_scan()
+    test_pinned_pages_not_evicted()
@@ -0,0 +1,36 @@
+from backend.slotted_page import SlottedPage, leaf_cell, CELL_POINTER
+
+def _keys(page):
+    return [bytes(page.key(i)) for i in range(page.cell_count)]
+
+def test_insert_delete_and_defragment():
+    page = SlottedPage(bytearray(1024))
+    page.rewrite(True, [])
+    for i, key in enumerate([b"b", b"d", b"f"]):
+        assert page.insert_cell(i, leaf_cell(key, b"v" * 10))
+    assert page.insert_cell(0, leaf_cell(b"a", b""))          # shifts the pointers after it
+    assert page.insert_cell(2, leaf_cell(b"c", b"value"))
+    assert _keys(page) == [b"a", b"b", b"c", b"d", b"f"]
+    assert bytes(page.value(2)) == b"value"
+
+    free = page.free_space()
+    page.delete_cell(1)                                        # leaves a hole in the content area
+    assert _keys(page) == [b"a", b"c", b"d", b"f"]
+    assert page.free_space() == free + len(leaf_cell(b"b", b"v" * 10)) + CELL_POINTER.size
+
+    # fill the page until only the hole is left, then one more insert must defragment
+    big = leaf_cell(b"z", b"x" * 100)
+    while page.insert_cell(page.cell_count, big):
+        pass
+    print("Cells after filling:", page.cell_count, "free:", page.free_space())
+    assert page.free_space() < len(big) + CELL_POINTER.size
+    assert _keys(page)[:4] == [b"a", b"c", b"d", b"f"]
+
+    count = page.cell_count
+    page.delete_cell(count - 1)
+    page.delete_cell(0)
+    assert page.insert_cell(0, leaf_cell(b"a", b"x" * 100))
+    assert page.cell_count == count - 1 and bytes(page.key(1)) == b"c"
+
+if __name__ == "__main__":
+    test_insert_delete_and_defragment()
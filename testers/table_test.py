@@ -0,0 +1,131 @@
+import os
+import shutil
+import tempfile
+from rich.console import Console
+from backend.os_interface import OSInterface
+from backend.pager import Pager
+from backend.catalog import Catalog
+from engine.database import DatabaseEngine
+
+def _engine(path, **options):
+    return DatabaseEngine(path, console=Console(quiet=True), **options)
+
+def test_tables_persist():
+    path = os.path.join(tempfile.mkdtemp(), "table_test.db")
+    db = _engine(path)
+    try:
+        db.query("CREATE TABLE people (id INT, name TEXT, age INT);")
+        for i in range(50):
+            db.query(f"INSERT INTO people (id, name, age) VALUES ({i}, 'person{i}', {20 + i % 7});")
+        db.query("UPDATE people SET age = 99 WHERE id = 7;")
+        db.query("DELETE FROM people WHERE age = 21;")
+    finally:
+        db.close()
+
+    db = _engine(path)
+    try:
+        print("Schema after reopen:", db.schema_registry["people"])
+        assert db.schema_registry["people"] == ["id", "name", "age"]
+        rows = db.query("SELECT * FROM people;")
+        print("Rows after reopen:", len(rows))
+        assert [row["id"] for row in rows] == [str(i) for i in range(50) if i % 7 != 1]
+        assert db.query("SELECT age FROM people WHERE id = 7;") == [{"age": "99"}]
+        assert sum(page.pin_count for page in db.pager.cache.values()) == 0
+
+        free_before = db.pager.header.freelist_count
+        db.query("DROP people;")
+        assert "people" not in db.catalog
+        assert db.pager.header.freelist_count > free_before
+    finally:
+        db.close()
+
+def test_scan_with_bounded_cache():
+    path = os.path.join(tempfile.mkdtemp(), "big_table_test.db")
+    osi = OSInterface(path)
+    osi.open_file()
+    pager = Pager(osi, cache_size=8)
+    try:
+        table = Catalog(pager).create_table("log", ["id", "message"])
+        for i in range(20000):
+            table.insert([i, f"event number {i} " + "." * (i % 50)])
+        print("Pages after 20000 rows:", pager.num_pages, "cached:", len(pager.cache))
+        assert pager.num_pages > 100
+
+        count = 0
+        with table.cursor() as cursor:
+            while cursor.next():
+                assert len(pager.cache) <= 8
+                if cursor.rowid % 2:
+                    cursor.delete()                 # deleting mid-scan must not skip rows
+                elif cursor.rowid % 10 == 4:
+                    table.delete(cursor.rowid + 2)  # nor deleting a row ahead of the cursor
+                count += 1
+        assert count == 20000 - 2000
+        assert table.get(2) == {"id": 1, "message": "event number 1 ."}
+        assert table.get(3) is None and table.get(6) is None
+        assert table.tree.keys() == [i for i in range(2, 20001, 2) if i % 10 != 6]
+    finally:
+        osi.close_file()
+
+def test_writes_committed_without_close():
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "commit_test.db")
+    for use_wal in (True, False):
+        db = _engine(path, use_wal=use_wal)
+        try:
+            assert "btree_test" not in db.catalog.trees         # the demo tree is only made when used
+            db.query("CREATE TABLE t (id INT, name TEXT);")
+            misses = db.pager.stats["misses"]
+            for i in range(5):
+                db.query(f"INSERT INTO t (id, name) VALUES ({i}, 'n{i}');")
+            db.query("DELETE FROM t WHERE id = 3;")
+            assert db.pager.stats["misses"] == misses            # committed pages stay cached
+
+            # copy the files as they are while the engine is still open, as if the process died here
+            copy = os.path.join(directory, f"copy_{use_wal}.db")
+            shutil.copy(path, copy)
+            if os.path.exists(path + "-wal"):
+                shutil.copy(path + "-wal", copy + "-wal")
+            crashed = _engine(copy, use_wal=use_wal)
+            try:
+                rows = crashed.query("SELECT id FROM t;")
+                print(f"Rows committed without close (WAL: {use_wal}):", rows)
+                assert rows == [{"id": str(i)} for i in (0, 1, 2, 4)]
+                assert "btree_test" not in crashed.catalog.trees
+            finally:
+                crashed.close(verbose=False)
+            db.query("DROP t;")
+        finally:
+            db.close(verbose=False)
+        assert db.closed and db.os.file is None
+        db.close()                                            # a second close does nothing
+
+def test_scan_reads_ahead():
+    path = os.path.join(tempfile.mkdtemp(), "read_ahead_test.db")
+    db = _engine(path)
+    try:
+        for name in ("filler", "log"):               # the filler keeps log's leaves clear of the pages read at open
+            db.query(f"CREATE TABLE {name} (id INT, message TEXT);")
+            for i in range(200):
+                db.query(f"INSERT INTO {name} (id, message) VALUES ({i}, '{'m' * 200}');")
+    finally:
+        db.close(verbose=False)
+
+    db = _engine(path, read_ahead=4)
+    try:
+        before = dict(db.pager.stats)
+        rows = db.query("SELECT id FROM log;")
+        stats = {key: db.pager.stats[key] - before[key] for key in before}
+        print("Pager stats during the scan:", stats)
+        assert [row["id"] for row in rows] == [str(i) for i in range(200)]
+        assert stats["prefetched"] > 0
+        # the scan start hints the pager, so only the root and the first leaf are read on demand
+        assert stats["misses"] - stats["prefetch_hits"] <= 2
+    finally:
+        db.close(verbose=False)
+
+if __name__ == "__main__":
+    test_tables_persist()
+    test_scan_with_bounded_cache()
+    test_writes_committed_without_close()
+    test_scan_reads_ahead()
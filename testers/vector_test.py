@@ -0,0 +1,79 @@
+import os
+import tempfile
+from rich.console import Console
+from compiler.tokenizer import Tokenizer
+from compiler.parser import Parser
+from compiler.code_generator import CodeGeneration, PlanGenerator
+from core.virtual_machine import VirtualMachine
+from core.vectors import Batch, compare, make_vector
+from backend.record import Records
+from engine.database import DatabaseEngine
+import operator
+
+def test_vectors_and_selections():
+    ints = make_vector([3, 1, 4, 1, 5])
+    print("Int column vector:", type(ints).__name__)
+    assert not isinstance(ints, list) and list(ints) == [3, 1, 4, 1, 5]
+    assert make_vector(["a", 1]) == ["a", 1] and make_vector([1.5, 2.0])[0] == 1.5
+    assert list(compare(ints, operator.gt, 2)) == [0, 2, 4]
+    assert list(compare(ints, operator.eq, 1, selection=[1, 2, 3])) == [1, 3]
+    assert list(compare(ints, operator.le, make_vector([3, 0, 5, 1, 0]))) == [0, 2, 3]
+    assert compare(["b", "a", "b"], operator.eq, "b") == [0, 2]
+
+def _plan(db, query, compile_expressions):
+    parsed = Parser(Tokenizer().tokenize(query), schema_registry=db.schema_registry).parse()
+    planner = PlanGenerator(schema_registry=db.schema_registry, catalog=db.catalog,
+                            compile_expressions=compile_expressions)
+    return planner.generate_plan(CodeGeneration().gen(parsed))
+
+def test_batch_mode_matches_row_mode():
+    path = os.path.join(tempfile.mkdtemp(), "vector_test.db")
+    db = DatabaseEngine(path, console=Console(quiet=True))
+    try:
+        db.query("CREATE TABLE sales (id INT, region TEXT, amount INT, target INT);")
+        table = db.catalog["sales"]
+        for i in range(2500):
+            table.insert([str(i), f"r{i % 7}", str(i % 113), str(i % 50)])
+        for i in range(200):
+            db.query(f"INSERT INTO sales (id, region, amount, target) VALUES ({i}, 'sql', {i}, {i % 3});")
+        db.query("CREATE TABLE readings (id INT, value INT);")
+        for i in range(300):
+            db.catalog["readings"].insert([i, i % 10])      # real ints: typed column vectors
+        db.query("CREATE INDEX sales_region ON sales (region);")
+
+        queries = ["SELECT * FROM sales;", "SELECT id FROM sales WHERE amount = 42;",
+                   "SELECT id, amount FROM sales WHERE amount >= 100;", "SELECT region FROM sales WHERE id < 15;",
+                   "SELECT id FROM sales WHERE amount = target;", "SELECT * FROM sales WHERE region = 'r3';",
+                   "SELECT id FROM sales WHERE region != 'r1';", "SELECT id FROM sales WHERE amount = 9999;",
+                   "SELECT * FROM readings;", "SELECT id FROM readings WHERE id = value;",
+                   "SELECT id FROM readings WHERE value = 3;"]
+        row_vm = VirtualMachine(db.catalog)
+        batch_vm = VirtualMachine(db.catalog, batch_size=64)
+        for query in queries:
+            for compile_expressions in (True, False):
+                plan = _plan(db, query, compile_expressions)
+                expected = row_vm.execute(plan)
+                assert batch_vm.execute(plan) == expected, (query, compile_expressions)
+            print(f"{query:55} {len(expected)} rows")
+
+        batch = Batch(["a", "b"], Records([[1, "x"], [2, "y"], [3, "z"]]))
+        batch.selection = batch.compare("a", operator.ne, 2)
+        assert batch.rows() == [{"a": 1, "b": "x"}, {"a": 3, "b": "z"}]
+    finally:
+        db.close()
+
+    db = DatabaseEngine(path, console=Console(quiet=True), batch_size=100)
+    try:
+        # writes always run row at a time; reads are batched
+        db.query("UPDATE sales SET amount = 0 WHERE region = 'r2';")
+        db.query("DELETE FROM sales WHERE amount = 0;")
+        assert db.query("SELECT id FROM sales WHERE region = 'r2';") == []
+        assert db.query("SELECT id FROM sales;") == VirtualMachine(db.catalog).execute(
+            _plan(db, "SELECT id FROM sales;", True))
+        assert len(db.query("SELECT id FROM sales;")) == 2700 - 357 - 21     # the r2 rows, other amount-0 rows
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    test_vectors_and_selections()
+    test_batch_mode_matches_row_mode()
@@ -0,0 +1,145 @@
+import os
+import tempfile
+import threading
+from backend.os_interface import OSInterface, DEFAULT_PAGE_SIZE
+from backend.pager import Pager
+from backend.wal import WriteAheadLog
+
+def _page(text):
+    return text + b"\x00" * (DEFAULT_PAGE_SIZE - len(text))
+
+def test_wal_recovery_and_checkpoint():
+    path = os.path.join(tempfile.mkdtemp(), "wal_test.db")
+    osi = OSInterface(path)
+    osi.open_file()
+    wal = WriteAheadLog(osi)
+    wal.open()
+    pager = Pager(osi, cache_size=2, wal=wal)
+
+    try:
+        for page_num, text in enumerate([b"PageOne", b"PageTwo", b"PageThree"], start=1):
+            page = pager.get_page(page_num)
+            page.data = _page(text)
+            pager.mark_dirty(page)
+        pager.commit()
+
+        # Uncommitted change: must not survive a crash
+        page1 = pager.get_page(1)
+        page1.data = _page(b"Uncommitted")
+        pager.mark_dirty(page1)
+        pager._flush_page(page1)
+        print("WAL frames before crash:", wal.frame_count)
+
+        # Simulate a crash: drop the handles without checkpointing
+        os.close(wal.fd)
+        wal.fd = None
+        osi.close_file()
+
+        osi = OSInterface(path)
+        osi.open_file()
+        wal = WriteAheadLog(osi)
+        wal.open()
+        pager = Pager(osi, cache_size=2, wal=wal)
+        print("Recovered page 1:", pager.get_page(1).data[:20])
+        assert bytes(pager.get_page(1).data[:7]) == b"PageOne"
+        assert bytes(pager.get_page(3).data[:9]) == b"PageThree"
+        assert pager.num_pages == 4
+
+        assert pager.checkpoint()
+        print("WAL frames after checkpoint:", wal.frame_count)
+        assert bytes(osi.read_page(2)[:7]) == b"PageTwo"
+
+    finally:
+        wal.close()
+        osi.close_file()
+        assert not os.path.exists(path + "-wal")
+
+def test_short_frame_writes_completed():
+    # every frame write comes up short: the log must still hold whole frames back to back
+    path = os.path.join(tempfile.mkdtemp(), "wal_short_test.db")
+    osi = OSInterface(path)
+    osi.open_file()
+    wal = WriteAheadLog(osi)
+    wal.open()
+    pager = Pager(osi, cache_size=8, wal=wal)
+    pwritev, pwrite = getattr(os, "pwritev", None), os.pwrite
+    def short(fd, data, offset):
+        data = b"".join(data) if isinstance(data, list) else bytes(data)
+        return pwrite(fd, data[:1000], offset)
+    try:
+        os.pwritev = short
+        os.pwrite = short
+        for page_num in range(1, 4):
+            page = pager.get_page(page_num)
+            page.data = _page(b"Short%d" % page_num)
+            pager.mark_dirty(page)
+        pager.commit()
+    finally:
+        if pwritev is None:
+            del os.pwritev
+        else:
+            os.pwritev = pwritev
+        os.pwrite = pwrite
+    assert os.path.getsize(path + "-wal") == wal.end_offset
+    os.close(wal.fd)                    # crash: recover from the log alone
+    wal.fd = None
+    osi.close_file()
+
+    osi = OSInterface(path)
+    osi.open_file()
+    wal = WriteAheadLog(osi)
+    wal.open()
+    pager = Pager(osi, cache_size=8, wal=wal)
+    try:
+        print("Frames recovered after short writes:", wal.frame_count)
+        for page_num in range(1, 4):
+            assert bytes(pager.get_page(page_num).data[:6]) == b"Short%d" % page_num
+    finally:
+        wal.close()
+        osi.close_file()
+
+def test_concurrent_commits_share_fsyncs():
+    path = os.path.join(tempfile.mkdtemp(), "group_commit_test.db")
+    osi = OSInterface(path)
+    osi.open_file()
+    wal = WriteAheadLog(osi, group_commit_window=0.02)
+    wal.open()
+    pager = Pager(osi, cache_size=64, wal=wal)
+    threads_count = 8
+    barrier = threading.Barrier(threads_count)
+    errors = []
+
+    def writer(n):
+        try:
+            barrier.wait()
+            for round_number in range(3):
+                page = pager.get_page(n + 1)
+                page.data = _page(f"thread {n} round {round_number}".encode())
+                pager.mark_dirty(page)
+                pager.commit()
+        except Exception as e:
+            errors.append(e)
+
+    try:
+        pager.commit()
+        commits, syncs = wal.stats["commits"], wal.stats["syncs"]
+        threads = [threading.Thread(target=writer, args=(n,)) for n in range(threads_count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        commits, syncs = wal.stats["commits"] - commits, wal.stats["syncs"] - syncs
+        print(f"{commits} commits, {syncs} fsyncs")
+        assert not errors and commits > 0 and syncs < commits
+        assert wal.synced_seq == wal.commit_seq
+        for n in range(threads_count):
+            assert pager.get_page(n + 1).data[:20].rstrip(b"\x00") == f"thread {n} round 2".encode()
+    finally:
+        pager.close()
+        wal.close()
+        osi.close_file()
+
+if __name__ == "__main__":
+    test_wal_recovery_and_checkpoint()
+    test_short_frame_writes_completed()
+    test_concurrent_commits_share_fsyncs()
@@ -22,3 +22,8 @@ class BTreeError(SQLiteCloneError):
     def __init__(self,message):
         super().__init__(f"Code Generation Error: {message}")
         self.message = message
+
+class WALError(SQLiteCloneError):
+    def __init__(self, message):
+        super().__init__(f"WAL Error: {message}")
+        self.message = message